@@ -0,0 +1,310 @@
+import logging
+import pathlib
+import sqlite3
+from datetime import datetime
+from PyQt5 import QtCore
+import records
+import registry
+
+ARCHIVE_SQL = """
+create table if not exists events (
+    position int primary key,
+    name text not null unique,
+    sort varchar(4) not null,
+    dq float not null
+);
+
+create table if not exists competitions (
+    id integer primary key autoincrement,
+    db_path text not null unique,
+    config_path text,
+    year int,
+    host text,
+    units text,
+    mtime float,
+    size int,
+    ingested text
+);
+create index if not exists competitions_year on competitions (year);
+
+create table if not exists teams (
+    comp_id int not null references competitions on delete cascade,
+    team_id int not null,
+    School varchar(120),
+    Name varchar(80),
+    Division varchar(1),
+    Mucking float,
+    "Swede Saw" float,
+    "Track Stand" float,
+    "Gold Pan" float,
+    "Hand Steel" float,
+    Jackleg float,
+    Survey double,
+    primary key (comp_id, team_id)
+);
+create index if not exists teams_school on teams (School collate nocase);
+create index if not exists teams_name on teams (Name collate nocase);
+
+create table if not exists ranks (
+    comp_id int not null references competitions on delete cascade,
+    team_id int not null,
+    Mucking int,
+    "Swede Saw" int,
+    "Track Stand" int,
+    "Gold Pan" int,
+    "Hand Steel" int,
+    Jackleg int,
+    Survey int,
+    Sum int,
+    "Ties Won" int,
+    primary key (comp_id, team_id)
+);
+
+create table if not exists ties (
+    comp_id int not null references competitions on delete cascade,
+    tie_id int not null,
+    team_1_id int,
+    team_2_id int,
+    event text,
+    winner int,
+    primary key (comp_id, tie_id)
+);
+"""
+
+
+def quoted(columns):
+    return ", ".join(f'"{c}"' for c in columns)
+
+
+class Archive:
+    """All finished competitions in one indexed database
+
+    Competitions are ingested from their .config/.db pairs. A competition is
+    only re-read when its database file changed since it was last ingested.
+    Events a competition adds to the standard ones become archive columns
+    the first time one is ingested. rejected collects why competitions were
+    skipped.
+    """
+
+    def __init__(self, path):
+        self.logger = logging.getLogger("Main.Archive")
+        self.path = str(path)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON;")
+        self.events = []
+        self.rejected = []
+        self.setup()
+
+    def setup(self):
+        self.connection.executescript(ARCHIVE_SQL)
+        # Positions of the standard events match archives made before events were stored
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO events (position, name, sort, dq) VALUES (?, ?, ?, ?);",
+            records.standard_events(),
+        )
+        self.events = records.archived_events(self.connection)
+        for event in self.events:
+            self.index(event)
+        records.install(self.connection, self.events)
+        records.fill_missing(self.connection, self.events)
+        self.connection.commit()
+
+    def index(self, event):
+        # Per division/event indexes make best result lookups index scans
+        self.connection.execute(
+            f"create index if not exists teams_event_{event.position} "
+            f'on teams (Division, "{event.name}");'
+        )
+
+    def event(self, name):
+        for event in self.events:
+            if event.name == name:
+                return event
+        raise ValueError(f"{name} is not an archived event")
+
+    def add_events(self, events) -> list:
+        """Archive columns, index and record trigger for events the archive lacks
+
+        events are utils.Event. Returns the names of events archived with a
+        different order or DQ, nothing is added when there are any.
+        """
+        known = {event.name: event for event in self.events}
+        conflicts = [
+            event.name
+            for event in events
+            if event.name in known
+            and (known[event.name].order, known[event.name].dq) != (event.order, event.dq)
+        ]
+        if conflicts:
+            return conflicts
+        with self.connection:
+            for event in events:
+                if event.name in known:
+                    continue
+                self.logger.info(f"Adding {event.name} to the archived events")
+                added = records.ArchivedEvent(
+                    max(e.position for e in self.events) + 1, event.name, event.order, event.dq
+                )
+                self.connection.execute(f'ALTER TABLE teams ADD COLUMN "{event.name}" float;')
+                self.connection.execute(f'ALTER TABLE ranks ADD COLUMN "{event.name}" int;')
+                self.connection.execute(
+                    "INSERT INTO events (position, name, sort, dq) VALUES (?, ?, ?, ?);", added
+                )
+                self.index(added)
+                records.install(self.connection, [added])
+                self.events.append(added)
+                known[event.name] = added
+        return []
+
+    def close(self):
+        self.connection.close()
+
+    def ingest_directory(self, directory):
+        """Ingest every competition config in directory, returns number ingested"""
+        count = 0
+        for config_file in sorted(pathlib.Path(directory).glob("*.config")):
+            if self.ingest(config_file):
+                count += 1
+        return count
+
+    def ingest(self, config_file) -> bool:
+        config_file = pathlib.Path(config_file)
+        settings = QtCore.QSettings(str(config_file), QtCore.QSettings.IniFormat)
+        db_file = pathlib.Path(
+            settings.value("db/path", str(config_file.with_suffix(".db")))
+        )
+        if not db_file.is_file():
+            self.logger.warning(f"Skipping {config_file}, database {db_file} not found")
+            return False
+
+        stat = db_file.stat()
+        existing = self.connection.execute(
+            "SELECT id, mtime, size FROM competitions WHERE db_path = ?;",
+            [str(db_file)],
+        ).fetchone()
+        if existing and existing["mtime"] == stat.st_mtime and existing["size"] == stat.st_size:
+            self.logger.debug(f"{db_file} unchanged since last ingest")
+            return False
+
+        comp_events = registry.EventRegistry.from_settings(settings).events
+        conflicts = self.add_events(comp_events)
+        if conflicts:
+            reason = f"{', '.join(conflicts)} already archived with another order or DQ"
+            self.logger.warning(f"Skipping {config_file}, {reason}")
+            self.rejected.append(f"{config_file.name}: {reason}")
+            return False
+
+        self.logger.info(f"Archiving {db_file}")
+        self.connection.execute("ATTACH DATABASE ? AS src;", [str(db_file)])
+        try:
+            tables = {
+                row[0]
+                for row in self.connection.execute(
+                    "SELECT name FROM src.sqlite_master WHERE type = 'table';"
+                )
+            }
+            # Only the events of this competition its database actually has
+            columns = {
+                table: {row[1] for row in self.connection.execute(f"PRAGMA src.table_info({table});")}
+                for table in ["teams", "ranks"]
+            }
+            events = [event.name for event in comp_events if event.name in columns["teams"]]
+            with self.connection:
+                if existing:
+                    # Cascades to the teams, ranks and ties of the old copy
+                    self.connection.execute(
+                        "DELETE FROM competitions WHERE id = ?;", [existing["id"]]
+                    )
+                cursor = self.connection.execute(
+                    "INSERT INTO competitions (db_path, config_path, year, host, "
+                    "units, mtime, size, ingested) VALUES (?, ?, ?, ?, ?, ?, ?, ?);",
+                    [
+                        str(db_file),
+                        str(config_file),
+                        int(settings.value("comp/year", 0)),
+                        settings.value("comp/host", ""),
+                        settings.value("comp/units", ""),
+                        stat.st_mtime,
+                        stat.st_size,
+                        datetime.now().isoformat(timespec="seconds"),
+                    ],
+                )
+                comp_id = cursor.lastrowid
+
+                if "teams" in tables:
+                    self.connection.execute(
+                        f"INSERT INTO teams (comp_id, team_id, School, Name, Division, "
+                        f"{quoted(events)}) SELECT ?, id, School, Name, Division, "
+                        f"{quoted(events)} FROM src.teams;",
+                        [comp_id],
+                    )
+                if "ranks" in tables:
+                    ranked = quoted(
+                        [name for name in events if name in columns["ranks"]] + ["Sum", "Ties Won"]
+                    )
+                    self.connection.execute(
+                        f"INSERT INTO ranks (comp_id, team_id, {ranked}) "
+                        f"SELECT ?, id, {ranked} FROM src.ranks;",
+                        [comp_id],
+                    )
+                if "ties" in tables:
+                    self.connection.execute(
+                        "INSERT INTO ties (comp_id, tie_id, team_1_id, team_2_id, "
+                        "event, winner) SELECT ?, id, team_1_id, team_2_id, event, "
+                        "winner FROM src.ties;",
+                        [comp_id],
+                    )
+                if existing:
+                    records.fill_missing(self.connection, self.events)
+        finally:
+            self.connection.execute("DETACH DATABASE src;")
+        return True
+
+    def competitions(self):
+        return self.connection.execute(
+            "SELECT * FROM competitions ORDER BY year;"
+        ).fetchall()
+
+    def school_history(self, school):
+        """Every team a school entered across all years with its placing"""
+        return self.connection.execute(
+            """SELECT c.year, c.host, t.Name, t.Division, r.Sum, r."Ties Won",
+                (SELECT COUNT(*) + 1 FROM ranks r2
+                    JOIN teams t2 ON t2.comp_id = r2.comp_id AND t2.team_id = r2.team_id
+                    WHERE r2.comp_id = r.comp_id AND t2.Division = t.Division
+                    AND (r2.Sum < r.Sum OR (r2.Sum = r.Sum AND r2."Ties Won" > r."Ties Won"))
+                ) AS Place
+            FROM teams t
+            JOIN competitions c ON c.id = t.comp_id
+            LEFT JOIN ranks r ON r.comp_id = t.comp_id AND r.team_id = t.team_id
+            WHERE t.School = ? COLLATE NOCASE
+            ORDER BY c.year, t.Division, r.Sum;""",
+            [school],
+        ).fetchall()
+
+    def team_history(self, name):
+        return self.connection.execute(
+            f"""SELECT c.year, c.host, t.School, t.Division,
+            {quoted(event.name for event in self.events)}
+            FROM teams t JOIN competitions c ON c.id = t.comp_id
+            WHERE t.Name = ? COLLATE NOCASE ORDER BY c.year;""",
+            [name],
+        ).fetchall()
+
+    def event_results(self, event, division=None, limit=10):
+        """Best results for an event across all archived years"""
+        archived = self.event(event)
+        order = archived.order
+        where = f'"{event}" IS NOT NULL AND "{event}" != ?'
+        params = [archived.dq]
+        if division:
+            where += " AND Division = ?"
+            params.append(division)
+        params.append(limit)
+        return self.connection.execute(
+            f"""SELECT c.year, c.host, t.School, t.Name, t.Division, t."{event}" AS value
+            FROM teams t JOIN competitions c ON c.id = t.comp_id
+            WHERE {where} ORDER BY t."{event}" {order} LIMIT ?;""",
+            params,
+        ).fetchall()
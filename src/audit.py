@@ -0,0 +1,282 @@
+"""Audit of TXN history
+
+Streams the TXN lines of every log file in logs/, plain or gzipped, into the
+TXN index kept by logstore and answers queries against it. Files are read
+one line at a time and a plain log is resumed from where the last read
+stopped, so a weekend of DEBUG logs is never held in memory or read twice.
+The competition a line belongs to is followed through the database opening
+and closing lines around it.
+
+    python audit.py --team 12 --event Jackleg
+    python audit.py --minutes 10 --comp data/mucking_2020.db
+"""
+import argparse
+import ast
+import gzip
+import logging
+import os
+import pathlib
+import re
+import sqlite3
+import sys
+from collections import namedtuple
+from datetime import datetime, timedelta
+import logstore
+import utils
+
+AuditEntry = namedtuple("AuditEntry", ["time", "logger", "event", "teams", "message"])
+
+FILES_SQL = """
+create table if not exists txn_file (
+    name text primary key,
+    size integer not null,
+    offset integer not null,
+    comp text
+);
+"""
+
+# Files read before the competition was followed lack the column
+FILES_COMP_SQL = """
+alter table txn_file add column comp text;
+"""
+
+TXN_LINE = re.compile(r"\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\]\[TXN\s*\] (\S+)\s+- (.*)")
+
+# Lines of main.GUI opening and closing a competition, or starting with none open
+COMP_OPENED = re.compile(r"\[[^]]*\]\[INFO\s*\] Main\s+- Initializing Database (.+)")
+COMP_CLOSED = re.compile(
+    r"\[[^]]*\]\[INFO\s*\] Main\s+- (?:Closing Settings and Database Connections|Logger Initalized)"
+)
+
+# Message formats of the TXN call sites
+EDIT = re.compile(r"(.*?) - (.*?) - (.*) -> .*")
+HISTORY = re.compile(r"\[(?:Undo|Redo)\] (.*)")
+TIE = re.compile(r"Add Tie between (.*) and (.*), E: (.*), W: .*")
+DELETED = re.compile(r"\[Deleted\] (Team|Tie) Data - (\[.*\])")
+RECOVERED = re.compile(r"\[Recovered\] Team (\d+) - (.*) -> .*")
+
+COLUMNS = ["School", "Name", "Division"]
+
+
+def split_column(text, columns):
+    """(before, column) for the longest known column starting a word of text"""
+    for column in sorted(columns, key=len, reverse=True):
+        position = text.find(f" {column} ")
+        if position >= 0:
+            return text[:position], column
+        if text.startswith(f"{column} "):
+            return "", column
+    return text, None
+
+
+def describe(message, columns):
+    """([(team id, team name)], event) a TXN message refers to, as far as it tells"""
+    match = RECOVERED.fullmatch(message)
+    if match:
+        return [(int(match.group(1)), None)], match.group(2)
+    match = DELETED.fullmatch(message)
+    if match:
+        try:
+            values = ast.literal_eval(match.group(2))
+        except (ValueError, SyntaxError):
+            return [], None
+        if match.group(1) == "Team":
+            return [(values[0], values[2])], None
+        return [(None, values[1]), (None, values[2])], values[3]
+    match = TIE.fullmatch(message)
+    if match:
+        return [(None, match.group(1)), (None, match.group(2))], match.group(3)
+    match = HISTORY.fullmatch(message)
+    if match:
+        team, column = split_column(match.group(1), columns)
+        return ([(None, team)] if team and column else []), column
+    match = EDIT.fullmatch(message)
+    if match:
+        _, column = split_column(f" {match.group(3)}", columns)
+        return [(None, match.group(2))], column
+    return [], None
+
+
+def open_log(path, offset):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    file = open(path, "rb")
+    file.seek(offset)
+    return file
+
+
+class AuditLog:
+    """Queries over the TXN index of a logs directory
+
+    events are the names of the events scored, used to tell which event an
+    older log line without index fields refers to.
+    """
+
+    def __init__(self, logs_dir, events=utils.EVENT_SORTING):
+        self.logger = logging.getLogger("Main.Audit")
+        self.logs_dir = pathlib.Path(logs_dir)
+        self.columns = [*COLUMNS, *events]
+        self.connection = sqlite3.connect(str(self.logs_dir / logstore.INDEX_NAME))
+        logstore.index_setup(self.connection)
+        self.connection.executescript(FILES_SQL)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(txn_file);")]
+        if "comp" not in columns:
+            self.connection.executescript(FILES_COMP_SQL)
+
+    def close(self):
+        self.connection.close()
+
+    def ingest(self) -> int:
+        """Index TXN lines of log files not read yet, returns the entries added"""
+        added = 0
+        read = {
+            name: (offset, comp)
+            for name, offset, comp in self.connection.execute(
+                "SELECT name, offset, comp FROM txn_file;"
+            )
+        }
+        # Files are in date order, a competition left open carries into the next day's
+        comp = None
+        for path in sorted(self.logs_dir.glob("mucking_*.log*")):
+            if path.name.endswith(".tmp"):
+                continue
+            offset, end_comp = read.get(path.name, (0, comp))
+            try:
+                size = path.stat().st_size
+                if size < offset:
+                    # Recreated after a rollover since it was read, start it over
+                    offset, end_comp = 0, comp
+                # Compressed logs never change, a plain log only grows
+                if path.name in read and (path.suffix == ".gz" or offset == size):
+                    comp = end_comp
+                    continue
+                added_file, comp = self.ingest_file(path, offset, end_comp)
+            except FileNotFoundError:
+                # Compressed or pruned by logstore.tidy meanwhile, the .gz is read in its place
+                self.logger.debug(f"{path.name} went away while indexing, skipped")
+                continue
+            added += added_file
+        self.connection.commit()
+        if added:
+            self.logger.info(f"Indexed {added} TXN entries from the logs")
+        return added
+
+    def ingest_file(self, path, offset, comp=None):
+        """(entries added, competition open at the end) reading path from offset
+
+        comp is the competition open where the read starts.
+        """
+        added = 0
+        with open_log(path, offset) as file:
+            for raw in file:
+                if not raw.endswith(b"\n"):
+                    # Still being written, read it next time
+                    break
+                offset += len(raw)
+                if b"][TXN" not in raw:
+                    if b"Database" in raw or b"Logger Initalized" in raw:
+                        comp = self.follow(raw, comp)
+                    continue
+                match = TXN_LINE.match(raw.decode("utf-8", "replace").rstrip("\r\n"))
+                if match and self.add(*match.groups(), comp):
+                    added += 1
+            size = os.fstat(file.fileno()).st_size
+        self.connection.execute(
+            "INSERT OR REPLACE INTO txn_file (name, size, offset, comp) VALUES (?, ?, ?, ?);",
+            [path.name, size, offset, comp],
+        )
+        return added, comp
+
+    @staticmethod
+    def follow(raw, comp):
+        """The competition open after the log line raw"""
+        line = raw.decode("utf-8", "replace").rstrip("\r\n")
+        match = COMP_OPENED.match(line)
+        if match:
+            return logstore.comp_key(match.group(1))
+        if COMP_CLOSED.match(line):
+            return None
+        return comp
+
+    def add(self, time, logger, message, comp=None) -> bool:
+        # Written by the live index while the app was running
+        if self.connection.execute(
+            "SELECT 1 FROM txn WHERE time = ? AND logger = ? AND message = ?;",
+            [time, logger, message],
+        ).fetchone():
+            return False
+        teams, event = describe(message, self.columns)
+        cursor = self.connection.execute(
+            "INSERT INTO txn (time, logger, event, message, comp) VALUES (?, ?, ?, ?, ?);",
+            [time, logger, event, message, comp],
+        )
+        self.connection.executemany(
+            "INSERT INTO txn_team (txn_id, team_id, team) VALUES (?, ?, ?);",
+            [(cursor.lastrowid, t_id, name) for t_id, name in teams],
+        )
+        return True
+
+    def query(self, team=None, event=None, since=None, limit=1000, comp=None):
+        """Newest first AuditEntry list
+
+        team is a team id or part of a team name, event an event name, since
+        a datetime or a timedelta back from now and comp the database path of
+        a competition.
+        """
+        where = []
+        values = []
+        if team not in [None, ""]:
+            team = str(team).strip()
+            if team.isdigit():
+                # Ids only match ids, 1 would otherwise match every time and value with a 1
+                where.append("t.id IN (SELECT txn_id FROM txn_team WHERE team_id = ?)")
+                values.append(int(team))
+            else:
+                where.append(
+                    "(t.id IN (SELECT txn_id FROM txn_team WHERE team LIKE ?) OR t.message LIKE ?)"
+                )
+                values += [f"%{team}%", f"%{team}%"]
+        if event:
+            where.append("t.event = ? COLLATE NOCASE")
+            values.append(event)
+        if since is not None:
+            if isinstance(since, timedelta):
+                since = datetime.now() - since
+            where.append("t.time >= ?")
+            values.append(since.isoformat(" ", "seconds"))
+        if comp:
+            where.append("t.comp = ?")
+            values.append(logstore.comp_key(comp))
+
+        rows = self.connection.execute(
+            f"""SELECT t.time, t.logger, t.event,
+                group_concat(coalesce(tt.team, tt.team_id), ', '), t.message
+            FROM txn t LEFT JOIN txn_team tt ON tt.txn_id = t.id
+            {"WHERE " + " AND ".join(where) if where else ""}
+            GROUP BY t.id ORDER BY t.time DESC, t.id DESC LIMIT ?;""",
+            [*values, limit],
+        ).fetchall()
+        return [AuditEntry(*row) for row in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the TXN history in the logs")
+    parser.add_argument("--logs", default=str(pathlib.Path(__file__).resolve().parent / "logs"))
+    parser.add_argument("--team", help="team id or part of a team name")
+    parser.add_argument("--event")
+    parser.add_argument("--minutes", type=float, help="only the last N minutes")
+    parser.add_argument("--comp", help="only the competition with this database file")
+    parser.add_argument("--limit", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    audit = AuditLog(args.logs)
+    audit.ingest()
+    since = timedelta(minutes=args.minutes) if args.minutes else None
+    for entry in audit.query(args.team, args.event, since, args.limit, args.comp):
+        print(f"{entry.time}  {entry.message}")
+    audit.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
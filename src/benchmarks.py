@@ -0,0 +1,311 @@
+"""Synthetic competition benchmarks
+
+Generates a competition database with the same schema the application uses,
+drives the real GUI under the offscreen Qt platform and times the operations
+that matter during a meet. The GUI runs in a temporary directory, so its logs
+and recent competitions never reach the source tree. Timings only compare on
+one machine, so no baseline is kept in the repository: save one outside
+the tree with --save-baseline before a change and compare later runs to it.
+
+    python benchmarks.py --teams 100 --dq-rate 0.05 --ties 20
+    python benchmarks.py --teams 100 --baseline ~/mucking_baseline.json --save-baseline
+    python benchmarks.py --teams 100 --baseline ~/mucking_baseline.json
+    python benchmarks.py --startup "dist/IIMG Score Tracker/IIMG Score Tracker"
+"""
+import argparse
+import json
+import logging
+import os
+import pathlib
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import utils
+
+SRC_DIR = pathlib.Path(__file__).resolve().parent
+
+TIMED_EVENTS = ["Mucking", "Swede Saw", "Track Stand", "Gold Pan"]
+
+# (low, high) in cm for the length events, DQ sentinel for each
+LENGTH_EVENTS = {
+    "Hand Steel": (5, 60, utils.DQ_MIN_LENGTH),
+    "Jackleg": (20, 400, utils.DQ_MIN_LENGTH),
+    "Survey": (0.1, 50, utils.DQ_MAX_LENGTH),
+}
+
+SCHOOLS = [
+    "Colorado School of Mines",
+    "Montana Tech",
+    "Michigan Tech",
+    "Missouri S&T",
+    "South Dakota Mines",
+    "University of Arizona",
+    "University of Nevada Reno",
+    "Queen's University",
+    "Camborne School of Mines",
+    "Curtin University",
+]
+
+
+def generate_competition(
+    directory, teams_per_division=25, dq_rate=0.05, tie_count=10, year=2020, seed=0
+):
+    """Write a synthetic <year> competition (.config and .db) into directory"""
+    rnd = random.Random(seed)
+    directory = pathlib.Path(directory)
+    config_file = directory / f"mucking_{year}.config"
+    db_file = directory / f"mucking_{year}.db"
+    if db_file.exists():
+        db_file.unlink()
+
+    connection = sqlite3.connect(str(db_file))
+    cursor = connection.cursor()
+    cursor.execute(utils.TEAMS_SQL)
+    cursor.execute(utils.RANKS_SQL)
+    cursor.execute(utils.TIES_SQL)
+
+    divisions = {}
+    for div in ["A", "C", "M", "W"]:
+        for i in range(teams_per_division):
+            values = []
+            for event in TIMED_EVENTS:
+                if rnd.random() < dq_rate:
+                    values.append(utils.DQ_TIME)
+                else:
+                    values.append(round(rnd.uniform(45, 900), 2))
+            for event, (low, high, dq) in LENGTH_EVENTS.items():
+                if rnd.random() < dq_rate:
+                    values.append(dq)
+                else:
+                    values.append(round(rnd.uniform(low, high), 3))
+
+            cursor.execute(
+                'INSERT INTO teams (School, Name, Division, Mucking, "Swede Saw", '
+                '"Track Stand", "Gold Pan", "Hand Steel", Jackleg, Survey) '
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+                [rnd.choice(SCHOOLS), f"{div}{i:03} Muckers", div, *values],
+            )
+            divisions.setdefault(div, []).append(cursor.lastrowid)
+
+    for _ in range(tie_count):
+        div = rnd.choice([d for d in divisions if len(divisions[d]) > 1])
+        t1_id, t2_id = rnd.sample(divisions[div], 2)
+        event = rnd.choice(TIMED_EVENTS + list(LENGTH_EVENTS))
+        cursor.execute(
+            "INSERT INTO ties (team_1_id, team_2_id, event, winner) VALUES (?, ?, ?, ?);",
+            [t1_id, t2_id, event, rnd.choice([t1_id, t2_id])],
+        )
+
+    connection.commit()
+    connection.close()
+
+    from PyQt5 import QtCore
+
+    settings = QtCore.QSettings(str(config_file), QtCore.QSettings.IniFormat)
+    settings.setValue("app/display", "metric")
+    settings.setValue("comp/host", "Benchmark")
+    settings.setValue("comp/units", "Metric")
+    settings.setValue("comp/year", year)
+    settings.setValue("units/time", "hh:mm:ss.ss")
+    settings.setValue("iunits/handsteel", "in")
+    settings.setValue("iunits/jackleg", "ft")
+    settings.setValue("iunits/survey", "dynamic")
+    settings.setValue("munits/handsteel", "mm")
+    settings.setValue("munits/jackleg", "cm")
+    settings.setValue("munits/survey", "dynamic")
+    settings.setValue("db/path", str(db_file))
+    settings.sync()
+
+    return str(config_file)
+
+
+def timeit(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(config_file, repeat=5, directory=None):
+    """Time the hot paths of a loaded competition, returns {name: median ms}
+
+    The GUI works in directory, its logs/ and data/ end up there, it defaults
+    to the directory of config_file.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5 import QtWidgets
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+
+    # The UI files are loaded relative to the working directory
+    directory = pathlib.Path(directory or pathlib.Path(config_file).parent)
+    if not (directory / "ui").is_dir():
+        shutil.copytree(SRC_DIR / "ui", directory / "ui")
+    previous_dir = os.getcwd()
+    os.chdir(directory)
+    try:
+        return run_gui(app, config_file, repeat)
+    finally:
+        # Log files left open would keep a temporary directory from being removed
+        logger = logging.getLogger("Main")
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+            handler.close()
+        os.chdir(previous_dir)
+
+
+def run_gui(app, config_file, repeat):
+    import main
+    import dialogs
+
+    window = main.GUI()
+    window.comp_open(config_file)
+    window.rb_metric.setChecked(True)
+    app.processEvents()
+
+    def render():
+        window.team_table.viewport().grab()
+
+    def filter_switch():
+        for text in ["Men's", "Women's", "Co-Ed", "Alumni", "All"]:
+            window.c_filter.setCurrentText(text)
+            app.processEvents()
+
+    def tie_dialog():
+        diag = dialogs.TieDialog(window.roster)
+        diag.deleteLater()
+
+    results = {
+        "comp_score": timeit(window.comp_score, repeat),
+        "model_select": timeit(window.data_model.select, repeat),
+        "filter_switch": timeit(filter_switch, repeat),
+    }
+    window.rb_metric.setChecked(True)
+    results["render_metric"] = timeit(render, repeat)
+    window.rb_imperial.setChecked(True)
+    results["render_imperial"] = timeit(render, repeat)
+    window.rb_rank.setChecked(True)
+    results["render_rank"] = timeit(render, repeat)
+    results["tie_dialog"] = timeit(tie_dialog, repeat)
+
+    window.close()
+    return results
+
+
+def startup(command, repeat=5):
+    """Seconds from launching command to its welcome screen, one sample per launch
+
+    command is the bundled executable or main.py, run from its own directory
+    as the app expects. The first sample is the cold start.
+    """
+    path = pathlib.Path(command).resolve()
+    args = [sys.executable, str(path)] if path.suffix == ".py" else [str(path)]
+    samples = []
+    with tempfile.TemporaryDirectory() as directory:
+        stamp_file = pathlib.Path(directory) / "startup"
+        env = dict(os.environ, MUCKING_STARTUP_FILE=str(stamp_file))
+        for _ in range(repeat):
+            if stamp_file.exists():
+                stamp_file.unlink()
+            start = time.time()
+            subprocess.run(
+                args, cwd=path.parent, env=env, stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL, timeout=120,
+            )
+            if not stamp_file.exists():
+                raise RuntimeError(f"{path.name} exited before showing the welcome screen")
+            samples.append(float(stamp_file.read_text()) - start)
+    return samples
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of (name, baseline ms, current ms) that regressed"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous and current > previous * (1 + tolerance):
+            regressions.append((name, previous, current))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--teams", type=int, default=25, help="teams per division")
+    parser.add_argument("--dq-rate", type=float, default=0.05)
+    parser.add_argument("--ties", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="baseline file to compare with or save to")
+    parser.add_argument("--save-baseline", action="store_true", help="needs --baseline")
+    parser.add_argument(
+        "--startup",
+        metavar="APP",
+        help="time launching APP (bundled executable or main.py) to the welcome screen",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed slowdown relative to the baseline (0.25 = 25%%)",
+    )
+    args = parser.parse_args(argv)
+    if args.save_baseline and not args.baseline:
+        parser.error("--save-baseline needs --baseline FILE")
+
+    if args.startup:
+        samples = [sample * 1000 for sample in startup(args.startup, args.repeat)]
+        print(f"{'startup':<20}{'cold ms':>14}{'median ms':>14}")
+        print(f"{'welcome_screen':<20}{samples[0]:>14.2f}{statistics.median(samples):>14.2f}")
+        return 0
+
+    params = {
+        "teams": args.teams,
+        "dq_rate": args.dq_rate,
+        "ties": args.ties,
+        "seed": args.seed,
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_file = generate_competition(
+            directory, args.teams, args.dq_rate, args.ties, seed=args.seed
+        )
+        results = run(config_file, args.repeat, directory)
+
+    baseline_file = pathlib.Path(args.baseline).expanduser() if args.baseline else None
+    baseline = {}
+    if baseline_file and baseline_file.exists():
+        stored = json.loads(baseline_file.read_text())
+        if stored.get("params") == params:
+            baseline = stored["results"]
+        else:
+            print(f"Baseline {baseline_file} was recorded with {stored.get('params')}")
+
+    print(f"{'benchmark':<20}{'baseline ms':>14}{'current ms':>14}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        previous = f"{previous:.2f}" if previous else "-"
+        print(f"{name:<20}{previous:>14}{current:>14.2f}")
+
+    if args.save_baseline:
+        baseline_file.write_text(
+            json.dumps({"params": params, "results": results}, indent=2)
+        )
+        print(f"Saved baseline to {baseline_file}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for name, previous, current in regressions:
+        print(f"REGRESSION {name}: {previous:.2f} ms -> {current:.2f} ms")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
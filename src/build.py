@@ -0,0 +1,62 @@
+"""Bundled app build
+
+Compiles the .ui forms to Python modules in build/forms, so the bundled app
+neither parses XML nor ships PyQt5.uic, then runs PyInstaller on
+mucking.spec. Works the same on Windows, Linux and macOS.
+
+    python build.py
+    python build.py --forms-only
+"""
+import argparse
+import pathlib
+import sys
+
+from PyQt5 import uic
+
+import utils
+
+SRC_DIR = pathlib.Path(__file__).resolve().parent
+FORMS_DIR = SRC_DIR / "build" / "forms"
+
+
+def compile_forms(target=FORMS_DIR):
+    """Write forms/<module>.py for every ui/*.ui, returns the module names"""
+    target.mkdir(parents=True, exist_ok=True)
+    (target / "__init__.py").write_text("")
+    modules = []
+    for path in sorted((SRC_DIR / "ui").glob("*.ui")):
+        module = utils.form_module(path.stem)
+        with open(target / f"{module}.py", "w", encoding="utf-8") as output:
+            uic.compileUi(str(path), output)
+        modules.append(module)
+    return modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--forms-only", action="store_true", help="only compile the forms")
+    args = parser.parse_args(argv)
+
+    modules = compile_forms()
+    print(f"Compiled {len(modules)} forms to {FORMS_DIR}")
+    if args.forms_only:
+        return 0
+
+    import PyInstaller.__main__
+
+    PyInstaller.__main__.run(
+        [
+            "--noconfirm",
+            "--clean",
+            "--workpath",
+            str(SRC_DIR / "build" / "pyinstaller"),
+            "--distpath",
+            str(SRC_DIR / "dist"),
+            str(SRC_DIR / "mucking.spec"),
+        ]
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,435 +1,418 @@
 import logging
+import re
+from collections import namedtuple
+from functools import partial
 from math import isclose
 from PyQt5 import QtCore, QtWidgets, QtGui
+import instrument
 import utils
 
 
-class TimeValidator(QtGui.QValidator):
-    def __init__(self, parent):
-        super(TimeValidator, self).__init__(parent=parent)
-        self.statusBar = self.parent().parent().statusBar()
+PAINT_BATCH = instrument.Batch("paint")
 
-    def validate(self, value: str, cursor_pos: int):
-        state = self.Invalid
-
-        if value.count(":") == 0:
-            if value == "":
-                state = self.Acceptable
-            elif value in ["d", "D"]:
-                state = self.Intermediate
-            elif value in ["DQ", "dq", "Dq", "dQ"]:
-                state = self.Acceptable
-            else:
-                try:
-                    float(value)
-                    state = self.Acceptable
-                except ValueError:
-                    state = self.Invalid
-                    self.statusBar.showMessage("Invalid Character", 2500)
-
-        elif value.count(":") == 1:
-            if value.endswith(":"):
-                state = self.Intermediate
-            else:
-                m, s = value.split(":")
-                try:
-                    s = float(s)
-                    if int(s) < 60:
-                        state = self.Acceptable
-                    else:
-                        state = self.Invalid
-                        self.statusBar.showMessage(
-                            "Seconds cannot be > 60 when minutes are specified",
-                            2500
-                        )
-                except ValueError:
-                    state = self.Invalid
-                    self.statusBar.showMessage("Invalid Character", 2500)
-
-        elif value.count(":") == 2:
-            if value.endswith(":"):
-                state = self.Intermediate
-                if value.endswith("::"):
-                    state = self.Invalid
-                    self.statusBar.showMessage("Minutes must be at least 0", 2500)
-            else:
-                h, m, s = value.split(":")
-                try:
-                    m = float(m)
-                    s = float(s)
-                    if m < 60 and s < 60:
-                        state = self.Acceptable
-                    else:
-                        state = self.Invalid
-                        if m > 60:
-                            self.statusBar.showMessage(
-                                "Minutes cannot be > 60 when hours are specified",
-                                2500
-                            )
-                        elif s > 60:
-                            self.statusBar.showMessage(
-                                "Seconds cannot be > 60 when minutes are specified",
-                                2500
-                            )
-                except ValueError:
-                    state = self.Invalid
-                    self.statusBar.showMessage("Invalid Character", 2500)
-
-        elif value.count(":") > 2:
-            state = self.Invalid
-
-        return state, value, cursor_pos
-
-
-class DistValidator(QtGui.QValidator):
-    def __init__(self, parent):
-        super(DistValidator, self).__init__(parent=parent)
-        self.statusBar = self.parent().parent().statusBar()
+Parse = namedtuple("Parse", ["state", "value", "message"])
 
-    def validate(self, value: str, cursor_pos: int):
-        state = self.Invalid
-        if len(value) == 0:
-            state = self.Acceptable
-        elif value in ["d", "D"]:
-            state = self.Intermediate
-        elif value in ["DQ", "dq", "Dq", "dQ"]:
-            state = self.Acceptable
-        else:
-            value = value.lower()
-            if value.isdecimal():
-                state = self.Intermediate
-            else:
-                try:
-                    float(value)
-                    state = self.Intermediate
-                except ValueError:
-                    unit_text = "".join([c for c in value if c.isalpha()])
-                    if len(unit_text) == 1 and unit_text in "mckif":
-                        state = self.Intermediate
-                    else:
-                        for unit in utils.UNIT_FACTORS:
-                            if value.endswith(unit):
-                                state = self.Acceptable
-                                break
-        if "-" in value:
-            state = self.Invalid
-            self.statusBar.showMessage("Values Less than 0 not allowed", 2500)
-
-        return state, value, cursor_pos
-
-
-class BaseDelegate(QtWidgets.QStyledItemDelegate):
-    def __init__(self, parent):
-        super(BaseDelegate, self).__init__(parent=parent)
-        self.logger = None
-        self.h_align = QtCore.Qt.AlignRight
-        self.init_logger("Editor")
+# How a column is drawn and edited, kind is "text", "division" or an Event.kind
+ColumnFormat = namedtuple("ColumnFormat", ["kind", "event", "align"])
 
-    def init_logger(self, name):
-        if not self.logger:
-            self.logger = logging.getLogger(f"Main.{name}")
+DQ_INPUTS = ["DQ", "dq", "Dq", "dQ"]
 
-    def updateEditorGeometry(self, editor, option, index):
-        editor.setGeometry(option.rect)
+# hh:mm:ss.ss, mm:ss.ss or ss.ss, the leading fields only ever hold whole numbers
+TIME_PATTERN = re.compile(r"(?:(\d+):)?(?:(\d+):)?(\d*)(\.\d*)?")
 
-    def paint(self, painter, option, index):
-        # self.initStyleOption(option, index)
-        painter.save()
-
-        # Select highlighting
-        if option.state & QtWidgets.QStyle.State_Selected:
-            painter.fillRect(option.rect, option.palette.highlight())
-            painter.setPen(option.palette.highlightedText().color())
-
-        rect = option.rect
-        rect -= QtCore.QMargins(6, 6, 6, 6)
-        value = index.model().data(index, QtCore.Qt.DisplayRole)
-        painter.drawText(
-            rect, (self.h_align | QtCore.Qt.AlignVCenter), self.display(value)
-        )
+# Number followed by an optional (possibly partial) unit e.g. 5.2, 5.2 k, 5.2km
+DIST_PATTERN = re.compile(r"(\d*)(\.\d*)?\s*([a-z]*)")
 
-        painter.restore()
+# Every prefix of a unit that could still be completed into a known unit
+UNIT_PREFIXES = {unit[:i] for unit in utils.UNIT_FACTORS for i in range(1, len(unit))}
 
-    def setModelData(self, editor, model, index):
-        value = index.model().data(index, QtCore.Qt.EditRole)
-        new_value = self.modelUpdate(editor, model, index)
+# Cached cell texts kept before the cache is dropped and refilled
+TEXT_CACHE_LIMIT = 4096
 
-        # Discard Values that are input within 0.01 cm of each other or None for new
-        if value not in [None, '']:
-            if new_value not in ["DQ", "dq", "Dq", "dQ", None]:
-                if isclose(value, new_value, abs_tol=0.01):
-                    return
+MARGINS = QtCore.QMargins(6, 6, 6, 6)
 
-        model.setData(index, new_value, QtCore.Qt.EditRole)
 
-        # Logging of Transaction
-        if value in [utils.DQ_TIME, utils.DQ_MAX_LENGTH, utils.DQ_MIN_LENGTH]:
-            value = "DQ"
-        if new_value in [utils.DQ_TIME, utils.DQ_MAX_LENGTH, utils.DQ_MIN_LENGTH]:
-            new_value = "DQ"
+def parse_time(value: str) -> Parse:
+    """Tokenize time editor input in a single pass.
 
-        sname = model.data(index.siblingAtColumn(1), QtCore.Qt.EditRole)
-        tname = model.data(index.siblingAtColumn(2), QtCore.Qt.EditRole)
-        event = model.headerData(
-            index.column(), QtCore.Qt.Horizontal, QtCore.Qt.DisplayRole
-        )
+    Returns the validator state, the time in seconds (only when Acceptable) and
+    a status bar message for Invalid input.
+    """
+    if value == "":
+        return Parse(QtGui.QValidator.Acceptable, None, None)
+    if value in ["d", "D"]:
+        return Parse(QtGui.QValidator.Intermediate, None, None)
+    if value in DQ_INPUTS:
+        return Parse(QtGui.QValidator.Acceptable, utils.DQ_TIME, None)
 
-        self.logger.txn(f"{sname} - {tname} - {event} {value} -> {new_value}")
+    match = TIME_PATTERN.fullmatch(value)
+    if not match:
+        if value.endswith("::"):
+            return Parse(QtGui.QValidator.Invalid, None, "Minutes must be at least 0")
+        return Parse(QtGui.QValidator.Invalid, None, "Invalid Character")
 
-    def createEditor(self, parent, option, index):
-        editor = QtWidgets.QLineEdit(parent)
-        editor.setFrame(False)
-        return editor
+    first, second, whole, fraction = match.groups()
+    if not whole and (not fraction or fraction == "."):
+        # Nothing typed after the last colon or only a decimal point so far
+        return Parse(QtGui.QValidator.Intermediate, None, None)
 
-    def setEditorData(self, editor, index):
-        value = index.model().data(index, QtCore.Qt.EditRole)
-        editor.setText(self.display(value))
+    seconds = float(f"{whole}{fraction or ''}")
+    if first is None:
+        return Parse(QtGui.QValidator.Acceptable, seconds, None)
 
-    def sizeHint(self, option, index):
-        value = index.model().data(index, QtCore.Qt.DisplayRole)
-        rect = option.fontMetrics.boundingRect(self.display(value))
-        rect += QtCore.QMargins(8, 0, 8, 0)
-        return rect.size()
+    if seconds >= 60:
+        return Parse(
+            QtGui.QValidator.Invalid,
+            None,
+            "Seconds cannot be > 60 when minutes are specified",
+        )
 
-    def display(self, value) -> str:
-        # Must be implemented for each derivative class
-        raise NotImplementedError
+    if second is None:
+        return Parse(QtGui.QValidator.Acceptable, int(first) * 60 + seconds, None)
 
-    def modelUpdate(self, editor, model, index):
+    if int(second) >= 60:
+        return Parse(
+            QtGui.QValidator.Invalid,
+            None,
+            "Minutes cannot be > 60 when hours are specified",
+        )
+    return Parse(
+        QtGui.QValidator.Acceptable,
+        int(first) * 3600 + int(second) * 60 + seconds,
+        None,
+    )
+
+
+def parse_distance(value: str, dq_value) -> Parse:
+    """Tokenize distance editor input in a single pass.
+
+    Returns the validator state, the length in cm (only when Acceptable) and a
+    status bar message for Invalid input.
+    """
+    if value == "":
+        return Parse(QtGui.QValidator.Acceptable, None, None)
+    if value in ["d", "D"]:
+        return Parse(QtGui.QValidator.Intermediate, None, None)
+    if value in DQ_INPUTS:
+        return Parse(QtGui.QValidator.Acceptable, dq_value, None)
+    if "-" in value:
+        return Parse(QtGui.QValidator.Invalid, None, "Values Less than 0 not allowed")
+
+    match = DIST_PATTERN.fullmatch(value.lower().strip())
+    if not match:
+        return Parse(QtGui.QValidator.Invalid, None, None)
+
+    whole, fraction, unit = match.groups()
+    if not whole and (not fraction or fraction == "."):
+        # A lone decimal point can still become a number, a lone unit cannot
+        state = QtGui.QValidator.Invalid if unit else QtGui.QValidator.Intermediate
+        return Parse(state, None, None)
+
+    # TODO: Implement Fraction Inches input
+    if unit in utils.UNIT_FACTORS:
+        cms = float(f"{whole}{fraction or ''}") / utils.UNIT_FACTORS[unit]
+        return Parse(QtGui.QValidator.Acceptable, cms, None)
+    if not unit or unit in UNIT_PREFIXES:
+        return Parse(QtGui.QValidator.Intermediate, None, None)
+    return Parse(QtGui.QValidator.Invalid, None, None)
+
+
+class ParseValidator(QtGui.QValidator):
+    """Validator that keeps the last parse so the delegate can reuse it on commit"""
+
+    def __init__(self, parent, status_bar):
+        super(ParseValidator, self).__init__(parent=parent)
+        self.statusBar = status_bar
+        self.text = None
+        self.result = None
+
+    def validate(self, value: str, cursor_pos: int):
+        result = self.parse(value)
+        if result.message:
+            self.statusBar.showMessage(result.message, 2500)
+        return result.state, value, cursor_pos
+
+    def parse(self, value: str) -> Parse:
+        if value != self.text:
+            self.text = value
+            self.result = self.tokenize(value)
+        return self.result
+
+    def tokenize(self, value: str) -> Parse:
         raise NotImplementedError
 
 
-class DivisionDelegate(BaseDelegate):
-    def __init__(self, parent):
-        super(DivisionDelegate, self).__init__(parent=parent)
-        self.h_align = QtCore.Qt.AlignHCenter
+class TimeValidator(ParseValidator):
+    def tokenize(self, value: str) -> Parse:
+        return parse_time(value)
 
-    def display(self, value):
-        return utils.DIVISION_LEXICON[value]
 
-    def setEditorData(self, editor, index):
-        value = index.model().data(index, QtCore.Qt.EditRole)
-        val_index = editor.findText(utils.DIVISION_LEXICON[value])
-        if val_index:
-            editor.setCurrentIndex(val_index)
-        else:
-            editor.setCurrentIndex(0)
+class DistValidator(ParseValidator):
+    def __init__(self, parent, status_bar, dq_value):
+        super(DistValidator, self).__init__(parent=parent, status_bar=status_bar)
+        self.dq_value = dq_value
 
-    def createEditor(self, parent, option, index):
-        editor = QtWidgets.QComboBox(parent)
-        editor.setFrame(False)
-        editor.addItem("Men's")
-        editor.addItem("Women's")
-        editor.addItem("Co-Ed")
-        editor.addItem("Alumni")
-        return editor
+    def tokenize(self, value: str) -> Parse:
+        return parse_distance(value, self.dq_value)
 
-    def modelUpdate(self, editor, model, index):
-        return utils.DIVISION_LEXICON[editor.currentText()]
 
+def plain_text(value) -> str:
+    return "" if value is None else str(value)
 
-class TimeEditDelegate(BaseDelegate):
-    def createEditor(self, parent, option, index):
-        editor = QtWidgets.QLineEdit(parent)
-        editor.setFrame(False)
-        editor.setValidator(TimeValidator(parent=self))
-        return editor
 
-    def display(self, value):
-        if not value:
-            return ""
+def division_text(value) -> str:
+    return utils.DIVISION_LEXICON.get(value, "")
 
-        display_mode = self.parent().settings.value("app/display")
 
-        if display_mode == "rank":
-            return str(value)
-        else:
-            if value == utils.DQ_TIME:
-                return "DQ"
-            if self.parent().settings.value("units/time", "ssss.ss") == "ssss.ss":
-                s_time = f"{value:7.2f}"
-            else:
-                hours = int(value // 3600)
-                minutes = int((value - hours * 3600) // 60)
-                seconds = value - hours * 3600 - minutes * 60
+def rank_text(value) -> str:
+    return "" if value in [None, ""] else str(value)
 
-                s_time = f"{minutes}:{seconds:05.2f}"
 
-                if hours:
-                    s_time = f"{hours}:{minutes:02}:{seconds:05.2f}"
+def time_text(value, dq, clock) -> str:
+    if not value:
+        return ""
+    if value == dq:
+        return "DQ"
+    if not clock:
+        return f"{value:7.2f}"
 
-            return s_time
+    hours = int(value // 3600)
+    minutes = int((value - hours * 3600) // 60)
+    seconds = value - hours * 3600 - minutes * 60
+    if hours:
+        return f"{hours}:{minutes:02}:{seconds:05.2f}"
+    return f"{minutes}:{seconds:05.2f}"
 
-    def modelUpdate(self, editor, model, index):
-        value = editor.text()
 
-        # Set field to None/NULL when left empty
-        if value == "":
-            return None
+def length_text(value, dq, metric, units, precision) -> str:
+    if value == dq:
+        return "DQ"
+    if not value:
+        return ""
 
-        # Check for DQ
-        if value in ["DQ", "dq", "Dq", "dQ"]:
-            return utils.DQ_TIME
+    # Dynamic Unit Selection Support
+    if units == "dynamic":
+        units = utils.get_reasonable_unit(value, metric)
+    return f"{value * utils.UNIT_FACTORS[units]:.{precision}f} {units: >2}"
 
-        if value.count(":") == 2:
-            h, m, s = value.split(":")
-            seconds = int(h) * 3600 + int(m) * 60 + float(s)
-        elif value.count(":") == 1:
-            m, s = value.split(":")
-            seconds = int(m) * 60 + float(s)
-        else:
-            seconds = float(value)
 
-        return seconds
+def team_formats(registry) -> dict:
+    """{column: ColumnFormat} for the teams table and the standings view"""
+    formats = {
+        1: ColumnFormat("text", None, QtCore.Qt.AlignLeft),
+        2: ColumnFormat("text", None, QtCore.Qt.AlignLeft),
+        3: ColumnFormat("division", None, QtCore.Qt.AlignHCenter),
+    }
+    for column, event in registry.team_columns.items():
+        formats[column] = ColumnFormat(event.kind, event, QtCore.Qt.AlignRight)
+    return formats
 
 
-class DistanceEditDelegate(BaseDelegate):
-    def createEditor(self, parent, option, index):
-        editor = QtWidgets.QLineEdit(parent)
-        editor.setFrame(False)
-        editor.setValidator(DistValidator(parent=self))
-        return editor
+class TextCache:
+    """QStaticText of each cell value, laid out once and redrawn from the cache"""
 
-    def display(self, value):
-        raise NotImplementedError
+    def __init__(self):
+        self.texts = {}
 
-    # ONLY WORKS IN PYTHON 3.6+ due to dict insertion ordering
-    # Due to the looping check order of these units is important
-    # e.g. km must come before m since 5.0km would match m as 5.0k
-    # leading to issues when the program tries to convert to a float
-    def modelUpdate(self, editor, model, index):
-        units_detected = False
-        # Set field to None/NULL when editor is empty
-        if editor.text() == "":
-            return None
-
-        string = editor.text()
-
-        # Ensure that there are no trailing spaces
-        string = string.lower().strip()
-
-        if string in ["DQ", "dq", "Dq", "dQ"]:
-            return self.dq_value
-
-        # TODO: Implement Fraction Inches input
-        for unit in utils.UNIT_FACTORS:
-            if string.endswith(unit):
-                units_detected = True
-                self.parent().logger.debug(
-                    f"Detected units {unit}: {string.replace(unit, '').strip()}"
-                )
-                try:
-                    cms = (
-                        float(string.replace(unit, "").strip())
-                        / utils.UNIT_FACTORS[unit]
-                    )
-                    return cms
-                except ValueError:
-                    self.parent().logger.error(f"Partial Unit match of input: {string}")
-
-        if not units_detected:
-            self.parent().logger.error(f"Unable to detect units of input: {string}")
-            return
+    def clear(self):
+        self.texts.clear()
 
-    @property
-    def dq_value(self):
-        raise NotImplementedError
+    def get(self, column, value, text, font) -> QtGui.QStaticText:
+        """Cached text of value, text(value) is only called on a miss"""
+        key = (column, value)
+        static = self.texts.get(key)
+        if static is None:
+            if len(self.texts) >= TEXT_CACHE_LIMIT:
+                self.texts.clear()
+            static = QtGui.QStaticText(text(value))
+            static.setTextFormat(QtCore.Qt.PlainText)
+            static.prepare(QtGui.QTransform(), font)
+            self.texts[key] = static
+        return static
 
 
-class HandsteelDelegate(DistanceEditDelegate):
-    def display(self, value):
-        # Check for DQ
-        if value == utils.DQ_MIN_LENGTH:
-            return "DQ"
+def draw_static(painter, option, static, align):
+    """Draw a cell's text the way every table in the app does"""
+    painter.save()
 
-        # Check for null values
-        if not value:
-            return ""
+    # Select highlighting
+    if option.state & QtWidgets.QStyle.State_Selected:
+        painter.fillRect(option.rect, option.palette.highlight())
+        painter.setPen(option.palette.highlightedText().color())
 
-        display_mode = self.parent().settings.value("app/display")
+    rect = option.rect - MARGINS
+    size = static.size()
+    if align & QtCore.Qt.AlignRight:
+        x = rect.x() + rect.width() - size.width()
+    elif align & QtCore.Qt.AlignHCenter:
+        x = rect.x() + (rect.width() - size.width()) / 2
+    else:
+        x = rect.x()
+    y = rect.y() + (rect.height() - size.height()) / 2
+    painter.drawStaticText(QtCore.QPointF(x, y), static)
 
-        if display_mode == "rank":
-            return str(value)
-        else:
-            # Check display units
-            if self.parent().settings.value("app/display", "metric") == "metric":
-                units = self.parent().settings.value("munits/handsteel", "mm")
-            else:
-                units = self.parent().settings.value("iunits/handsteel", "in")
+    painter.restore()
+
+
+class TableDelegate(QtWidgets.QStyledItemDelegate):
+    """Single delegate drawing and editing every column of the teams table
 
-            # Dynamic Unit Selection Support
-            if units == "dynamic":
-                units = utils.get_reasonable_unit(
-                    value,
-                    self.parent().settings.value("app/display", "metric") == "metric",
+    Each column is dispatched on its ColumnFormat, columns without one get the
+    default Qt behaviour. configure resolves units and text formats whenever
+    the settings change so painting a cell is a cache lookup.
+    """
+
+    def __init__(self, parent):
+        super(TableDelegate, self).__init__(parent=parent)
+        self.logger = logging.getLogger("Main.Editor")
+        self.formats = {}
+        # column -> function(value) -> display text
+        self.texts = {}
+        self.cache = TextCache()
+
+    def set_formats(self, formats):
+        self.formats = formats
+        self.texts = {}
+        self.cache.clear()
+
+    def configure(self, settings):
+        """Resolve the text of each column for the current display settings"""
+        display_mode = settings.value("app/display")
+        metric = display_mode == "metric"
+        clock = settings.value("units/time", "ssss.ss") != "ssss.ss"
+        texts = {}
+        for column, fmt in self.formats.items():
+            if fmt.kind == "text":
+                texts[column] = plain_text
+            elif fmt.kind == "division":
+                texts[column] = division_text
+            elif display_mode == "rank":
+                texts[column] = rank_text
+            elif fmt.kind == "time":
+                texts[column] = partial(time_text, dq=fmt.event.dq, clock=clock)
+            else:
+                event = fmt.event
+                if metric:
+                    units = settings.value(f"munits/{event.key}", event.metric)
+                else:
+                    units = settings.value(f"iunits/{event.key}", event.imperial)
+                texts[column] = partial(
+                    length_text,
+                    dq=event.dq,
+                    metric=metric,
+                    units=units,
+                    precision=event.precision,
                 )
+        self.texts = texts
+        self.cache.clear()
+
+    def display(self, column, value) -> str:
+        return self.texts[column](value)
+
+    def updateEditorGeometry(self, editor, option, index):
+        editor.setGeometry(option.rect)
 
-            # Convert and display
-            return f"{value * utils.UNIT_FACTORS[units]:.2f} {units}"
+    def paint(self, painter, option, index):
+        column = index.column()
+        if column not in self.texts:
+            super(TableDelegate, self).paint(painter, option, index)
+            return
+        with PAINT_BATCH:
+            value = index.data(QtCore.Qt.DisplayRole)
+            static = self.cache.get(column, value, self.texts[column], option.font)
+            draw_static(painter, option, static, self.formats[column].align)
+
+    def sizeHint(self, option, index):
+        column = index.column()
+        if column not in self.texts:
+            return super(TableDelegate, self).sizeHint(option, index)
+        value = index.data(QtCore.Qt.DisplayRole)
+        rect = option.fontMetrics.boundingRect(self.texts[column](value))
+        rect += QtCore.QMargins(8, 0, 8, 0)
+        return rect.size()
 
-    @property
-    def dq_value(self):
-        return utils.DQ_MIN_LENGTH
+    def createEditor(self, parent, option, index):
+        fmt = self.formats.get(index.column())
+        if fmt is None or fmt.kind == "text":
+            return super(TableDelegate, self).createEditor(parent, option, index)
 
+        if fmt.kind == "division":
+            editor = QtWidgets.QComboBox(parent)
+            editor.setFrame(False)
+            editor.addItems(["Men's", "Women's", "Co-Ed", "Alumni"])
+            return editor
 
-class JacklegDelegate(DistanceEditDelegate):
-    def display(self, value):
-        # Check for DQ
-        if value == utils.DQ_MIN_LENGTH:
-            return "DQ"
+        editor = QtWidgets.QLineEdit(parent)
+        editor.setFrame(False)
+        status_bar = self.parent().statusBar()
+        if fmt.kind == "time":
+            editor.setValidator(TimeValidator(editor, status_bar))
+        else:
+            editor.setValidator(DistValidator(editor, status_bar, fmt.event.dq))
+        return editor
 
-        # Check for null values
-        if not value:
-            return ""
-        display_mode = self.parent().settings.value("app/display")
+    def setEditorData(self, editor, index):
+        fmt = self.formats.get(index.column())
+        if fmt is None or fmt.kind == "text":
+            super(TableDelegate, self).setEditorData(editor, index)
+            return
 
-        if display_mode == "rank":
-            return str(value)
+        value = index.data(QtCore.Qt.EditRole)
+        if fmt.kind == "division":
+            editor.setCurrentIndex(max(editor.findText(division_text(value)), 0))
         else:
-            # Check display units
-            if self.parent().settings.value("app/display", "metric") == "metric":
-                units = self.parent().settings.value("munits/jackleg", "cm")
-            elif self.parent().settings.value("app/display", "imperial") == "imperial":
-                units = self.parent().settings.value("iunits/jackleg", "in")
+            editor.setText(self.display(index.column(), value))
 
-            # Convert and display
-            return f"{value * utils.UNIT_FACTORS[units]:.2f} {units}"
+    @instrument.timed("setModelData")
+    def setModelData(self, editor, model, index):
+        fmt = self.formats.get(index.column())
+        if fmt is None or fmt.kind == "text":
+            super(TableDelegate, self).setModelData(editor, model, index)
+            return
+
+        value = index.model().data(index, QtCore.Qt.EditRole)
+        new_value = self.modelUpdate(fmt, editor, index)
+
+        # Discard unchanged values and values input within 0.01 cm of each other
+        if new_value == value or (new_value is None and value in [None, ""]):
+            return
+        if isinstance(value, (int, float)) and isinstance(new_value, (int, float)):
+            if isclose(value, new_value, abs_tol=utils.TIE_TOLERANCE):
+                return
 
-    @property
-    def dq_value(self):
-        return utils.DQ_MIN_LENGTH
+        model.setData(index, new_value, QtCore.Qt.EditRole)
 
+        # Logging of Transaction
+        if fmt.event and value == fmt.event.dq:
+            value = "DQ"
+        if fmt.event and new_value == fmt.event.dq:
+            new_value = "DQ"
 
-class SurveyDelegate(DistanceEditDelegate):
-    def display(self, value):
-        # Check for null values
-        if not value:
-            return ""
+        sname = model.data(index.siblingAtColumn(1), QtCore.Qt.EditRole)
+        tname = model.data(index.siblingAtColumn(2), QtCore.Qt.EditRole)
+        event = model.headerData(
+            index.column(), QtCore.Qt.Horizontal, QtCore.Qt.DisplayRole
+        )
 
-        # Check for DQ
-        if value == utils.DQ_MAX_LENGTH:
-            return "DQ"
+        t_id = model.data(index.siblingAtColumn(0), QtCore.Qt.EditRole)
+        self.logger.txn(
+            f"{sname} - {tname} - {event} {value} -> {new_value}",
+            extra={"teams": {t_id: tname}, "event": event},
+        )
 
-        display_mode = self.parent().settings.value("app/display")
+    def modelUpdate(self, fmt, editor, index):
+        if fmt.kind == "division":
+            return utils.DIVISION_LEXICON[editor.currentText()]
 
-        if display_mode == "rank":
-            return str(value)
-        else:
-            # Check display units
-            if self.parent().settings.value("app/display", "metric") == "metric":
-                units = self.parent().settings.value("munits/survey", "dynamic")
-            else:
-                units = self.parent().settings.value("iunits/survey", "dynamic")
+        # Reuse the validator's parse of the final text rather than parsing again
+        result = editor.validator().parse(editor.text())
 
-            # Convert and display
-            if units == "dynamic":
-                units = utils.get_reasonable_unit(
-                    value,
-                    self.parent().settings.value("app/display", "metric") == "metric",
+        # Incomplete input (e.g. "1:") or numbers without units keep the stored value
+        if result.state != QtGui.QValidator.Acceptable:
+            if fmt.kind == "length":
+                self.parent().logger.error(
+                    f"Unable to detect units of input: {editor.text()}"
                 )
+            return index.model().data(index, QtCore.Qt.EditRole)
 
-            return f"{value * utils.UNIT_FACTORS[units]:.3f} {units: >2}"
-
-    @property
-    def dq_value(self):
-        return utils.DQ_MAX_LENGTH
+        return result.value
@@ -1,15 +1,18 @@
 import datetime
 import logging
-import os
-from PyQt5 import QtWidgets, uic, QtSql
+from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtCore import pyqtSignal
+import delegates
+import instrument
+import queries
+import reports
 import utils
 
 
 class NewComp(QtWidgets.QDialog):
     def __init__(self):
         super(NewComp, self).__init__()
-        uic.loadUi(f"ui{os.sep}new_comp.ui", self)
+        utils.load_ui("new_comp", self)
         self.logger = logging.getLogger("Main.NewComp")
         self.logger.info("Generating New Competition from Dialog")
         self.setWindowTitle("New...")
@@ -33,7 +36,7 @@ class NewComp(QtWidgets.QDialog):
 class NewTeam(QtWidgets.QDialog):
     def __init__(self):
         super(NewTeam, self).__init__()
-        uic.loadUi(f"ui{os.sep}new_team.ui", self)
+        utils.load_ui("new_team", self)
         self.logger = logging.getLogger("Main.NewTeam")
         self.logger.info("Generating New Team from Dialog")
         self.setWindowTitle("New Team")
@@ -56,9 +59,9 @@ class NewTeam(QtWidgets.QDialog):
 class TieDialog(QtWidgets.QDialog):
     team_changed = pyqtSignal()
 
-    def __init__(self, team_1_id=None, team_2_id=None):
+    def __init__(self, roster, team_1_id=None, team_2_id=None, events=utils.events[1:]):
         super(TieDialog, self).__init__()
-        uic.loadUi(f"ui{os.sep}new_tie.ui", self)
+        utils.load_ui("new_tie", self)
         self.logger = logging.getLogger("Main.NewTie")
         self.bb = self.findChild(QtWidgets.QDialogButtonBox)
         self.ok = self.bb.button(self.bb.Ok)
@@ -68,6 +71,8 @@ class TieDialog(QtWidgets.QDialog):
         self.team_2 = self.findChild(QtWidgets.QComboBox, "cb_team_2")
         self.tie_event = self.findChild(QtWidgets.QComboBox, "cb_event")
         self.winner = self.findChild(QtWidgets.QComboBox, "cb_winner")
+        self.roster = roster
+        self.events = events
         self.setup_combos(team_1_id, team_2_id)
         self.team_1.currentIndexChanged.connect(self.update_winner_box)
         self.team_1.currentIndexChanged.connect(self.update_combo_2)
@@ -82,16 +87,13 @@ class TieDialog(QtWidgets.QDialog):
         else:
             self.ok.setEnabled(True)
 
+    @instrument.timed("tie_dialog_setup")
     def setup_combos(self, team_1_id, team_2_id):
-        for event in utils.events:
+        for event in ["", *self.events]:
             self.tie_event.addItem(event)
 
-        query = QtSql.QSqlQuery()
-        query.exec_("SELECT id, Name FROM teams;")
-        while query.next():
-            self.team_1.addItem(query.value(1), query.value(0))
-        query.clear()
-        del query
+        for t_id, name in self.roster.teams():
+            self.team_1.addItem(name, t_id)
 
         if team_1_id:
             self.team_1.setCurrentIndex(self.team_1.findData(team_1_id))
@@ -103,17 +105,11 @@ class TieDialog(QtWidgets.QDialog):
 
     def update_combo_2(self):
         team_1_id = self.team_1.currentData()
-        query = QtSql.QSqlQuery()
-        query.exec_(f"SELECT Division from teams WHERE id = {team_1_id}")
-        query.next()
-        div = query.value(0)
-        query.exec_(f"SELECT id, Name FROM teams WHERE Division = '{div}';")
+        div = self.roster.division(team_1_id)
         self.team_2.clear()
-        while query.next():
-            if query.value(0) != team_1_id:
-                self.team_2.addItem(query.value(1), query.value(0))
-        query.clear()
-        del query
+        for t_id, name in self.roster.teams(div):
+            if t_id != team_1_id:
+                self.team_2.addItem(name, t_id)
 
     def update_winner_box(self):
         self.winner.clear()
@@ -122,12 +118,293 @@ class TieDialog(QtWidgets.QDialog):
         self.winner.addItem(self.team_2.currentText(), self.team_2.currentData())
 
 
+class TieBatchDialog(QtWidgets.QDialog):
+    def __init__(self, candidates):
+        super(TieBatchDialog, self).__init__()
+        utils.load_ui("batch_ties", self)
+        self.logger = logging.getLogger("Main.BatchTies")
+        self.setWindowTitle("Resolve Ties")
+        self.candidates = candidates
+        self.table = self.findChild(QtWidgets.QTableWidget, "tw_candidates")
+        self.winners = []
+        self.setup_table()
+
+    def setup_table(self):
+        self.table.setRowCount(len(self.candidates))
+        for row, tie in enumerate(self.candidates):
+            cells = [
+                utils.DIVISION_LEXICON[tie.division],
+                tie.event,
+                f"{tie.value:.2f}",
+                tie.team_1,
+                tie.team_2,
+            ]
+            for col, text in enumerate(cells):
+                self.table.setItem(row, col, QtWidgets.QTableWidgetItem(text))
+
+            winner = QtWidgets.QComboBox()
+            winner.addItem("", -1)
+            winner.addItem(tie.team_1, tie.team_1_id)
+            winner.addItem(tie.team_2, tie.team_2_id)
+            self.table.setCellWidget(row, 5, winner)
+            self.winners.append(winner)
+        self.table.resizeColumnsToContents()
+
+    def resolutions(self):
+        """Candidates that were given a winner as (candidate, winner id)"""
+        return [
+            (tie, winner.currentData())
+            for tie, winner in zip(self.candidates, self.winners)
+            if winner.currentData() != -1
+        ]
+
+
+class RecordsDialog(QtWidgets.QDialog):
+    def __init__(self, records, parent=None):
+        super(RecordsDialog, self).__init__(parent=parent)
+        utils.load_ui("records", self)
+        self.setWindowTitle("Records")
+        self.table = self.findChild(QtWidgets.QTableWidget, "tw_records")
+        rows = records.table()
+        self.table.setRowCount(len(rows))
+        for row, (event, division, value, year, school, name) in enumerate(rows):
+            cells = [
+                event,
+                utils.DIVISION_LEXICON[division],
+                f"{value:.2f}",
+                str(year or ""),
+                school or "",
+                name or "",
+            ]
+            for col, text in enumerate(cells):
+                self.table.setItem(row, col, QtWidgets.QTableWidgetItem(text))
+        self.table.resizeColumnsToContents()
+
+
+class AuditDialog(QtWidgets.QDialog):
+    """Browses the TXN history of an audit.AuditLog, filtered as the filters change
+
+    comp is the database path of the competition shown, None shows them all.
+    """
+
+    def __init__(self, audit, events, comp=None, parent=None):
+        super(AuditDialog, self).__init__(parent=parent)
+        utils.load_ui("audit", self)
+        self.setWindowTitle("Audit Log")
+        self.audit = audit
+        self.comp = comp
+        self.table = self.findChild(QtWidgets.QTableWidget, "tw_audit")
+        self.team = self.findChild(QtWidgets.QLineEdit, "le_team")
+        self.event = self.findChild(QtWidgets.QComboBox, "cb_event")
+        self.minutes = self.findChild(QtWidgets.QSpinBox, "sb_minutes")
+        self.event.addItems(["All Events", "School", "Name", "Division", *events])
+
+        self.team.textChanged.connect(self.refresh)
+        self.event.currentIndexChanged.connect(self.refresh)
+        self.minutes.valueChanged.connect(self.refresh)
+        self.refresh()
+
+    def refresh(self):
+        minutes = self.minutes.value()
+        entries = self.audit.query(
+            self.team.text(),
+            self.event.currentText() if self.event.currentIndex() else None,
+            datetime.timedelta(minutes=minutes) if minutes else None,
+            comp=self.comp,
+        )
+        self.table.setRowCount(len(entries))
+        for row, entry in enumerate(entries):
+            cells = [entry.time, entry.event or "", entry.teams or "", entry.message]
+            for col, text in enumerate(cells):
+                self.table.setItem(row, col, QtWidgets.QTableWidgetItem(str(text)))
+        self.table.resizeColumnsToContents()
+
+
+class EventEntryDialog(QtWidgets.QDialog):
+    """Keyboard only entry of one event's results for a division
+
+    Teams come up in running (id) order. Enter stages the typed result and
+    moves to the next team, an empty Enter skips a team and Up/Down move
+    between teams. Staged results are journaled as they are typed and written
+    together once the last team is entered, the event or division changes,
+    Save is pressed or the dialog is closed.
+    """
+
+    DIVISIONS = ["Men's", "Women's", "Co-Ed", "Alumni"]
+
+    def __init__(self, events, units, journal, commit, event=None, division=None, parent=None):
+        super(EventEntryDialog, self).__init__(parent=parent)
+        utils.load_ui("event_entry", self)
+        self.logger = logging.getLogger("Main.Entry")
+        self.events = {e.name: e for e in events}
+        self.units = units
+        self.journal = journal
+        self.commit = commit
+        self.event = None
+        self.division = None
+        self.division_name = None
+        # [(id, school, name, saved value)] in running order
+        self.teams = []
+        # row -> (journal seq, value) typed but not yet written
+        self.staged = {}
+        self.row = 0
+
+        self.table = self.findChild(QtWidgets.QTableWidget, "tw_entries")
+        self.status = self.findChild(QtWidgets.QStatusBar, "sb_entry")
+        self.team = self.findChild(QtWidgets.QLabel, "l_team")
+        self.result = self.findChild(QtWidgets.QLineEdit, "le_result")
+        self.result.installEventFilter(self)
+        button_box = self.findChild(QtWidgets.QDialogButtonBox, "buttonBox")
+        button_box.button(QtWidgets.QDialogButtonBox.Save).clicked.connect(self.save)
+
+        self.cb_event = self.findChild(QtWidgets.QComboBox, "cb_event")
+        self.cb_event.addItems(list(self.events))
+        if event in self.events:
+            self.cb_event.setCurrentText(event)
+        self.cb_division = self.findChild(QtWidgets.QComboBox, "cb_division")
+        self.cb_division.addItems(self.DIVISIONS)
+        if division in self.DIVISIONS:
+            self.cb_division.setCurrentText(division)
+        self.cb_event.currentTextChanged.connect(self.load)
+        self.cb_division.currentTextChanged.connect(self.load)
+        self.load()
+
+    def text(self, value):
+        return reports.format_value(self.event, value, self.units)
+
+    def load(self):
+        """Show the teams of the selected division for the selected event"""
+        if not self.save():
+            # Staged results are kept by row, they only fit the teams shown
+            self.status.showMessage("Save the results entered before switching", 5000)
+            for combo, text in [
+                (self.cb_event, self.event.name),
+                (self.cb_division, self.division_name),
+            ]:
+                combo.blockSignals(True)
+                combo.setCurrentText(text)
+                combo.blockSignals(False)
+            return
+        self.event = self.events[self.cb_event.currentText()]
+        self.division_name = self.cb_division.currentText()
+        self.division = utils.DIVISION_LEXICON[self.division_name]
+
+        query = queries.Query()
+        query.prepare(
+            f'SELECT id, School, Name, "{self.event.name}" FROM teams '
+            f"WHERE Division = ? ORDER BY id;"
+        )
+        query.addBindValue(self.division)
+        query.exec_()
+        self.teams = []
+        while query.next():
+            self.teams.append(tuple(query.value(i) for i in range(4)))
+        query.clear()
+
+        self.table.setRowCount(len(self.teams))
+        for row, (t_id, school, name, value) in enumerate(self.teams):
+            cells = [str(t_id), school or "", name or "", self.text(value), ""]
+            for col, text in enumerate(cells):
+                self.table.setItem(row, col, QtWidgets.QTableWidgetItem(text))
+        self.table.resizeColumnsToContents()
+
+        if self.event.kind == "time":
+            self.result.setValidator(delegates.TimeValidator(self.result, self.status))
+        else:
+            self.result.setValidator(
+                delegates.DistValidator(self.result, self.status, self.event.dq)
+            )
+
+        # Pick up where entry stopped, at the first team without a result
+        missing = [row for row, team in enumerate(self.teams) if team[3] in [None, ""]]
+        self.go_to(missing[0] if missing else 0)
+        self.result.setFocus()
+
+    def go_to(self, row):
+        if not self.teams:
+            self.team.setText("No teams in this division")
+            return
+        self.row = max(0, min(row, len(self.teams) - 1))
+        t_id, school, name, _ = self.teams[self.row]
+        self.table.selectRow(self.row)
+        self.team.setText(f"#{t_id} {school or ''} - {name}")
+        # Show a staged result so it can be corrected by typing over it
+        if self.row in self.staged:
+            self.result.setText(self.text(self.staged[self.row][1]))
+        else:
+            self.result.clear()
+        self.result.selectAll()
+
+    def enter(self):
+        if not self.teams:
+            return
+        parse = self.result.validator().parse(self.result.text().strip())
+        if parse.state != QtGui.QValidator.Acceptable:
+            self.status.showMessage("Result is incomplete", 2500)
+            return
+        if parse.value is not None:
+            self.stage(self.row, parse.value)
+
+        # The last team closes the heat, write everything keyed in
+        if self.row == len(self.teams) - 1:
+            self.save()
+        self.go_to(self.row + 1)
+
+    def stage(self, row, value):
+        t_id, _, _, saved = self.teams[row]
+        if row in self.staged:
+            self.journal.done(self.staged.pop(row)[0])
+        if value != saved:
+            self.staged[row] = (self.journal.record(t_id, self.event.name, value), value)
+        self.table.item(row, 4).setText(self.text(value) if row in self.staged else "")
+
+    def save(self) -> bool:
+        """Write the staged results, False if they could not be"""
+        if not self.staged:
+            return True
+        rows = sorted(self.staged)
+        entries = [
+            (self.teams[row][0], self.event.name, self.teams[row][3], self.staged[row][1])
+            for row in rows
+        ]
+        if not self.commit(entries, f"Enter {len(rows)} {self.event.name} Results"):
+            # Still journaled, replayed the next time the competition opens
+            return False
+
+        for row in rows:
+            seq, value = self.staged.pop(row)
+            self.journal.done(seq)
+            t_id, school, name, _ = self.teams[row]
+            self.teams[row] = (t_id, school, name, value)
+            self.table.item(row, 3).setText(self.text(value))
+            self.table.item(row, 4).setText("")
+        self.status.showMessage(f"Saved {len(rows)} {self.event.name} results", 2500)
+        return True
+
+    def eventFilter(self, source, event):
+        if source is self.result and event.type() == QtCore.QEvent.KeyPress:
+            if event.key() in [QtCore.Qt.Key_Return, QtCore.Qt.Key_Enter]:
+                self.enter()
+                return True
+            if event.key() == QtCore.Qt.Key_Up:
+                self.go_to(self.row - 1)
+                return True
+            if event.key() == QtCore.Qt.Key_Down:
+                self.go_to(self.row + 1)
+                return True
+        return super(EventEntryDialog, self).eventFilter(source, event)
+
+    def done(self, result):
+        self.save()
+        super(EventEntryDialog, self).done(result)
+
+
 class RetryDialog(QtWidgets.QDialog):
     retry = pyqtSignal()
 
     def __init__(self, title, text, acc_text):
         super(RetryDialog, self).__init__()
-        uic.loadUi(f"ui{os.sep}diag_retry_accept_reject.ui", self)
+        utils.load_ui("diag_retry_accept_reject", self)
         self.logger = logging.getLogger("Main.NewComp")
         self.logger.warning(f"{title} Error Occurred, Attempting to Recover")
         self.setWindowTitle(title)
@@ -146,7 +423,7 @@ class RetryDialog(QtWidgets.QDialog):
 class SettingsDialog(QtWidgets.QDialog):
     def __init__(self, parent):
         super(SettingsDialog, self).__init__(parent=parent)
-        uic.loadUi(f"ui{os.sep}settings_menu.ui", self)
+        utils.load_ui("settings_menu", self)
         # TODO: Load from settings file for default checked boxes
         self.settings = self.parent().settings
         self.host = self.findChild(QtWidgets.QLineEdit, "v_settings_host")
@@ -0,0 +1,227 @@
+"""Timing feed ingestion
+
+Reads results from a stopwatch or timing console as lines of
+team id,event,time e.g. 12,Mucking,1:05.32 or 12,Swede Saw,DQ. The feed can
+be a file that is appended to, a named pipe or a TCP socket. Times follow the
+same rules as typing them into the table.
+
+Run directly it is a local stand-in for a timing console:
+
+    python feed.py --port 5555 --teams 24
+    python feed.py --path feed.csv --teams 24 --interval 0.5
+    python feed.py --port 5555 --replay results.csv
+"""
+import argparse
+import csv
+import logging
+import os
+import random
+import select
+import socket
+import stat
+import sys
+import time
+from collections import namedtuple
+from PyQt5 import QtCore, QtGui
+import delegates
+
+FeedResult = namedtuple("FeedResult", ["team_id", "event", "value", "line"])
+
+# Seconds to wait for more data, and at most hold lines, before handing them over
+POLL_INTERVAL = 0.25
+
+# Lines handed over at most in one batch
+MAX_BATCH = 200
+
+DEFAULT_SOURCE = "tcp://127.0.0.1:5555"
+
+
+def parse_line(line, events):
+    """FeedResult of one feed line, raises ValueError with the reason it was rejected
+
+    events maps the casefolded names of the timed events to their proper name.
+    """
+    fields = next(csv.reader([line]))
+    if len(fields) != 3:
+        raise ValueError("Expected team id,event,time")
+    team, event, value = (field.strip() for field in fields)
+    if not team.isdigit():
+        raise ValueError(f"Invalid team id {team}")
+    if event.casefold() not in events:
+        raise ValueError(f"Unknown timed event {event}")
+    result = delegates.parse_time(value)
+    if result.state != QtGui.QValidator.Acceptable or result.value is None:
+        raise ValueError(result.message or f"Invalid time {value}")
+    return FeedResult(int(team), events[event.casefold()], result.value, line)
+
+
+def parse_address(source):
+    """(host, port) of a tcp://host:port source, None for a path
+
+    Raises ValueError for a tcp source without a host or a valid port.
+    """
+    if not source.startswith("tcp://"):
+        return None
+    host, _, port = source[len("tcp://"):].rpartition(":")
+    if not host or not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"Expected tcp://host:port, not {source}")
+    return host, int(port)
+
+
+class FeedReader(QtCore.QThread):
+    """Tails a timing feed and hands parsed results to the GUI thread in batches
+
+    source is tcp://host:port or the path of a file or named pipe. Files are
+    tailed from their current end, lines written before the feed started are
+    not applied again.
+    """
+
+    received = QtCore.pyqtSignal(list)
+    rejected = QtCore.pyqtSignal(str, str)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, source, events, parent=None):
+        super(FeedReader, self).__init__(parent)
+        self.logger = logging.getLogger("Main.Feed")
+        self.source = source
+        self.events = {event.name.casefold(): event.name for event in events}
+        self.running = False
+
+    def stop(self):
+        self.running = False
+        self.wait()
+
+    def run(self):
+        self.running = True
+        self.logger.info(f"Reading timing feed {self.source}")
+        try:
+            self.read(self.chunks())
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Timing feed {self.source} failed: {e}")
+            self.failed.emit(str(e))
+        self.logger.info(f"Stopped timing feed {self.source}")
+
+    def chunks(self):
+        """Bytes read from the source, b"" whenever nothing arrived for a poll"""
+        address = parse_address(self.source)
+        if address:
+            return self.socket_chunks(*address)
+        if stat.S_ISFIFO(os.stat(self.source).st_mode):
+            return self.pipe_chunks(self.source)
+        return self.file_chunks(self.source)
+
+    def socket_chunks(self, host, port):
+        with socket.create_connection((host, port), timeout=5) as connection:
+            connection.settimeout(POLL_INTERVAL)
+            while self.running:
+                try:
+                    data = connection.recv(4096)
+                except socket.timeout:
+                    yield b""
+                    continue
+                if not data:
+                    raise ConnectionError(f"Timing console at {host}:{port} disconnected")
+                yield data
+
+    def pipe_chunks(self, path):
+        # Non blocking so a pipe with no writer yet can still be stopped
+        fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            while self.running:
+                ready, _, _ = select.select([fd], [], [], POLL_INTERVAL)
+                data = os.read(fd, 4096) if ready else b""
+                if ready and not data:
+                    # Writer closed the pipe, wait for the next one
+                    time.sleep(POLL_INTERVAL)
+                yield data
+        finally:
+            os.close(fd)
+
+    def file_chunks(self, path):
+        with open(path, "rb") as file:
+            file.seek(0, os.SEEK_END)
+            while self.running:
+                data = file.read(4096)
+                if not data:
+                    time.sleep(POLL_INTERVAL)
+                yield data
+
+    def read(self, chunks):
+        buffer = b""
+        batch = []
+        started = 0
+        for data in chunks:
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for raw in lines:
+                line = raw.decode("utf-8", "replace").strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    if not batch:
+                        started = time.monotonic()
+                    batch.append(parse_line(line, self.events))
+                except ValueError as e:
+                    self.logger.warning(f"Rejected feed line {line!r}: {e}")
+                    self.rejected.emit(line, str(e))
+
+            # Hand over once the feed goes quiet, the batch is full or has waited
+            # a poll interval on a feed that never goes quiet
+            if batch and (
+                not data
+                or len(batch) >= MAX_BATCH
+                or time.monotonic() - started >= POLL_INTERVAL
+            ):
+                self.received.emit(batch)
+                batch = []
+        if batch:
+            self.received.emit(batch)
+
+
+def stand_in_lines(teams, events, rnd):
+    while True:
+        event = rnd.choice(events)
+        seconds = rnd.uniform(60, 600)
+        value = "DQ" if rnd.random() < 0.02 else f"{int(seconds // 60)}:{seconds % 60:05.2f}"
+        yield f"{rnd.randint(1, teams)},{event},{value}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for a timing console")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--port", type=int, help="serve the feed on this TCP port")
+    target.add_argument("--path", help="append the feed to this file or named pipe")
+    parser.add_argument("--teams", type=int, default=24, help="highest team id")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between lines")
+    parser.add_argument("--replay", help="send the lines of this file instead of random times")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        with open(args.replay, encoding="utf-8") as file:
+            lines = [line.strip() for line in file if line.strip()]
+    else:
+        events = ["Mucking", "Swede Saw", "Track Stand", "Gold Pan"]
+        lines = stand_in_lines(args.teams, events, random.Random(args.seed))
+
+    if args.port:
+        server = socket.create_server(("127.0.0.1", args.port))
+        print(f"Waiting for the application on tcp://127.0.0.1:{args.port}")
+        connection, _ = server.accept()
+        output = connection.makefile("w", encoding="utf-8")
+    else:
+        output = open(args.path, "a", encoding="utf-8")
+
+    try:
+        for line in lines:
+            output.write(f"{line}\n")
+            output.flush()
+            print(line)
+            time.sleep(args.interval)
+    except (KeyboardInterrupt, BrokenPipeError, ConnectionError):
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
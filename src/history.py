@@ -0,0 +1,142 @@
+import logging
+from PyQt5 import QtCore, QtWidgets
+import queries
+import utils
+
+
+class History(QtWidgets.QUndoStack):
+    """Undo stack for team and tie edits
+
+    Commands keep only the columns they change. Their statements are queued
+    while the stack moves and written in one transaction once it settles, so
+    jumping back several steps is a single commit.
+    """
+
+    # Names of the tables written by the last undo/redo
+    changed = QtCore.pyqtSignal(set)
+    # Emitted before an undo/redo is written, edits held elsewhere go first
+    about_to_write = QtCore.pyqtSignal()
+
+    def __init__(self, db, parent=None):
+        super(History, self).__init__(parent)
+        self.logger = logging.getLogger("Main.History")
+        self.db = db
+        self.pending = []
+        self.indexChanged.connect(self.flush)
+
+    def queue(self, table, sql, values):
+        self.pending.append((table, sql, values))
+
+    def flush(self):
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+
+        self.about_to_write.emit()
+        self.db.transaction()
+        query = queries.Query(self.db)
+        for table, sql, values in pending:
+            query.prepare(sql)
+            for value in values:
+                query.addBindValue(value)
+            if not query.exec_():
+                self.db.rollback()
+                # The stack no longer matches the database, it can't be trusted
+                self.clear()
+                utils.alert("Error", "Unable to undo/redo, history was cleared", "crit")
+                return
+        self.db.commit()
+        query.clear()
+        self.changed.emit({table for table, _, _ in pending})
+
+
+class CellEdit(QtWidgets.QUndoCommand):
+    """One column of one row changed from old to new
+
+    Pushed after the edit was written, so the first redo does nothing.
+    """
+
+    def __init__(self, history, table, row_id, column, old, new, text):
+        super(CellEdit, self).__init__(text)
+        self.history = history
+        self.table = table
+        self.row_id = row_id
+        self.column = column
+        self.old = old
+        self.new = new
+        self.applied = True
+        # Audit index fields, ties rows have no single team
+        self.extra = {"teams": {row_id: None}, "event": column} if table == "teams" else {}
+
+    def write(self, value):
+        self.history.queue(
+            self.table,
+            f'UPDATE {self.table} SET "{self.column}" = ? WHERE id = ?;',
+            [value, self.row_id],
+        )
+
+    def redo(self):
+        if self.applied:
+            self.applied = False
+            return
+        self.history.logger.txn(f"[Redo] {self.text()}", extra=self.extra)
+        self.write(self.new)
+
+    def undo(self):
+        self.history.logger.txn(f"[Undo] {self.text()}", extra=self.extra)
+        self.write(self.old)
+
+
+class RowChange(QtWidgets.QUndoCommand):
+    """A row inserted into or deleted from a table
+
+    Only the non NULL columns of the row are kept. Like CellEdit it is pushed
+    after the change was written.
+    """
+
+    def __init__(self, history, table, row_id, values, inserted, text):
+        super(RowChange, self).__init__(text)
+        self.history = history
+        self.table = table
+        self.row_id = row_id
+        self.values = {k: v for k, v in values.items() if v is not None and k != "id"}
+        self.inserted = inserted
+        self.applied = True
+        if table == "teams":
+            self.extra = {"teams": {row_id: self.values.get("Name")}}
+        else:
+            self.extra = {
+                "teams": {self.values.get("team_1_id"): None, self.values.get("team_2_id"): None},
+                "event": self.values.get("event"),
+            }
+
+    def insert(self):
+        columns = ", ".join(f'"{c}"' for c in self.values)
+        marks = ", ".join("?" for _ in self.values)
+        self.history.queue(
+            self.table,
+            f"INSERT INTO {self.table} (id, {columns}) VALUES (?, {marks});",
+            [self.row_id, *self.values.values()],
+        )
+
+    def delete(self):
+        self.history.queue(
+            self.table, f"DELETE FROM {self.table} WHERE id = ?;", [self.row_id]
+        )
+
+    def redo(self):
+        if self.applied:
+            self.applied = False
+            return
+        self.history.logger.txn(f"[Redo] {self.text()}", extra=self.extra)
+        if self.inserted:
+            self.insert()
+        else:
+            self.delete()
+
+    def undo(self):
+        self.history.logger.txn(f"[Undo] {self.text()}", extra=self.extra)
+        if self.inserted:
+            self.delete()
+        else:
+            self.insert()
@@ -0,0 +1,161 @@
+"""Lightweight timing spans for the scoring and table hot paths
+
+Spans are logged to Main.Perf at DEBUG when they finish, together with any
+counters (e.g. SQL statements) incremented while they were open. Setting the
+MUCKING_TRACE environment variable to a file path additionally records every
+span in Chrome trace format (load it in chrome://tracing or Perfetto).
+
+    with instrument.span("comp_score"):
+        ...
+
+    @instrument.timed("db_setup")
+    def db_setup(self):
+        ...
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from PyQt5 import QtCore
+
+logger = logging.getLogger("Main.Perf")
+
+_local = threading.local()
+_trace_lock = threading.Lock()
+_trace_events = None
+_trace_path = None
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+class Span:
+    __slots__ = ["name", "args", "counters", "start", "elapsed"]
+
+    def __init__(self, name, args=None):
+        self.name = name
+        self.args = args or {}
+        self.counters = {}
+        self.start = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        _stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.elapsed = time.perf_counter() - self.start
+        _stack().pop()
+
+        counters = "".join(f" [{k}={v}]" for k, v in self.counters.items())
+        logger.debug(f"{self.name} took {self.elapsed * 1000:.2f} ms{counters}")
+        _record(self.name, self.start, self.elapsed, {**self.args, **self.counters})
+        return False
+
+
+def span(name, **args) -> Span:
+    """Context manager timing the enclosed block"""
+    return Span(name, args)
+
+
+def timed(name=None):
+    """Decorator timing every call of the wrapped function"""
+
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(label):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def incr(counter, n=1):
+    """Increment a counter on every open span of the current thread"""
+    for active in _stack():
+        active.counters[counter] = active.counters.get(counter, 0) + n
+
+
+class Batch:
+    """Aggregates many tiny timings (e.g. per cell paints) into one record
+
+    The batch is flushed once control returns to the event loop, so a single
+    repaint of the table is reported as one line rather than one per cell.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.elapsed = 0.0
+        self.first = 0.0
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        if not self.count:
+            self.first = self.start
+            QtCore.QTimer.singleShot(0, self.flush)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.elapsed += time.perf_counter() - self.start
+        self.count += 1
+        return False
+
+    def flush(self):
+        if not self.count:
+            return
+        logger.debug(
+            f"{self.name} batch of {self.count} took {self.elapsed * 1000:.2f} ms"
+        )
+        _record(self.name, self.first, self.elapsed, {"count": self.count})
+        self.count = 0
+        self.elapsed = 0.0
+
+
+def _record(name, start, elapsed, args):
+    if _trace_events is None:
+        return
+    event = {
+        "name": name,
+        "ph": "X",
+        "ts": start * 1e6,
+        "dur": elapsed * 1e6,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": args,
+    }
+    with _trace_lock:
+        _trace_events.append(event)
+
+
+def start_trace(path):
+    """Record every span until stop_trace (or exit) writes them to path"""
+    global _trace_events, _trace_path
+    _trace_events = []
+    _trace_path = path
+    atexit.register(stop_trace)
+    logger.info(f"Recording trace to {path}")
+
+
+def stop_trace():
+    global _trace_events, _trace_path
+    if _trace_events is None:
+        return
+    with _trace_lock:
+        events, _trace_events = _trace_events, None
+    with open(_trace_path, "w") as trace_file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+    logger.info(f"Wrote {len(events)} trace events to {_trace_path}")
+    _trace_path = None
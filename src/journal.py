@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import pathlib
+import threading
+import queries
+import utils
+
+# Done markers written before the journal is rewritten in the background
+COMPACT_EVERY = 50
+
+COLUMNS = ["School", "Name", "Division", *utils.EVENT_SORTING]
+
+
+class Journal:
+    """Write-ahead journal of edits to the teams table
+
+    Each edit is appended and fsynced before it reaches the teams model and
+    a done marker follows once the model has committed it to the database. Edits
+    still pending when a competition is opened were lost to a crash and are
+    replayed into the database.
+    """
+
+    def __init__(self, path, columns=COLUMNS):
+        self.logger = logging.getLogger("Main.Journal")
+        self.path = pathlib.Path(path)
+        self.columns = columns
+        self.lock = threading.Lock()
+        self.file = None
+        self.seq = 0
+        self.done_count = 0
+
+    def read(self):
+        """({seq: entry} pending, last seq) from the journal on disk"""
+        pending = {}
+        last = 0
+        if not self.path.is_file():
+            return pending, last
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write
+                    self.logger.warning(f"Skipping damaged journal line {line!r}")
+                    continue
+                if "done" in entry:
+                    pending.pop(entry["done"], None)
+                else:
+                    pending[entry["seq"]] = entry
+                    last = max(last, entry["seq"])
+        return pending, last
+
+    def replay(self, db) -> int:
+        """Apply pending edits to db, returns the number recovered"""
+        pending, self.seq = self.read()
+        if not pending:
+            return 0
+
+        self.logger.warning(f"Replaying {len(pending)} unsaved edits")
+        db.transaction()
+        query = queries.Query(db)
+        for seq in sorted(pending):
+            entry = pending[seq]
+            if entry["column"] not in self.columns:
+                self.logger.error(f"Skipping edit of unknown column {entry['column']}")
+                continue
+            query.prepare(f'UPDATE teams SET "{entry["column"]}" = ? WHERE id = ?;')
+            query.addBindValue(entry["value"])
+            query.addBindValue(entry["id"])
+            if not query.exec_():
+                db.rollback()
+                return 0
+            self.logger.txn(
+                f"[Recovered] Team {entry['id']} - {entry['column']} -> {entry['value']}",
+                extra={"teams": {entry["id"]: None}, "event": entry["column"]},
+            )
+        db.commit()
+        query.clear()
+
+        # Everything is in the database now, start from an empty journal
+        self.path.unlink()
+        return len(pending)
+
+    def open(self):
+        if self.path.is_file():
+            self.seq = max(self.seq, self.read()[1])
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def write(self, entry, sync):
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+
+    def record(self, t_id, column, value) -> int:
+        with self.lock:
+            self.seq += 1
+            self.write({"seq": self.seq, "id": t_id, "column": column, "value": value}, True)
+            return self.seq
+
+    def done(self, seq):
+        # Not synced, losing a marker only means an idempotent replay
+        with self.lock:
+            self.write({"done": seq}, False)
+            self.done_count += 1
+            compact = self.done_count >= COMPACT_EVERY
+        if compact:
+            threading.Thread(target=self.compact, name="journal-compact", daemon=True).start()
+
+    def compact(self):
+        """Rewrite the journal with only the pending edits"""
+        with self.lock:
+            if not self.file:
+                return
+            self.file.close()
+            pending, _ = self.read()
+            temp = self.path.with_suffix(".tmp")
+            with open(temp, "w", encoding="utf-8") as file:
+                for seq in sorted(pending):
+                    file.write(json.dumps(pending[seq]) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp, self.path)
+            self.file = open(self.path, "a", encoding="utf-8")
+            self.done_count = 0
+        self.logger.debug(f"Compacted journal, {len(pending)} edits pending")
+
+    def close(self):
+        if not self.file:
+            return
+        self.compact()
+        with self.lock:
+            self.file.close()
+            self.file = None
+            if self.path.stat().st_size == 0:
+                self.path.unlink()
@@ -0,0 +1,214 @@
+"""Log storage
+
+One log file per day in logs/, rolled over when it grows past MAX_BYTES.
+Rolled over files are gzipped in the background and compressed logs are
+removed once older than KEEP_DAYS or beyond MAX_TOTAL_BYTES. TXN records are
+also written to an SQLite index by team and event so an audit never has to
+read the logs themselves.
+"""
+import gzip
+import logging
+import os
+import pathlib
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+import utils
+
+MAX_BYTES = 5 * 1024 * 1024
+KEEP_DAYS = 90
+MAX_TOTAL_BYTES = 500 * 1024 * 1024
+
+INDEX_NAME = "txn_index.db"
+
+INDEX_SQL = """
+create table if not exists txn (
+    id integer primary key,
+    time text not null,
+    logger text not null,
+    event text,
+    message text not null,
+    comp text
+);
+create table if not exists txn_team (
+    txn_id integer not null references txn on delete cascade,
+    team_id integer,
+    team text
+);
+create index if not exists txn_time on txn (time);
+create index if not exists txn_event on txn (event, time);
+create index if not exists txn_team_id on txn_team (team_id, txn_id);
+"""
+
+# Indexes written before the competition was recorded lack the column
+COMP_SQL = """
+alter table txn add column comp text;
+"""
+
+COMP_INDEX_SQL = """
+create index if not exists txn_comp on txn (comp, time);
+"""
+
+
+def index_setup(connection):
+    """Create or bring up to date the TXN index tables"""
+    connection.executescript(INDEX_SQL)
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(txn);")]
+    if "comp" not in columns:
+        connection.executescript(COMP_SQL)
+    connection.executescript(COMP_INDEX_SQL)
+
+
+def comp_key(path):
+    """How a competition is told apart in the index, its absolute database path"""
+    return os.path.abspath(path) if path else None
+
+
+# Serializes compression and pruning, rollovers can overlap a slow gzip
+TIDY_LOCK = threading.Lock()
+
+
+def compress(path):
+    """Replace path with path.gz, written to a temporary file first"""
+    path = pathlib.Path(path)
+    target = path.with_name(path.name + ".gz")
+    temp = path.with_name(path.name + ".gz.tmp")
+    with open(path, "rb") as source, gzip.open(temp, "wb") as output:
+        shutil.copyfileobj(source, output)
+    os.replace(temp, target)
+    path.unlink()
+
+
+def prune(directory, keep_days=KEEP_DAYS, max_total=MAX_TOTAL_BYTES):
+    """Remove compressed logs past the retention period, oldest first past the size cap"""
+    cutoff = time.time() - keep_days * 24 * 60 * 60
+    logs = sorted(pathlib.Path(directory).glob("mucking_*.log.gz"), key=lambda p: p.stat().st_mtime)
+    kept = []
+    for path in logs:
+        if path.stat().st_mtime < cutoff:
+            path.unlink()
+        else:
+            kept.append(path)
+    total = sum(path.stat().st_size for path in kept)
+    while kept and total > max_total:
+        path = kept.pop(0)
+        total -= path.stat().st_size
+        path.unlink()
+
+
+def tidy(directory, current=None):
+    """Compress every plain log except current and apply the retention policy"""
+    logger = logging.getLogger("Main.Logs")
+    with TIDY_LOCK:
+        for temp in pathlib.Path(directory).glob("mucking_*.gz.tmp"):
+            # Left behind by a compression cut short when the app exited
+            temp.unlink()
+        for path in pathlib.Path(directory).glob("mucking_*.log"):
+            if current and path == pathlib.Path(current):
+                continue
+            try:
+                compress(path)
+            except OSError:
+                logger.exception(f"Unable to compress {path.name}")
+        prune(directory)
+
+
+def tidy_later(directory, current=None):
+    threading.Thread(
+        target=tidy, args=(directory, current), name="log-tidy", daemon=True
+    ).start()
+
+
+class DailyFileHandler(logging.FileHandler):
+    """mucking_<date>.log in directory, rolled over daily and past max_bytes
+
+    A file rolled over for size is renamed mucking_<date>.<time>.log. Rolled
+    over files are compressed in the background.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.directory = pathlib.Path(directory)
+        self.max_bytes = max_bytes
+        self.day = date.today()
+        super(DailyFileHandler, self).__init__(self.day_file(self.day), encoding="utf-8")
+
+    def day_file(self, day):
+        return self.directory / f"mucking_{day}.log"
+
+    def should_rollover(self):
+        if date.today() != self.day:
+            return True
+        return self.stream is not None and self.stream.tell() >= self.max_bytes
+
+    def rollover(self):
+        self.stream.close()
+        self.stream = None
+        current = pathlib.Path(self.baseFilename)
+        if date.today() == self.day:
+            rolled = current.with_name(f"{current.stem}.{datetime.now():%H%M%S%f}.log")
+            os.replace(current, rolled)
+        self.day = date.today()
+        self.baseFilename = str(self.day_file(self.day))
+        self.stream = self._open()
+        tidy_later(self.directory, self.baseFilename)
+
+    def emit(self, record):
+        try:
+            if self.should_rollover():
+                self.rollover()
+        except OSError:
+            self.handleError(record)
+            return
+        super(DailyFileHandler, self).emit(record)
+
+
+class TxnIndexHandler(logging.Handler):
+    """Writes TXN records to the index
+
+    Call sites describe a record with extra={"teams": {id: name}, "event": name},
+    records without them are indexed by time only. comp is the comp_key of
+    the competition open, None while none is.
+    """
+
+    def __init__(self, path):
+        super(TxnIndexHandler, self).__init__(level=utils.TXN_LEVEL_NUM)
+        self.comp = None
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        index_setup(self.connection)
+        self.connection.execute("PRAGMA journal_mode=WAL;")
+        self.connection.execute("PRAGMA synchronous=NORMAL;")
+
+    def emit(self, record):
+        if record.levelno != utils.TXN_LEVEL_NUM or not self.connection:
+            return
+        try:
+            cursor = self.connection.execute(
+                "INSERT INTO txn (time, logger, event, message, comp) VALUES (?, ?, ?, ?, ?);",
+                [
+                    datetime.fromtimestamp(record.created).isoformat(" ", "seconds"),
+                    record.name,
+                    getattr(record, "event", None),
+                    record.getMessage(),
+                    self.comp,
+                ],
+            )
+            teams = getattr(record, "teams", None) or {}
+            self.connection.executemany(
+                "INSERT INTO txn_team (txn_id, team_id, team) VALUES (?, ?, ?);",
+                [(cursor.lastrowid, t_id, name) for t_id, name in teams.items()],
+            )
+            self.connection.commit()
+        except sqlite3.Error:
+            self.handleError(record)
+
+    def close(self):
+        self.acquire()
+        try:
+            if self.connection:
+                self.connection.close()
+                self.connection = None
+        finally:
+            self.release()
+        super(TxnIndexHandler, self).close()
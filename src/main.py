@@ -1,17 +1,223 @@
+import gc
 import logging
 import os
 import sqlite3
 import sys
-from datetime import datetime
-from PyQt5 import QtCore, QtWidgets, uic, QtSql
+import time
+from math import isclose
+from PyQt5 import QtCore, QtGui, QtWidgets, QtSql
+import archive
+import audit
 import dialogs
 import delegates
+import feed
+import history
+import instrument
+import journal
+import logstore
+import queries
+import recent
+import records
+import registry
+import reports
+import roster
+import standings
 import utils
 import ties
 import pathlib
 
 VERSION = "2020.01.00"
 
+# Milliseconds edits to the teams table are held before they are written
+FLUSH_DELAY = 2000
+
+
+class TableModel(QtSql.QSqlTableModel):
+    """QSqlTableModel timing select, for the teams table also journaling edits
+
+    With a journal set, the model runs OnManualSubmit. Each edit is journaled
+    (fsynced) before it reaches the model cache, so the journal is what makes
+    it durable. Cached edits are written to the database in one transaction
+    by flush, at most FLUSH_DELAY after the first one and before anything
+    reads or writes teams directly. Journal entries are only marked done
+    once their edit is committed.
+    """
+
+    # Set on the teams model, edits are pushed to the undo history after
+    journal = None
+    history = None
+
+    def __init__(self, parent=None):
+        super(TableModel, self).__init__(parent)
+        self.logger = logging.getLogger("Main.Teams")
+        # (journal seq, id, column, value) of edits not in the database yet
+        self.unsaved = []
+        self.flush_timer = QtCore.QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(FLUSH_DELAY)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if not self.journal or role != QtCore.Qt.EditRole:
+            return super(TableModel, self).setData(index, value, role)
+        t_id = self.data(index.siblingAtColumn(0), QtCore.Qt.EditRole)
+        column = self.record().fieldName(index.column())
+        old = self.data(index, QtCore.Qt.EditRole)
+        seq = self.journal.record(t_id, column, value)
+        result = super(TableModel, self).setData(index, value, role)
+        if not result:
+            # Left pending in the journal, replayed when the competition next opens
+            self.logger.error(f"Unable to set team {t_id} {column} to {value}")
+            return result
+        self.unsaved.append((seq, t_id, column, value))
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+        if self.history is not None:
+            name = self.data(index.siblingAtColumn(2), QtCore.Qt.EditRole)
+            self.history.push(
+                history.CellEdit(
+                    self.history, "teams", t_id, column, old, value,
+                    f"{name} {column} {old} -> {value}",
+                )
+            )
+        return result
+
+    @QtCore.pyqtSlot()
+    @instrument.timed("teams_flush")
+    def flush(self) -> bool:
+        """Write the cached edits to the database in one transaction"""
+        self.flush_timer.stop()
+        if not self.unsaved:
+            return True
+        unsaved, self.unsaved = self.unsaved, []
+        db = self.database()
+        db.transaction()
+        query = queries.Query(db)
+        for _, t_id, column, value in unsaved:
+            query.prepare(f'UPDATE teams SET "{column}" = ? WHERE id = ?;')
+            query.addBindValue(value)
+            query.addBindValue(t_id)
+            if not query.exec_():
+                db.rollback()
+                query.clear()
+                # Still journaled, tried again on the next flush or replayed on open
+                self.unsaved = unsaved + self.unsaved
+                self.logger.error(f"Unable to save {len(unsaved)} edits")
+                utils.alert(
+                    "Error",
+                    "Unable to save results, they will be saved the next time "
+                    "the competition is opened",
+                    "crit",
+                )
+                return False
+        db.commit()
+        query.clear()
+        for seq, _, _, _ in unsaved:
+            self.journal.done(seq)
+        self.logger.debug(f"Saved {len(unsaved)} edits")
+        return True
+
+    @QtCore.pyqtSlot()
+    @instrument.timed("model_select")
+    def select(self):
+        # A select drops the cache, edits in it have to be written first
+        self.flush()
+        return super(TableModel, self).select()
+
+
+class TeamProxy(QtCore.QSortFilterProxyModel):
+    """Sorts the teams/ranks model on raw values and filters by search
+
+    Ascending puts the best result of an event first, DQs after every placed
+    result and missing results last in either direction. The first edit
+    holds the rows where they are, through the resets saving edits causes,
+    until a header is clicked, the model is switched or released, so rows
+    never move while scores are being entered.
+    """
+
+    def __init__(self, sorting, parent=None):
+        super(TeamProxy, self).__init__(parent)
+        self.sorting = sorting
+        self.matches = None
+        # {team id: row} while the order is held, None otherwise
+        self.held = None
+        self.setSortRole(QtCore.Qt.EditRole)
+        self.setDynamicSortFilter(False)
+
+    def setSourceModel(self, model):
+        if self.sourceModel():
+            self.sourceModel().modelReset.disconnect(self.resort)
+            self.sourceModel().dataChanged.disconnect(self.hold)
+        self.release()
+        super(TeamProxy, self).setSourceModel(model)
+        model.modelReset.connect(self.resort)
+        model.dataChanged.connect(self.hold)
+        self.resort()
+
+    def hold(self):
+        """Keep the rows in their current order until the next sort"""
+        if self.held is None and self.sortColumn() >= 0:
+            self.held = {
+                self.index(row, 0).data(QtCore.Qt.EditRole): row for row in range(self.rowCount())
+            }
+
+    def release(self):
+        """Sort normally again from the next reset"""
+        self.held = None
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        self.release()
+        super(TeamProxy, self).sort(column, order)
+
+    def resort(self):
+        # A reset sorts again by itself, lessThan keeps a held order through it
+        if self.held is None and self.sortColumn() >= 0:
+            self.sort(self.sortColumn(), self.sortOrder())
+
+    def held_key(self, index):
+        t_id = index.siblingAtColumn(0).data(QtCore.Qt.EditRole) or 0
+        # Teams added or shown since the hold go last, in id order
+        return self.held.get(t_id, len(self.held)), t_id
+
+    def set_matches(self, ids):
+        """Only show team ids in ids, None shows every team"""
+        self.matches = ids
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, row, parent):
+        if self.matches is None:
+            return True
+        t_id = self.sourceModel().index(row, 0, parent).data(QtCore.Qt.EditRole)
+        return t_id in self.matches
+
+    def lessThan(self, left, right):
+        if self.held is not None:
+            # Descending sorts call lessThan(right, left), undo that for a held order
+            if self.sortOrder() == QtCore.Qt.AscendingOrder:
+                return self.held_key(left) < self.held_key(right)
+            return self.held_key(left) > self.held_key(right)
+
+        a = left.data(QtCore.Qt.EditRole)
+        b = right.data(QtCore.Qt.EditRole)
+        a_empty = a in [None, ""]
+        b_empty = b in [None, ""]
+        if a_empty or b_empty:
+            if a_empty == b_empty:
+                return False
+            return b_empty == (self.sortOrder() == QtCore.Qt.AscendingOrder)
+
+        if isinstance(a, str) or isinstance(b, str):
+            return str(a).casefold() < str(b).casefold()
+
+        # Longer is better for Hand Steel/Jackleg, the DQ length (0) stays last
+        event = self.sourceModel().headerData(
+            left.column(), QtCore.Qt.Horizontal, QtCore.Qt.DisplayRole
+        )
+        descending = self.sorting.get(event) == "DESC"
+        if descending and self.sourceModel().tableName() == "teams":
+            return a > b
+        return a < b
+
 
 class GUI(QtWidgets.QMainWindow):
     # Define Class Signals
@@ -34,24 +240,26 @@ class GUI(QtWidgets.QMainWindow):
         console_handler.setFormatter(formatter)
         self.logger.addHandler(console_handler)
 
-        # Error Checking for log files
+        # Daily log files, rotated and compressed, with TXN records indexed
         logs_dir = pathlib.Path(f"{self.directory}{os.sep}logs")
-        log_file = pathlib.Path(
-            f"{logs_dir}{os.sep}mucking_{datetime.now().date()}.log"
-        )
         if not logs_dir.is_dir():
             logs_dir.mkdir()
-            if not log_file.exists():
-                log_file.touch()
 
-        file_handler = logging.FileHandler(
-            f"logs{os.sep}mucking_{datetime.now().date()}.log"
-        )
+        file_handler = logstore.DailyFileHandler(logs_dir)
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(formatter)
         self.logger.addHandler(file_handler)
+        self.txn_index = logstore.TxnIndexHandler(logs_dir / logstore.INDEX_NAME)
+        self.logger.addHandler(self.txn_index)
+        self.logs_dir = logs_dir
+        logstore.tidy_later(logs_dir, file_handler.baseFilename)
         self.logger.info("Logger Initalized")
 
+        # Optional Chrome trace of the instrumented hot paths
+        trace_file = os.environ.get("MUCKING_TRACE")
+        if trace_file:
+            instrument.start_trace(trace_file)
+
     def __init__(self):
         self.directory = QtCore.QDir.currentPath()
         self.data_dir = pathlib.Path(self.directory + os.sep + "data")
@@ -65,7 +273,7 @@ class GUI(QtWidgets.QMainWindow):
 
         # UI Setup
         super(GUI, self).__init__()
-        uic.loadUi(f"ui{os.sep}Mucking Score Tracker.ui", self)
+        utils.load_ui("Mucking Score Tracker", self)
         self.logger.info("Setting Up Main UI")
 
         # Placeholders for active competition variables
@@ -73,6 +281,23 @@ class GUI(QtWidgets.QMainWindow):
         self.db = None
         self.data_model = None
         self.rank_model = None
+        self.proxy = None
+        self.registry = None
+        self.standings = None
+        self.roster = None
+        self.records = None
+        self.journal = None
+        self.history = None
+        self.history_view = None
+        self.report_job = None
+        self.feed = None
+        # Feed results held back while a cell is being edited
+        self.feed_backlog = []
+        self.feed_retry = QtCore.QTimer(self)
+        self.feed_retry.setSingleShot(True)
+        self.feed_retry.setInterval(1000)
+        self.feed_retry.timeout.connect(lambda: self.feed_apply([]))
+        self.undo_group = QtWidgets.QUndoGroup(self)
         self.display = self.findChild(QtWidgets.QStackedWidget, "screens")
 
         # Active Comp Screen
@@ -83,12 +308,17 @@ class GUI(QtWidgets.QMainWindow):
         self.statusBar().addPermanentWidget(self.conn_status)
         self.c_filter = self.findChild(QtWidgets.QComboBox, "v_div_filter")
         self.c_filter.currentTextChanged.connect(self.model_filter)
+        self.le_search = self.findChild(QtWidgets.QLineEdit, "le_search")
+        self.le_search.textChanged.connect(self.team_search)
         self.rb_imperial = self.findChild(QtWidgets.QRadioButton, "rb_units_imperial")
         self.rb_imperial.toggled.connect(self.units_update)
         self.rb_metric = self.findChild(QtWidgets.QRadioButton, "rb_units_metric")
         self.rb_metric.toggled.connect(self.units_update)
         self.rb_rank = self.findChild(QtWidgets.QRadioButton, "rb_units_rank")
         self.rb_rank.toggled.connect(self.units_update)
+        self.rb_imperial.toggled.connect(self.model_change)
+        self.rb_metric.toggled.connect(self.model_change)
+        self.rb_rank.toggled.connect(self.model_change)
         self.team_table = self.findChild(QtWidgets.QTableView, "teams_table")
         self.team_table.installEventFilter(self)
         self.ties_window = None
@@ -96,7 +326,9 @@ class GUI(QtWidgets.QMainWindow):
         b_team_add.clicked.connect(self.team_create)
         b_comp_score = self.findChild(QtWidgets.QPushButton, "b_comp_score")
         b_comp_score.clicked.connect(self.comp_score)
-        self.local_delegates = None
+        # One delegate draws and edits every column, given formats per competition
+        self.delegate = delegates.TableDelegate(self)
+        self.team_table.setItemDelegate(self.delegate)
 
         # Welcome Screen
         self.logger.info("Setting Up Welcome Screen")
@@ -105,6 +337,11 @@ class GUI(QtWidgets.QMainWindow):
         b_load_comp.clicked.connect(self.comp_load)
         b_new_comp = self.findChild(QtWidgets.QPushButton, "b_new_comp")
         b_new_comp.clicked.connect(self.comp_create)
+        self.recent = recent.RecentIndex(self.data_dir / "recent.ini")
+        self.recent_list = self.findChild(QtWidgets.QListWidget, "lw_recent")
+        self.recent_list.itemClicked.connect(
+            lambda item: self.comp_recent(item.data(QtCore.Qt.UserRole))
+        )
 
         # Menu Setup
         self.logger.info("Setting Up Dropdown Menus")
@@ -112,12 +349,20 @@ class GUI(QtWidgets.QMainWindow):
         action_new.triggered.connect(self.comp_create)
         action_open = self.findChild(QtWidgets.QAction, "a_comp_open")
         action_open.triggered.connect(self.comp_load)
+        action_recent = self.findChild(QtWidgets.QAction, "a_comp_recent")
+        self.recent_menu = QtWidgets.QMenu(self)
+        action_recent.setMenu(self.recent_menu)
+        self.recent_refresh()
         action_close = self.findChild(QtWidgets.QAction, "a_comp_close")
-        action_close.triggered.connect(self.restart_app)
+        action_close.triggered.connect(self.comp_close)
         action_save = self.findChild(QtWidgets.QAction, "a_comp_save")
         action_save.triggered.connect(self.comp_save)
         action_save = self.findChild(QtWidgets.QAction, "a_comp_saveAs")
         action_save.triggered.connect(self.comp_save_as)
+        action_archive = self.findChild(QtWidgets.QAction, "a_comp_archive")
+        action_archive.triggered.connect(self.comp_archive)
+        action_report = self.findChild(QtWidgets.QAction, "a_comp_report")
+        action_report.triggered.connect(self.comp_report)
         action_quit = self.findChild(QtWidgets.QAction, "a_quit")
         action_quit.triggered.connect(self.close)
         action_settings = self.findChild(QtWidgets.QAction, "a_edit_preferences")
@@ -126,6 +371,32 @@ class GUI(QtWidgets.QMainWindow):
         action_add_team.triggered.connect(self.team_create)
         action_add_tie = self.findChild(QtWidgets.QAction, "a_edit_add_tie")
         action_add_tie.triggered.connect(lambda: self.tie_add(use_selections=True))
+        action_detect_ties = self.findChild(QtWidgets.QAction, "a_edit_detect_ties")
+        action_detect_ties.triggered.connect(self.tie_detect)
+        action_event_entry = self.findChild(QtWidgets.QAction, "a_edit_event_entry")
+        action_event_entry.triggered.connect(self.event_entry)
+        self.a_feed = self.findChild(QtWidgets.QAction, "a_edit_timing_feed")
+        self.a_feed.toggled.connect(self.feed_toggle)
+
+        action_view_ties = self.findChild(QtWidgets.QAction, "a_view_ties")
+        action_view_ties.triggered.connect(self.ties_show)
+        action_view_records = self.findChild(QtWidgets.QAction, "a_view_records")
+        action_view_records.triggered.connect(self.records_show)
+
+        action_view_history = self.findChild(QtWidgets.QAction, "a_view_history")
+        action_view_history.triggered.connect(self.history_show)
+        action_view_audit = self.findChild(QtWidgets.QAction, "a_view_audit")
+        action_view_audit.triggered.connect(self.audit_show)
+
+        menu_edit = self.findChild(QtWidgets.QMenu, "menuEdit")
+        action_undo = self.undo_group.createUndoAction(self)
+        action_undo.setShortcut(QtGui.QKeySequence.Undo)
+        action_redo = self.undo_group.createRedoAction(self)
+        action_redo.setShortcut(QtGui.QKeySequence.Redo)
+        first = menu_edit.actions()[0]
+        menu_edit.insertAction(first, action_undo)
+        menu_edit.insertAction(first, action_redo)
+        menu_edit.insertSeparator(first)
 
         # Context Menu Setup
         self.logger.info("Setting Up Context Menu")
@@ -146,15 +417,221 @@ class GUI(QtWidgets.QMainWindow):
         # Default to welcome screen
         self.display.setCurrentWidget(self.welcome_screen)
 
+        # Commit an open editor before the laptop sleeps or the app is hidden
+        QtWidgets.QApplication.instance().applicationStateChanged.connect(
+            self.editor_commit
+        )
+
         # Listen for settings changed signal settings update
         self.db_changed.connect(self.db_update)
 
     def db_update(self):
         self.logger.info("Database File Changed")
-        # TODO: Handle closing of DB
+        queries.set_slow_threshold(
+            self.settings.value("app/slow_query_ms", queries.DEFAULT_SLOW_MS)
+        )
         self.db_setup()
+        self.registry = registry.EventRegistry.from_settings(self.settings)
+        self.standings = standings.Standings(self.db, self.registry)
+        self.standings.migrate()
+        self.registry.bind(self.db)
+        self.standings.install()
+        self.journal_setup()
+        self.history = history.History(self.db, self)
+        self.history.changed.connect(self.history_applied)
+        self.history.about_to_write.connect(self.edits_flush)
+        self.undo_group.addStack(self.history)
+        self.undo_group.setActiveStack(self.history)
         self.model_setup()
         self.view_setup()
+        self.records = records.Records(
+            self.data_dir / "archive.db", self.settings.value("db/path")
+        )
+
+    def journal_setup(self):
+        self.journal = journal.Journal(
+            self.settings.value("db/path") + ".journal",
+            ["School", "Name", "Division", *self.registry.names],
+        )
+        recovered = self.journal.replay(self.db)
+        self.journal.open()
+        if recovered:
+            utils.alert(
+                "Recovered Edits",
+                f"Recovered {recovered} results that were not saved when the "
+                f"application last closed",
+                "warn",
+            )
+
+    def edits_flush(self):
+        """Write edits held by the teams model, before teams is used directly"""
+        return self.data_model.flush() if self.data_model else True
+
+    # Undo History Functions
+    def history_applied(self, tables):
+        if "teams" in tables:
+            self.data_model.select()
+        if "ties" in tables:
+            self.ties_window.model.select()
+
+    def event_entry(self):
+        if not self.settings:
+            return
+        self.editor_commit()
+        self.edits_flush()
+        # Start on the event and division being looked at
+        event = self.registry.team_columns.get(self.team_table.currentIndex().column())
+        diag = dialogs.EventEntryDialog(
+            self.registry.events,
+            reports.unit_settings(self.settings, self.registry.events),
+            self.journal,
+            self.results_commit,
+            event.name if event else None,
+            self.c_filter.currentText(),
+            parent=self,
+        )
+        diag.exec_()
+
+    def results_commit(self, entries, text):
+        """Write [(id, event, old, new)] results in a single transaction"""
+        self.logger.info(f"Saving {len(entries)} results")
+        self.edits_flush()
+        self.db.transaction()
+        query = queries.Query(self.db)
+        for t_id, event, _, value in entries:
+            query.prepare(f'UPDATE teams SET "{event}" = ? WHERE id = ?;')
+            query.addBindValue(value)
+            query.addBindValue(t_id)
+            if not query.exec_():
+                query.clear()
+                self.db.rollback()
+                utils.alert("Error", f"Unable to save {event} results", "crit")
+                return False
+        self.db.commit()
+        query.clear()
+
+        self.history.beginMacro(text)
+        for t_id, event, old, value in entries:
+            name = self.roster.name(t_id)
+            self.history.push(
+                history.CellEdit(
+                    self.history, "teams", t_id, event, old, value,
+                    f"{name} {event} {old} -> {value}",
+                )
+            )
+            dq = self.registry.dq[event]
+            old_text = "DQ" if old == dq else old
+            new_text = "DQ" if value == dq else value
+            self.logger.txn(
+                f"{self.roster.school(t_id)} - {name} - {event} {old_text} -> {new_text}",
+                extra={"teams": {t_id: name}, "event": event},
+            )
+        self.history.endMacro()
+
+        # One refresh for the whole batch, a reset that never reaches record_check
+        self.data_model.select()
+        self.records_check_saved(entries)
+        return True
+
+    # Timing feed functions
+    def feed_toggle(self, checked):
+        if not checked:
+            self.feed_stop()
+            return
+        if not self.settings:
+            self.a_feed.setChecked(False)
+            return
+        source, ok = QtWidgets.QInputDialog.getText(
+            self,
+            "Timing Feed",
+            "File, named pipe or tcp://host:port",
+            text=self.settings.value("feed/source", feed.DEFAULT_SOURCE),
+        )
+        if not ok or not source:
+            self.a_feed.setChecked(False)
+            return
+        try:
+            feed.parse_address(source)
+        except ValueError as e:
+            self.a_feed.setChecked(False)
+            utils.alert("Timing Feed", str(e), "warn")
+            return
+        self.settings.setValue("feed/source", source)
+        timed = [event for event in self.registry.events if event.kind == "time"]
+        self.feed = feed.FeedReader(source, timed, self)
+        self.feed.received.connect(self.feed_apply)
+        self.feed.rejected.connect(self.feed_rejected)
+        self.feed.failed.connect(self.feed_failed)
+        self.feed.start()
+        self.statusBar().showMessage(f"Reading timing feed {source}", 5000)
+
+    def feed_stop(self):
+        if self.feed:
+            self.feed.stop()
+            self.feed.setParent(None)
+            self.feed = None
+        self.feed_backlog = []
+        self.feed_retry.stop()
+        if self.a_feed.isChecked():
+            self.a_feed.setChecked(False)
+
+    def feed_apply(self, batch):
+        if not self.settings:
+            return
+        self.feed_backlog.extend(batch)
+        # Refreshing the model would throw away what is being typed, try again later
+        if self.team_table.state() == QtWidgets.QAbstractItemView.EditingState:
+            # One pending retry however many batches arrive meanwhile
+            if not self.feed_retry.isActive():
+                self.feed_retry.start()
+            return
+        backlog, self.feed_backlog = self.feed_backlog, []
+
+        # A later line for the same team and event replaces an earlier one
+        latest = {(result.team_id, result.event): result for result in backlog}
+        entries = []
+        self.edits_flush()
+        query = queries.Query(self.db)
+        for (t_id, event), result in latest.items():
+            if self.roster.name(t_id) is None:
+                self.feed_rejected(result.line, f"Unknown team {t_id}")
+                continue
+            query.prepare(f'SELECT "{event}" FROM teams WHERE id = ?;')
+            query.addBindValue(t_id)
+            query.exec_()
+            old = query.value(0) if query.next() else None
+            if isinstance(old, float) and isclose(old, result.value, abs_tol=utils.TIE_TOLERANCE):
+                continue
+            entries.append((t_id, event, old, result.value))
+        query.clear()
+
+        if entries and self.results_commit(entries, f"Timing Feed {len(entries)} Results"):
+            self.statusBar().showMessage(f"Timing feed saved {len(entries)} results", 5000)
+
+    def feed_rejected(self, line, reason):
+        self.logger.warning(f"Timing feed line {line!r} rejected: {reason}")
+        self.statusBar().showMessage(f"Timing feed rejected {line}: {reason}", 5000)
+
+    def feed_failed(self, message):
+        self.feed_stop()
+        utils.alert("Timing Feed", f"Timing feed stopped\n{message}", "warn")
+
+    def history_show(self):
+        if not self.history_view:
+            self.history_view = QtWidgets.QUndoView(self.undo_group)
+            self.history_view.setWindowTitle("Edit History")
+            self.history_view.setEmptyLabel("Opened Competition")
+        self.history_view.show()
+
+    def audit_show(self):
+        events = self.registry.names if self.registry else utils.EVENT_SORTING
+        log = audit.AuditLog(self.logs_dir, events)
+        try:
+            log.ingest()
+            diag = dialogs.AuditDialog(log, events, self.txn_index.comp, self)
+            diag.exec_()
+        finally:
+            log.close()
 
     # Tie functions
     def tie_add(self, use_selections=False):
@@ -165,27 +642,22 @@ class GUI(QtWidgets.QMainWindow):
             indexes = []
         if len(indexes) == 1:
             t_id = indexes[0].data(QtCore.Qt.EditRole)
-            diag = dialogs.TieDialog(t_id)
+            diag = dialogs.TieDialog(self.roster, t_id, events=self.registry.names)
         elif len(indexes) == 2:
             t1_id = indexes[0].data(QtCore.Qt.EditRole)
             t2_id = indexes[1].data(QtCore.Qt.EditRole)
-            query = QtSql.QSqlQuery()
-            query.exec_(f"SELECT Division from teams where id = {t1_id};")
-            query.next()
-            t1_div = query.value(0)
-            query.exec_(f"SELECT Division from teams where id = {t2_id};")
-            query.next()
-            t2_div = query.value(0)
-            query.clear()
-            del query
+            t1_div = self.roster.division(t1_id)
+            t2_div = self.roster.division(t2_id)
 
             if t1_div != t2_div:
                 utils.alert("Error", "Ties can only exist within a division ", "crit")
                 return
             else:
-                diag = dialogs.TieDialog(t1_id, t2_id)
+                diag = dialogs.TieDialog(
+                    self.roster, t1_id, t2_id, events=self.registry.names
+                )
         else:
-            diag = dialogs.TieDialog()
+            diag = dialogs.TieDialog(self.roster, events=self.registry.names)
 
         if diag.exec_():
             t1_id = diag.team_1.currentData()
@@ -195,26 +667,91 @@ class GUI(QtWidgets.QMainWindow):
             e_name = diag.tie_event.currentText()
             w_id = diag.winner.currentData()
             w_name = diag.winner.currentText()
-            query = QtSql.QSqlQuery()
+            query = queries.Query()
             self.logger.txn(
-                f"Add Tie between {t1_name} and {t2_name}, E: {e_name}, W: {w_name}"
+                f"Add Tie between {t1_name} and {t2_name}, E: {e_name}, W: {w_name}",
+                extra={"teams": {t1_id: t1_name, t2_id: t2_name}, "event": e_name},
             )
             query.exec_(
                 f"INSERT INTO ties (team_1_id, team_2_id, event, winner) VALUES ({t1_id}, {t2_id}, '{e_name}', {w_id});"
             )
+            self.history.push(
+                history.RowChange(
+                    self.history, "ties", query.lastInsertId(),
+                    {"team_1_id": t1_id, "team_2_id": t2_id, "event": e_name, "winner": w_id},
+                    True, f"Add Tie {t1_name} / {t2_name} {e_name}",
+                )
+            )
             query.clear()
             del query
             self.ties_window.model.select()
 
+    def tie_detect(self):
+        if not self.settings:
+            return
+        self.logger.info("Detecting Ties")
+        self.edits_flush()
+        candidates = ties.find_tie_candidates(self.registry.dq)
+        if not candidates:
+            utils.alert("No Ties", "No unresolved ties were found")
+            return
+
+        diag = dialogs.TieBatchDialog(candidates)
+        if not diag.exec_():
+            return
+        resolutions = diag.resolutions()
+        if not resolutions:
+            return
+
+        # All or nothing so a failed insert never leaves half a sweep behind
+        self.db.transaction()
+        query = queries.Query()
+        query.prepare(
+            "INSERT INTO ties (team_1_id, team_2_id, event, winner) VALUES (?, ?, ?, ?);"
+        )
+        added = []
+        for tie, w_id in resolutions:
+            values = [tie.team_1_id, tie.team_2_id, tie.event, w_id]
+            for value in values:
+                query.addBindValue(value)
+            if not query.exec_():
+                query.clear()
+                self.db.rollback()
+                utils.alert("Error", "Unable to save ties, no ties were added", "crit")
+                return
+            added.append((query.lastInsertId(), tie, values))
+        self.db.commit()
+        query.clear()
+
+        # The whole sweep is a single undo step
+        self.history.beginMacro(f"Detect {len(added)} Ties")
+        for tie_id, tie, values in added:
+            self.history.push(
+                history.RowChange(
+                    self.history, "ties", tie_id,
+                    dict(zip(["team_1_id", "team_2_id", "event", "winner"], values)),
+                    True, f"Add Tie {tie.team_1} / {tie.team_2} {tie.event}",
+                )
+            )
+        self.history.endMacro()
+
+        for tie, w_id in resolutions:
+            w_name = tie.team_1 if w_id == tie.team_1_id else tie.team_2
+            self.logger.txn(
+                f"Add Tie between {tie.team_1} and {tie.team_2}, E: {tie.event}, W: {w_name}",
+                extra={
+                    "teams": {tie.team_1_id: tie.team_1, tie.team_2_id: tie.team_2},
+                    "event": tie.event,
+                },
+            )
+        self.ties_window.model.select()
+
     # Competition Management Functions
     def comp_create(self):
         self.logger.info("Creating New Competition Config File")
         diag = dialogs.NewComp()
         if diag.exec_():
             self.logger.debug("NewComp Dialog Success")
-            if self.settings:
-                self.settings.sync()
-                self.settings = None
             year = diag.year.value()
 
             # Default Settings to config file
@@ -224,6 +761,10 @@ class GUI(QtWidgets.QMainWindow):
                 str(self.data_dir) + os.sep + f"mucking_{year}.config",
                 "Config File (*.config)",
             )[0]
+            if not config_file:
+                return
+            if self.settings:
+                self.comp_close()
             self.logger.debug(f"Saving Default settings to {config_file}")
             self.settings = QtCore.QSettings(config_file, QtCore.QSettings.IniFormat)
             self.settings.setValue("app/display", "metric")
@@ -247,115 +788,247 @@ class GUI(QtWidgets.QMainWindow):
             self.settings.setValue("db/path", db_filepath)
 
             self.db_changed.emit()
-
-            # Change to Welcome Screen
-            self.display.setCurrentWidget(self.comp_screen)
+            self.display_restore()
+            self.recent_touch()
 
     def comp_load(self):
-        # TODO: Detect if comp already loaded and cleanly disconnect (HARD)
         config_file = QtWidgets.QFileDialog.getOpenFileName(
             self, "Load File", str(self.data_dir), "Config File (*.config)"
         )[0]
         if not config_file:
             return
+        self.comp_open(config_file)
+
+    def comp_open(self, config_file):
+        # Only one competition is open at a time, release the current one first
+        if self.settings:
+            self.comp_close()
         self.logger.info(f"Loading Competition {config_file}")
-        self.settings = QtCore.QSettings(config_file, QtCore.QSettings.IniFormat)
-        self.db_changed.emit()
+        with instrument.span("comp_open"):
+            self.settings = QtCore.QSettings(config_file, QtCore.QSettings.IniFormat)
+            self.db_changed.emit()
+            self.display_restore()
+        self.recent_touch()
+
+    def comp_recent(self, config_file):
+        if not pathlib.Path(config_file).is_file():
+            utils.alert("Missing Competition", f"Unable to find {config_file}", "warn")
+            self.recent.remove(config_file)
+            self.recent_refresh()
+            return
+        self.comp_open(config_file)
+
+    def recent_touch(self):
+        # Team counts come from the roster so the index never opens a database
+        self.roster.ensure_loaded()
+        divisions = {div: len(ids) for div, ids in self.roster.by_division.items()}
+        self.recent.touch(
+            self.settings.fileName(),
+            self.settings.value("comp/year", ""),
+            self.settings.value("comp/host", ""),
+            divisions,
+        )
+        self.recent_refresh()
+
+    def recent_refresh(self):
+        self.recent_list.clear()
+        self.recent_menu.clear()
+        for entry in self.recent.entries:
+            text = recent.RecentIndex.describe(entry)
+            item = QtWidgets.QListWidgetItem(text)
+            item.setData(QtCore.Qt.UserRole, entry["config"])
+            item.setToolTip(entry["config"])
+            self.recent_list.addItem(item)
+            action = self.recent_menu.addAction(text)
+            action.triggered.connect(
+                lambda checked, config=entry["config"]: self.comp_recent(config)
+            )
+        self.recent_menu.setEnabled(bool(self.recent.entries))
+
+    def display_restore(self):
         # match display units to last display mode
         display_button = getattr(
-            self, f"rb_{self.settings.value('app/display', 'Imperial')}"
+            self, f"rb_{self.settings.value('app/display', 'imperial')}"
         )
-        display_button.toggle()
+        if display_button.isChecked():
+            self.model_change()
+        else:
+            display_button.setChecked(True)
         self.display.setCurrentWidget(self.comp_screen)
 
+    def comp_archive(self):
+        self.logger.info("Archiving Competitions")
+        if self.settings:
+            self.settings.sync()
+            self.edits_flush()
+            self.standings.refresh()
+        store = archive.Archive(self.data_dir / "archive.db")
+        count = store.ingest_directory(self.data_dir)
+        total = len(store.competitions())
+        rejected = store.rejected
+        store.close()
+        message = f"Archived {count} new or changed competitions, {total} in the archive"
+        if rejected:
+            message += "\n\nNot archived:\n" + "\n".join(rejected)
+        utils.alert("Archive Updated", message, "warn" if rejected else "info")
+
+    def comp_report(self):
+        if not self.settings:
+            return
+        if self.report_job:
+            self.statusBar().showMessage("Result sheets are already being generated")
+            return
+        year = self.settings.value("comp/year")
+        pdf_path = QtWidgets.QFileDialog.getSaveFileName(
+            self,
+            "Save Result Sheets",
+            str(self.data_dir / f"mucking_{year}_results.pdf"),
+            "PDF File (*.pdf)",
+        )[0]
+        if not pdf_path:
+            return
+
+        self.logger.info(f"Generating result sheets {pdf_path}")
+        self.edits_flush()
+        self.standings.refresh()
+        title = f"{year} {self.settings.value('comp/host', '')} Mucking Results"
+        self.report_job = reports.ResultSheets(
+            self.settings.value("db/path"),
+            pdf_path,
+            title,
+            self.registry.events,
+            reports.unit_settings(self.settings, self.registry.events),
+        )
+        self.report_job.signals.finished.connect(self.report_finished)
+        self.report_job.signals.failed.connect(self.report_failed)
+        QtCore.QThreadPool.globalInstance().start(self.report_job)
+        self.statusBar().showMessage("Generating result sheets...")
+
+    def report_finished(self, pdf_path, pages):
+        self.report_job = None
+        if not pages:
+            utils.alert("No Results", "Score the competition before printing", "warn")
+            return
+        self.statusBar().showMessage(f"Saved {pages} result sheets to {pdf_path}", 10000)
+
+    def report_failed(self, message):
+        self.report_job = None
+        self.statusBar().clearMessage()
+        utils.alert("Error", f"Unable to generate result sheets\n{message}", "crit")
+
     def comp_save(self):
         self.logger.info(f"Manual Save Initiated")
         self.settings.sync()
-        # DB Save scheme means save after every change
+        self.edits_flush()
+        if self.journal:
+            self.journal.compact()
 
     def comp_save_as(self):
+        if not self.settings:
+            return
         self.logger.info(f"Save As current competition")
-        # TODO: Update method to better handle database close/reopen
-        #  Ties in with comp_load and comp_close issues
         prev = self.settings
         config_file = QtWidgets.QFileDialog.getSaveFileName(
             self, "Save File", self.settings.fileName(), "Config File (*.config)"
         )[0]
+        if not config_file or config_file == prev.fileName():
+            return
 
         self.logger.info(f"Copying settings {prev.fileName()} -> {config_file}")
-        self.settings = QtCore.QSettings(config_file, QtCore.QSettings.IniFormat)
+        settings = QtCore.QSettings(config_file, QtCore.QSettings.IniFormat)
         for key in prev.allKeys():
-            self.settings.setValue(key, prev.value(key))
+            settings.setValue(key, prev.value(key))
 
         # Update DB path
-        self.settings.setValue("db/path", config_file.replace(".config", ".db"))
+        settings.setValue("db/path", config_file.replace(".config", ".db"))
+        settings.sync()
 
         # Copy DB
+        self.edits_flush()
         self.logger.info(f"Copying Database to {config_file.replace('.config', '.db')}")
-        utils.db_copy(prev.value("db/path"), self.settings.value("db/path"))
+        utils.db_copy(prev.value("db/path"), settings.value("db/path"))
 
-        # Close Existing Database
-        self.logger.info(f"Closing Existing Database connections")
-        self.data_model.clear()
-        self.db.removeDatabase(self.db.connectionName())
-
-        # Reinitialize application
-        self.settings_changed.emit()
+        # Continue working in the copy
+        self.comp_open(config_file)
 
     def comp_close(self):
+        if not self.settings:
+            return
         self.logger.info(f"Closing Settings and Database Connections")
-        print(self.db.connectionNames())
+        self.feed_stop()
         self.settings.sync()
-        self.data_model.close()
-        dbname = self.db.connectionName()
-        self.settings = None
-        self.db = None
-        self.data_model = None
-        QtSql.QSqlDatabase.removeDatabase(dbname)
+        self.edits_flush()
+        if self.roster:
+            self.recent_touch()
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+        if self.history is not None:
+            self.undo_group.removeStack(self.history)
+            # Commands refer back to the stack, drop them so it can be freed
+            self.history.clear()
+            self.history.setParent(None)
+            self.history.db = None
+            self.history = None
+
+        # Everything holding the connection has to go before it can be removed
+        if self.ties_window:
+            self.ties_window.close()
+            self.ties_window.table.setModel(None)
+            self.ties_window.model = None
+            self.ties_window.db = None
+            self.ties_window.setParent(None)
+            self.ties_window = None
         self.team_table.setModel(None)
+        if self.proxy:
+            self.proxy.setParent(None)
+        self.proxy = None
+        self.le_search.clear()
+        self.delegate.set_formats({})
+        if self.roster:
+            self.roster.setParent(None)
+        self.roster = None
+        self.records = None
+        if self.standings:
+            self.standings.db = None
+        self.standings = None
+        self.registry = None
+        if self.data_model:
+            self.data_model.setParent(None)
+            self.rank_model.setParent(None)
+        self.data_model = None
+        self.rank_model = None
+
+        if self.db:
+            dbname = self.db.connectionName()
+            self.db.close()
+            self.db = None
+            # Signal connections and lambdas leave cycles around the models and
+            # windows dropped above, collect them so no copy of the connection
+            # outlives its removal
+            gc.collect()
+            QtSql.QSqlDatabase.removeDatabase(dbname)
+        self.conn_status.setText("")
+        self.txn_index.comp = None
+
+        self.settings = None
         self.display.setCurrentWidget(self.welcome_screen)
 
+    @QtCore.pyqtSlot()
+    @instrument.timed("comp_score")
     def comp_score(self):
-        # TODO: Improve Scoring Algorithm (Currently does not expect ties)
-        #       Current Scoring Improvements
-        #         Check if values for a given team are the same in an event
-        #         Event Score Check on primary table and then make changes to rank table
-        #         2 teams tied for 2nd place both get 2 points and the next team gets 4
-        #         This propogates scores cascading down rather than up
-        #       Account for ties won in the overall ranking
-        #         Needed since event scores will not change
-
-        event_sorting = {
-            "Mucking": "ASC",
-            "Swede Saw": "ASC",
-            "Track Stand": "ASC",
-            "Gold Pan": "ASC",
-            "Hand Steel": "DESC",
-            "Jackleg": "DESC",
-            "Survey": "ASC",
-        }
-
-        dq_time = {
-            "Mucking": utils.DQ_TIME,
-            "Swede Saw": utils.DQ_TIME,
-            "Track Stand": utils.DQ_TIME,
-            "Gold Pan": utils.DQ_TIME,
-            "Hand Steel": utils.DQ_MIN_LENGTH,
-            "Jackleg": utils.DQ_MIN_LENGTH,
-            "Survey": utils.DQ_MAX_LENGTH,
-        }
         self.logger.info("Scoring Competition")
-        loop_query = QtSql.QSqlQuery(self.db)
-        inner_query = QtSql.QSqlQuery(self.db)
 
         # Check for nulls
         self.logger.debug("Checking for Null Values")
-        null_query = QtSql.QSqlQuery(self.db)
+        self.edits_flush()
+        null_query = queries.Query(self.db)
         null_query.exec("SELECT * from teams;")
         while null_query.next():
-            for i in range(4, 11):
-                if not null_query.value(i):
-                    self.team_table.selectRow(null_query.value(0)-1)
+            for i in self.registry.team_columns:
+                # 0 is a valid (DQ) length so only NULL counts as missing
+                if null_query.value(i) in [None, ""]:
+                    self.team_select(null_query.value(0))
                     utils.alert("NULL ERROR",
                                 f"Missing Score for team {null_query.value(2)}",
                                 "crit")
@@ -363,140 +1036,44 @@ class GUI(QtWidgets.QMainWindow):
         null_query.clear()
         del null_query
 
-        self.logger.debug("Computing Initial Ranks")
-        for div in ["A", "C", "M", "W"]:
-            for event in event_sorting:
-                order = event_sorting[event]
-                loop_query.exec(
-                    f'SELECT id, School, Name, "{event}" from teams WHERE Division = "{div}" ORDER BY "{event}" {order};'
-                )
-                i = 1  # Ranking handled at DB level 'i' for placing
-                while loop_query.next():
-                    t_id = loop_query.value(0)
-                    s_name = loop_query.value(1)
-                    t_name = loop_query.value(2)
-                    e_val = loop_query.value(3)
-
-                    # DQ's Default to 0 for further processing
-                    set_val = i if e_val != dq_time[event] else 0
-                    inner_query.exec(f"SELECT id FROM ranks WHERE id = {t_id};")
-
-                    # Insert if no existing record else update
-                    if not inner_query.next():
-                        sql = f'INSERT INTO ranks (id, School, Name, Division, "{event}") VALUES ({t_id}, "{s_name}", "{t_name}", "{div}", {set_val});'
-                    else:
-                        sql = (
-                            f'UPDATE ranks SET "{event}" = {set_val} WHERE id = {t_id};'
-                        )
-                    inner_query.exec(sql)
-                    i += 1
-
-        self.logger.debug("Computing DQ Scores and Updating Ranks")
-        for div in ["A", "C", "M", "W"]:
-            for event in event_sorting:
-                total = 0
-                dq = 0
-                # How many teams total in the division
-                loop_query.exec(
-                    f'SELECT COUNT("{event}") FROM ranks where Division="{div}";'
-                )
-                if loop_query.next():
-                    total = loop_query.value(0)
-                # How many teams disqualified in the division
-                loop_query.exec(
-                    f'SELECT COUNT("{event}") FROM ranks WHERE Division="{div}" and "{event}"=0;'
-                )
-                if loop_query.next():
-                    dq = loop_query.value(0)
-
-                # if either of these are empty then there is either no teams or no dq's
-                if total and dq:
-                    dq_score = total - dq + 1
-                    inner_query.exec(
-                        f'UPDATE ranks SET "{event}" = {dq_score} where Division="{div}" and "{event}"=0;'
-                    )
-
-        # Reset Ties Won
-        self.logger.debug("Clearing Ties Won")
-        loop_query.exec('UPDATE ranks SET "Ties Won"=0;')
-
-        # Handle Ties
-        self.logger.debug("Handling Ties")
-        loop_query.exec("SELECT * FROM ties;")
-        while loop_query.next():
-            # get tie data
-            t1_id = loop_query.value(1)
-            t2_id = loop_query.value(2)
-            e_name = loop_query.value(3)
-            winning_id = loop_query.value(4)
-            losing_id = {t1_id, t2_id} - {winning_id}
-            losing_id = losing_id.pop()
-
-            # get rank of team 1
-            inner_query.exec(f'SELECT "{e_name}" FROM ranks where id={t1_id}')
-            inner_query.first()
-            t1_rank = inner_query.value(0)
-
-            # get rank of team 2
-            inner_query.exec(f'SELECT "{e_name}" FROM ranks where id={t2_id}')
-            inner_query.first()
-            t2_rank = inner_query.value(0)
-
-            # set ranks according to tie record
-            winning_rank = min(t1_rank, t2_rank)
-            losing_rank = max(t1_rank, t2_rank)
-            inner_query.exec(f'UPDATE ranks SET "{e_name}"={winning_rank} where id={winning_id}')
-            inner_query.exec(f'UPDATE ranks SET "{e_name}"={losing_rank} where id={losing_id}')
-
-            # Increment Ties Won
-            inner_query.exec(f'SELECT "Ties Won" from ranks where id={winning_id}')
-            inner_query.first()
-            winner_ties = inner_query.value(0)
-            if not winner_ties:
-                winner_ties = 0
-            inner_query.exec(f'UPDATE ranks SET "Ties Won"={winner_ties + 1} where id={winning_id}')
-
-        self.logger.debug("Computing Total Scores")
-        loop_query.exec("SELECT * from ranks;")
-        while loop_query.next():
-            s = 0
-            t_id = loop_query.value(0)
-            for i in range(4, 11):
-                s += loop_query.value(i)
-            inner_query.exec(f"UPDATE ranks SET Sum = {s} WHERE id = {t_id};")
-
-        # Cleanup Query Objects just in case
-        loop_query.clear()
-        inner_query.clear()
+        # Only divisions changed since they were last scored are recomputed
+        self.standings.refresh()
 
         # Change Radio Button to Rank view
-        self.rb_rank.setChecked(True)
+        if self.rb_rank.isChecked():
+            self.rank_model.select()
+        else:
+            self.rb_rank.setChecked(True)
 
     # Model/View Functions
+    @instrument.timed("db_setup")
     def db_setup(self) -> None:
-        self.logger.info("Initializing Database")
-        self.db = QtSql.QSqlDatabase.addDatabase("QSQLITE")
         db_filepath = self.settings.value("db/path", "")
+        # audit.AuditLog tells which competition logged TXN lines belong to from this line
+        self.logger.info(f"Initializing Database {db_filepath}")
+        self.txn_index.comp = logstore.comp_key(db_filepath)
+        self.db = QtSql.QSqlDatabase.addDatabase("QSQLITE")
 
         db_file = QtCore.QFileInfo(db_filepath)
         if db_file.exists() and db_file.isFile():
             self.db.setDatabaseName(db_filepath)
             self.db.open()
+            self.conn_status.setText("Connected [local]")
             # Setup Teams Table
             if "teams" not in self.db.tables():
-                query = QtSql.QSqlQuery()
+                query = queries.Query()
                 query.exec_(utils.TEAMS_SQL)
                 query.clear()
 
             # Setup Ranks table if needed
             if "ranks" not in self.db.tables():
-                query = QtSql.QSqlQuery()
+                query = queries.Query()
                 query.exec_(utils.RANKS_SQL)
                 query.clear()
 
             # Setup Ties table if needed
             if "ties" not in self.db.tables():
-                query = QtSql.QSqlQuery()
+                query = queries.Query()
                 query.exec_(utils.TIES_SQL)
                 query.clear()
 
@@ -522,19 +1099,28 @@ class GUI(QtWidgets.QMainWindow):
 
     def model_setup(self) -> None:
         self.logger.info("Initializing Models")
-        data_model = QtSql.QSqlTableModel(self)
+        data_model = TableModel(self)
         data_model.setTable("teams")
-        data_model.setEditStrategy(QtSql.QSqlTableModel.OnFieldChange)
+        data_model.setEditStrategy(QtSql.QSqlTableModel.OnManualSubmit)
         data_model.select()
+        data_model.journal = self.journal
+        data_model.history = self.history
         self.data_model = data_model
-        rank_model = QtSql.QSqlTableModel(self)
-        rank_model.setTable("ranks")
+        self.roster = roster.Roster(data_model, self)
+        data_model.dataChanged.connect(self.record_check)
+        rank_model = TableModel(self)
+        rank_model.setTable("standings")
         rank_model.setEditStrategy(QtSql.QSqlTableModel.OnManualSubmit)
         rank_model.select()
         self.rank_model = rank_model
 
     def model_filter(self, text):
         self.logger.debug(f"Model Filter Set to {text}")
+        # Another division's teams are not in the held order, the edits are
+        # saved first so the reset bringing them in is sorted
+        self.edits_flush()
+        if self.proxy:
+            self.proxy.release()
         if text == "All":
             self.data_model.setFilter("")
             self.rank_model.setFilter("")
@@ -543,17 +1129,23 @@ class GUI(QtWidgets.QMainWindow):
             self.data_model.setFilter(f"division='{text[0]}'")
             self.rank_model.setFilter(f"division='{text[0]}'")
 
-    def model_change(self):
+    def model_change(self, checked=True):
+        # Radio buttons also emit when unchecked and with no competition open
+        if not checked or not self.data_model:
+            return
         display_mode = self.settings.value("app/display")
         if display_mode == "rank":
-            self.team_table.setModel(self.rank_model)
+            self.proxy.setSourceModel(self.rank_model)
             self.team_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+            self.edits_flush()
+            self.standings.refresh()
             self.rank_model.select()
-            self.team_table.resizeColumnsToContents()
         else:
-            self.team_table.setModel(self.data_model)
+            self.proxy.setSourceModel(self.data_model)
             self.team_table.setEditTriggers(QtWidgets.QAbstractItemView.AllEditTriggers)
-            self.team_table.resizeColumnsToContents()
+            self.data_model.select()
+        self.team_table.setColumnHidden(0, True)
+        self.team_table.resizeColumnsToContents()
 
     def view_setup(self) -> None:
         self.logger.info("Initializing Competition View")
@@ -562,7 +1154,11 @@ class GUI(QtWidgets.QMainWindow):
         title.setText(f"{self.settings.value('comp/year')} Team Scores")
 
         # Table Options
-        self.team_table.setModel(self.data_model)
+        self.proxy = TeamProxy(self.registry.sorting, self)
+        self.proxy.setSourceModel(self.data_model)
+        self.team_table.setModel(self.proxy)
+        self.team_table.setSortingEnabled(True)
+        self.team_table.sortByColumn(0, QtCore.Qt.AscendingOrder)
         self.team_table.setColumnHidden(0, True)
         self.table_min_size()
         self.team_table.horizontalHeader().setSectionResizeMode(
@@ -576,40 +1172,80 @@ class GUI(QtWidgets.QMainWindow):
         )
 
         # Column Options
-        # Note diff delegate instance for each column as recommended by docs
-        # Delegate ref must be kept to prevent GC
-        self.logger.info("Initializing Tableview Delegates")
-        self.local_delegates = list()
-
-        # Setup Division Delegate
-        self.local_delegates.append(delegates.DivisionDelegate(self))
-        self.team_table.setItemDelegateForColumn(3, self.local_delegates[-1])
-
-        # Setup Timed Event Delegates
-        for col in range(4, 8):
-            self.local_delegates.append(delegates.TimeEditDelegate(self))
-            self.team_table.setItemDelegateForColumn(col, self.local_delegates[-1])
-
-        # Setup Length Event Delegates
-        self.local_delegates.append(delegates.HandsteelDelegate(self))
-        self.team_table.setItemDelegateForColumn(8, self.local_delegates[-1])
-        self.local_delegates.append(delegates.JacklegDelegate(self))
-        self.team_table.setItemDelegateForColumn(9, self.local_delegates[-1])
-        self.local_delegates.append(delegates.SurveyDelegate(self))
-        self.team_table.setItemDelegateForColumn(10, self.local_delegates[-1])
+        self.logger.info("Initializing Tableview Delegate")
+        self.delegate.set_formats(delegates.team_formats(self.registry))
+        self.delegate.configure(self.settings)
 
         self.team_table.resizeColumnsToContents()
-
-        # Needs to be setup here as model is not setup in init
-        self.rb_imperial.toggled.connect(self.data_model.select)
-        self.rb_metric.toggled.connect(self.data_model.select)
-        self.rb_rank.toggled.connect(self.rank_model.select)
-        self.rb_imperial.toggled.connect(self.model_change)
-        self.rb_metric.toggled.connect(self.model_change)
-        self.rb_rank.toggled.connect(self.model_change)
         self.ties_window = ties.TieWindow(self, self.db)
-        action_view_ties = self.findChild(QtWidgets.QAction, "a_view_ties")
-        action_view_ties.triggered.connect(self.ties_window.show)
+
+    def ties_show(self):
+        if self.ties_window:
+            self.ties_window.show()
+
+    def team_search(self, text):
+        if not self.proxy:
+            return
+        self.proxy.set_matches(self.roster.search(text) if text.strip() else None)
+
+    def team_select(self, t_id):
+        matches = self.proxy.match(
+            self.proxy.index(0, 0), QtCore.Qt.EditRole, t_id, 1, QtCore.Qt.MatchExactly
+        )
+        if matches:
+            self.team_table.selectRow(matches[0].row())
+
+    # Records Functions
+    def record_check(self, top_left, bottom_right, roles=None):
+        # Only single cell edits are results being entered
+        if top_left != bottom_right or not self.records:
+            return
+        model = self.data_model
+        event = model.headerData(top_left.column(), QtCore.Qt.Horizontal, QtCore.Qt.DisplayRole)
+        division = top_left.siblingAtColumn(3).data(QtCore.Qt.EditRole)
+        # The division's other results as shown, edits not yet saved included
+        others = [
+            model.index(row, top_left.column()).data(QtCore.Qt.EditRole)
+            for row in range(model.rowCount())
+            if row != top_left.row() and model.index(row, 3).data(QtCore.Qt.EditRole) == division
+        ]
+        self.record_announce(
+            event,
+            division,
+            top_left.data(QtCore.Qt.EditRole),
+            top_left.siblingAtColumn(2).data(QtCore.Qt.EditRole),
+            others,
+        )
+
+    def records_check_saved(self, entries):
+        """Record check of [(id, event, old, new)] results already in the database"""
+        if not self.records:
+            return
+        query = queries.Query(self.db)
+        for t_id, event, _, value in entries:
+            division = self.roster.division(t_id)
+            query.prepare(f'SELECT "{event}" FROM teams WHERE Division = ? AND id != ?;')
+            query.addBindValue(division)
+            query.addBindValue(t_id)
+            query.exec_()
+            others = []
+            while query.next():
+                others.append(query.value(0))
+            self.record_announce(event, division, value, self.roster.name(t_id), others)
+        query.clear()
+
+    def record_announce(self, event, division, value, name, others):
+        if self.records.check(event, division, value, others):
+            message = f"New {utils.DIVISION_LEXICON[division]} {event} record! {name}"
+            self.logger.info(message)
+            self.statusBar().showMessage(message, 10000)
+
+    def records_show(self):
+        if not self.records:
+            utils.alert("No Competition", "Open a competition to view records", "warn")
+            return
+        diag = dialogs.RecordsDialog(self.records, self)
+        diag.exec_()
 
     # Team Management Functions
     def team_create(self):
@@ -625,11 +1261,26 @@ class GUI(QtWidgets.QMainWindow):
             if diag.school.text():
                 team.setValue("School", diag.school.text())
 
-            if self.data_model.insertRecord(-1, team):
+            self.edits_flush()
+            if self.data_model.insertRecord(-1, team) and self.data_model.submitAll():
                 self.logger.debug("Successfully inserted team")
+                # AUTOINCREMENT ids only grow, the new team has the largest
+                query = queries.Query()
+                query.exec_("SELECT MAX(id) FROM teams;")
+                query.next()
+                values = {team.fieldName(i): team.value(i) for i in range(team.count())}
+                self.history.push(
+                    history.RowChange(
+                        self.history, "teams", query.value(0), values, True,
+                        f"Add Team {diag.name.text()}",
+                    )
+                )
+                query.clear()
                 self.data_model.select()
             else:
                 self.logger.debug("Failed to insert team")
+                self.data_model.revertAll()
+                self.data_model.select()
 
     def team_delete(self):
         index = self.team_table.selectedIndexes()
@@ -637,7 +1288,7 @@ class GUI(QtWidgets.QMainWindow):
         # Ensure there is a selection
         # Maybe disable in context menu if there is no selection?
         if index:
-            index = index[0]
+            index = self.proxy.mapToSource(index[0])
         else:
             utils.alert("No Team Selected", "Please Select a team to delete", "warn")
             return
@@ -656,8 +1307,21 @@ class GUI(QtWidgets.QMainWindow):
         )
         if confirmation == QtWidgets.QMessageBox.Yes:
             self.logger.info("Deleting Team")
-            self.logger.txn(f"[Deleted] Team Data - {backup}")
-            self.data_model.deleteRowFromTable(index.row())
+            self.edits_flush()
+            self.logger.txn(
+                f"[Deleted] Team Data - {backup}", extra={"teams": {backup[0]: backup[2]}}
+            )
+            if self.data_model.deleteRowFromTable(index.row()):
+                values = {
+                    self.data_model.record().fieldName(i): value
+                    for i, value in enumerate(backup)
+                }
+                self.history.push(
+                    history.RowChange(
+                        self.history, "teams", backup[0], values, False,
+                        f"Delete Team {backup[2]}",
+                    )
+                )
             self.data_model.select()
         else:
             self.logger.debug("Canceled team delete request")
@@ -674,12 +1338,19 @@ class GUI(QtWidgets.QMainWindow):
                     self.settings.setValue(key, updates[key])
                 else:
                     self.settings.setValue(key, utils.UNIT_SHORTHAND[updates[key]])
+            self.delegate.configure(self.settings)
+            self.team_table.viewport().update()
 
-    # Restart program typically to reset DB connections by restarting the application
-    def restart_app(self):
-        self.logger.warning("Why Though?")
-        python = sys.executable
-        os.execl(python, python, *sys.argv)
+    def editor_commit(self, state=None):
+        if state == QtCore.Qt.ApplicationActive:
+            return
+        if self.team_table.state() != QtWidgets.QAbstractItemView.EditingState:
+            return
+        editor = QtWidgets.QApplication.focusWidget()
+        if editor:
+            self.logger.debug("Committing open editor")
+            delegate = self.team_table.itemDelegate(self.team_table.currentIndex())
+            delegate.commitData.emit(editor)
 
     # keep the main widget from getting smaller than the tableview
     def table_min_size(self):
@@ -690,18 +1361,27 @@ class GUI(QtWidgets.QMainWindow):
         )
 
     def units_update(self):
+        if not self.settings:
+            return
         caller = self.sender()
         self.settings.setValue("app/display", caller.text().lower())
-        for col in range(3, 11):
+        self.delegate.configure(self.settings)
+        for col in range(3, self.registry.last_column + 1):
             self.team_table.horizontalHeader().setSectionResizeMode(
                 col, QtWidgets.QHeaderView.ResizeToContents
             )
         self.team_table.resizeColumnsToContents()
-        for col in range(3, 11):
+        for col in range(3, self.registry.last_column + 1):
             self.team_table.horizontalHeader().setSectionResizeMode(
                 col, QtWidgets.QHeaderView.Stretch
             )
 
+    def closeEvent(self, event):
+        self.editor_commit()
+        self.comp_close()
+        queries.log_report()
+        super(GUI, self).closeEvent(event)
+
     # Application Wide Event Filter
     def eventFilter(self, source: QtWidgets.QWidget, event: QtCore.QEvent):
         if type(source) == QtWidgets.QTableView:
@@ -728,7 +1408,18 @@ class GUI(QtWidgets.QMainWindow):
                         source.edit(source.currentIndex())
 
 
+def startup_done(path):
+    """Record when the welcome screen is up, for benchmarks.py --startup, and exit"""
+    with open(path, "w") as file:
+        file.write(f"{time.time()}\n")
+    QtWidgets.QApplication.instance().quit()
+
+
 if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
     window = GUI()
+    startup_file = os.environ.get("MUCKING_STARTUP_FILE")
+    if startup_file:
+        # Runs once the event loop has shown the welcome screen
+        QtCore.QTimer.singleShot(0, lambda: startup_done(startup_file))
     app.exec_()
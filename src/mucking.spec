@@ -1,24 +1,111 @@
 # -*- mode: python ; coding: utf-8 -*-
+# Build with python build.py, which compiles the forms this spec bundles.
+import glob
+import os
+import sys
+
+import PyInstaller
 
 block_cipher = None
 
+FORMS_DIR = os.path.join(SPECPATH, "build", "forms")
+if not os.path.isdir(FORMS_DIR):
+    raise SystemExit("Compiled forms are missing, build with python build.py")
+forms = [
+    f"forms.{os.path.splitext(name)[0]}"
+    for name in os.listdir(FORMS_DIR)
+    if name.endswith(".py") and name != "__init__.py"
+]
+
+# Qt modules the app never imports, uic is only the fallback to the compiled forms
+EXCLUDES = [
+    "PyInstaller",
+    "tkinter",
+    "unittest",
+    "pydoc",
+    "PyQt5.uic",
+    "PyQt5.Qt",
+    "PyQt5.QtBluetooth",
+    "PyQt5.QtDBus",
+    "PyQt5.QtDesigner",
+    "PyQt5.QtHelp",
+    "PyQt5.QtLocation",
+    "PyQt5.QtMultimedia",
+    "PyQt5.QtMultimediaWidgets",
+    "PyQt5.QtNetwork",
+    "PyQt5.QtNfc",
+    "PyQt5.QtOpenGL",
+    "PyQt5.QtPositioning",
+    "PyQt5.QtQml",
+    "PyQt5.QtQuick",
+    "PyQt5.QtQuick3D",
+    "PyQt5.QtQuickWidgets",
+    "PyQt5.QtRemoteObjects",
+    "PyQt5.QtSensors",
+    "PyQt5.QtSerialPort",
+    "PyQt5.QtSvg",
+    "PyQt5.QtTest",
+    "PyQt5.QtTextToSpeech",
+    "PyQt5.QtWebChannel",
+    "PyQt5.QtWebEngine",
+    "PyQt5.QtWebEngineCore",
+    "PyQt5.QtWebEngineWidgets",
+    "PyQt5.QtWebSockets",
+    "PyQt5.QtXml",
+    "PyQt5.QtXmlPatterns",
+]
+
+# Qt plugins kept, by plugin directory, everything else in those directories is dropped
+PLUGINS = {
+    "platforms": ["qwindows", "qxcb", "qcocoa", "qoffscreen"],
+    "sqldrivers": ["qsqlite"],
+    "imageformats": ["qico"],
+}
+
+# Qt files dropped wherever they are, software OpenGL alone is ~20 MB
+DROPPED = ["opengl32sw", "d3dcompiler", "Qt5Quick", "Qt5Qml", "Qt5WebEngine", "translations"]
+
+
+def wanted(entry):
+    dest = entry[0].replace("\\", "/")
+    if any(name in dest for name in DROPPED):
+        return False
+    parts = dest.split("/")
+    for directory, kept in PLUGINS.items():
+        if directory in parts[:-1]:
+            return any(parts[-1].startswith((name, f"lib{name}")) for name in kept)
+    return True
+
+
+# PyInstaller 6 takes the bytecode optimization level, older versions follow python -O
+options = {}
+if int(PyInstaller.__version__.split(".")[0]) >= 6:
+    options["optimize"] = 1
+
 a = Analysis(['main.py'],
-             pathex=['F:\\Mucking_Desktop\\src'],
+             pathex=[SPECPATH, os.path.join(SPECPATH, "build")],
              binaries=[],
-             datas=[('F:\\Mucking_Desktop\\src\\ui\\*.ui', 'ui'),
-                    ('F:\\Mucking_Desktop\\src\\data\\mucking_2019.*', 'data')],
-             hiddenimports=[],
+             datas=[(path, 'data') for path in glob.glob(os.path.join(SPECPATH, "data", "mucking_2019.*"))],
+             hiddenimports=forms,
              hookspath=[],
              runtime_hooks=[],
-             excludes=['PyInstaller'],
+             excludes=EXCLUDES,
              win_no_prefer_redirects=False,
              win_private_assemblies=False,
              cipher=block_cipher,
-             noarchive=False)
+             noarchive=False,
+             **options)
+
+a.binaries = [entry for entry in a.binaries if wanted(entry)]
+a.datas = [entry for entry in a.datas if wanted(entry)]
 
 pyz = PYZ(a.pure, a.zipped_data,
              cipher=block_cipher)
 
+# Symbols are stripped where a strip tool is at hand. UPX stays off, compressed
+# libraries are unpacked on every launch, slower than reading them from a USB stick.
+strip = sys.platform != "win32"
+
 exe = EXE(pyz,
           a.scripts,
           [],
@@ -26,16 +113,16 @@ exe = EXE(pyz,
           name='IIMG Score Tracker',
           debug=False,
           bootloader_ignore_signals=False,
-          strip=False,
+          strip=strip,
           upx=False,
           console=True,
-          icon="F:\\Mucking_Desktop\\src\\images\\IIMG_Logo.ico")
+          icon=os.path.join(SPECPATH, "images", "IIMG_Logo.ico"))
 
 coll = COLLECT(exe,
                a.binaries,
                a.zipfiles,
                a.datas,
-               strip=False,
+               strip=strip,
                upx=False,
                upx_exclude=[],
                name='IIMG Score Tracker')
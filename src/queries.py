@@ -0,0 +1,118 @@
+"""Statement statistics and slow query log for QSqlQuery
+
+Query is a drop in replacement for QtSql.QSqlQuery that times every exec,
+counts the rows it returns or changes, logs failed statements with their
+lastError() and statements slower than the configured threshold. Statements
+are aggregated with their literals replaced by ? so report() shows which
+kinds of statement the time is going to.
+"""
+import logging
+import re
+import time
+from PyQt5 import QtSql
+import instrument
+
+logger = logging.getLogger("Main.Query")
+
+DEFAULT_SLOW_MS = 50.0
+slow_ms = DEFAULT_SLOW_MS
+
+LITERAL_PATTERN = re.compile(r"'[^']*'|\b\d+(?:\.\d+)?\b")
+
+
+class StatementStats:
+    __slots__ = ["count", "errors", "rows", "total", "max"]
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+statements = {}
+
+
+def normalize(sql: str) -> str:
+    return LITERAL_PATTERN.sub("?", " ".join(sql.split()))
+
+
+def set_slow_threshold(ms):
+    global slow_ms
+    slow_ms = float(ms)
+    logger.debug(f"Slow query threshold set to {slow_ms} ms")
+
+
+def reset():
+    statements.clear()
+
+
+def report() -> str:
+    lines = [
+        f"{'count':>7} {'total ms':>10} {'avg ms':>8} {'max ms':>8} "
+        f"{'rows':>7} {'errors':>6}  statement"
+    ]
+    ordered = sorted(statements.items(), key=lambda item: item[1].total, reverse=True)
+    for sql, stats in ordered:
+        lines.append(
+            f"{stats.count:>7} {stats.total:>10.2f} {stats.total / stats.count:>8.3f} "
+            f"{stats.max:>8.3f} {stats.rows:>7} {stats.errors:>6}  {sql}"
+        )
+    return "\n".join(lines)
+
+
+def log_report():
+    if statements:
+        logger.info(f"Query Statistics\n{report()}")
+
+
+class Query(QtSql.QSqlQuery):
+    def __init__(self, *args):
+        super(Query, self).__init__(*args)
+        self.stats = None
+
+    def exec_(self, *args):
+        return self._exec(super(Query, self).exec_, args)
+
+    def exec(self, *args):
+        return self._exec(super(Query, self).exec, args)
+
+    def next(self):
+        found = super(Query, self).next()
+        if found and self.stats:
+            self.stats.rows += 1
+        return found
+
+    def first(self):
+        found = super(Query, self).first()
+        if found and self.stats:
+            self.stats.rows += 1
+        return found
+
+    def _exec(self, func, args):
+        instrument.incr("sql")
+        start = time.perf_counter()
+        ok = func(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        sql = args[0] if args else self.lastQuery()
+        key = normalize(sql)
+        stats = statements.get(key)
+        if stats is None:
+            stats = statements[key] = StatementStats()
+        stats.count += 1
+        stats.total += elapsed
+        stats.max = max(stats.max, elapsed)
+        self.stats = stats
+
+        if not ok:
+            stats.errors += 1
+            logger.error(f"Query failed: {sql} [{self.lastError().text()}]")
+        else:
+            if not self.isSelect():
+                stats.rows += max(self.numRowsAffected(), 0)
+            if elapsed > slow_ms:
+                logger.warning(f"Slow query ({elapsed:.1f} ms): {sql}")
+
+        return ok
@@ -0,0 +1,71 @@
+import logging
+import pathlib
+from datetime import datetime
+from PyQt5 import QtCore
+
+MAX_ENTRIES = 20
+FIELDS = ["config", "year", "host", "teams", "divisions", "opened"]
+
+
+class RecentIndex:
+    """Recently opened competitions, newest first
+
+    Stores enough about each competition to list it without opening its
+    database. Entries are refreshed whenever a competition is opened or closed.
+    """
+
+    def __init__(self, path):
+        self.logger = logging.getLogger("Main.Recent")
+        self.settings = QtCore.QSettings(str(path), QtCore.QSettings.IniFormat)
+        self.entries = []
+        self.load()
+
+    def load(self):
+        self.entries = []
+        size = self.settings.beginReadArray("recent")
+        for i in range(size):
+            self.settings.setArrayIndex(i)
+            self.entries.append({key: self.settings.value(key, "") for key in FIELDS})
+        self.settings.endArray()
+        self.logger.debug(f"Loaded {len(self.entries)} recent competitions")
+
+    def save(self):
+        self.settings.remove("recent")
+        self.settings.beginWriteArray("recent", len(self.entries))
+        for i, entry in enumerate(self.entries):
+            self.settings.setArrayIndex(i)
+            for key in FIELDS:
+                self.settings.setValue(key, entry[key])
+        self.settings.endArray()
+        self.settings.sync()
+
+    def touch(self, config_file, year, host, divisions):
+        """Move config_file to the front with its current team counts"""
+        config_file = str(pathlib.Path(config_file).resolve())
+        self.entries = [e for e in self.entries if e["config"] != config_file]
+        self.entries.insert(
+            0,
+            {
+                "config": config_file,
+                "year": year,
+                "host": host,
+                "teams": sum(divisions.values()),
+                "divisions": " ".join(
+                    f"{div}:{count}" for div, count in sorted(divisions.items())
+                ),
+                "opened": datetime.now().isoformat(sep=" ", timespec="minutes"),
+            },
+        )
+        del self.entries[MAX_ENTRIES:]
+        self.save()
+
+    def remove(self, config_file):
+        self.entries = [e for e in self.entries if e["config"] != config_file]
+        self.save()
+
+    @staticmethod
+    def describe(entry) -> str:
+        text = f"{entry['year']} {entry['host']} - {entry['teams']} teams"
+        if entry["divisions"]:
+            text += f" ({entry['divisions']})"
+        return f"{text}, opened {entry['opened']}"
@@ -0,0 +1,175 @@
+import logging
+import pathlib
+import sqlite3
+from collections import namedtuple
+import utils
+
+# An event the archive holds, position numbers its index and record trigger
+ArchivedEvent = namedtuple("ArchivedEvent", ["position", "name", "order", "dq"])
+
+RECORDS_SQL = """
+create table if not exists records (
+    event text not null,
+    division varchar(1) not null,
+    value float not null,
+    comp_id int not null,
+    team_id int not null,
+    primary key (event, division)
+);
+
+create trigger if not exists records_forget after delete on teams
+begin
+    delete from records where comp_id = old.comp_id and team_id = old.team_id;
+end;
+"""
+
+# Keeps records current as teams are archived, DQ and missing results never count
+RECORD_TRIGGER_SQL = """
+create trigger if not exists records_{i} after insert on teams
+when new."{event}" is not null and new."{event}" != {dq}
+begin
+    insert into records (event, division, value, comp_id, team_id)
+    values ('{literal}', new.Division, new."{event}", new.comp_id, new.team_id)
+    on conflict (event, division) do update set
+        value = excluded.value, comp_id = excluded.comp_id, team_id = excluded.team_id
+    where excluded.value {op} records.value;
+end;
+"""
+
+
+def better(order, value, best) -> bool:
+    if order == "ASC":
+        return value < best
+    return value > best
+
+
+def standard_events():
+    return [ArchivedEvent(i, e.name, e.order, e.dq) for i, e in enumerate(utils.EVENTS)]
+
+
+def archived_events(connection):
+    """ArchivedEvent list in position order
+
+    An archive made before its events were stored holds the standard events.
+    """
+    try:
+        rows = connection.execute(
+            "SELECT position, name, sort, dq FROM events ORDER BY position;"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+    return [ArchivedEvent(*row) for row in rows] or standard_events()
+
+
+def install(connection, events):
+    """Create the records table and the triggers maintaining it for events"""
+    connection.executescript(RECORDS_SQL)
+    for event in events:
+        connection.execute(
+            RECORD_TRIGGER_SQL.format(
+                i=event.position,
+                event=event.name,
+                literal=event.name.replace("'", "''"),
+                dq=event.dq,
+                op="<" if event.order == "ASC" else ">",
+            )
+        )
+
+
+def fill_missing(connection, events):
+    """Recompute records whose holder was removed by a re-ingest"""
+    for event in events:
+        name = event.name
+        divisions = connection.execute(
+            f'SELECT DISTINCT Division FROM teams WHERE "{name}" IS NOT NULL '
+            f"AND Division NOT IN (SELECT division FROM records WHERE event = ?);",
+            [name],
+        ).fetchall()
+        for (division,) in divisions:
+            connection.execute(
+                f"""INSERT INTO records (event, division, value, comp_id, team_id)
+                SELECT ?, Division, "{name}", comp_id, team_id FROM teams
+                WHERE Division = ? AND "{name}" IS NOT NULL AND "{name}" != ?
+                ORDER BY "{name}" {event.order} LIMIT 1;""",
+                [name, division, event.dq],
+            )
+
+
+class Records:
+    """Best result per event and division for record checks during a meet
+
+    Loaded once from the archive. The competition being scored is left out so
+    its own archived results never hold the record it is being compared to.
+    """
+
+    def __init__(self, archive_path, current_db=None):
+        self.logger = logging.getLogger("Main.Records")
+        self.best = {}
+        # name -> ArchivedEvent, the order and DQ records were kept with
+        self.events = {}
+        if not pathlib.Path(archive_path).is_file():
+            self.logger.debug("No archive, records start empty")
+            return
+
+        connection = sqlite3.connect(str(archive_path))
+        try:
+            self.load(connection, str(current_db) if current_db else None)
+        except sqlite3.OperationalError as e:
+            self.logger.error(f"Unable to load records: {e}")
+        finally:
+            connection.close()
+
+    def load(self, connection, current_db):
+        self.events = {event.name: event for event in archived_events(connection)}
+        rows = connection.execute(
+            """SELECT r.event, r.division, r.value, c.year, c.db_path, t.School, t.Name
+            FROM records r
+            JOIN competitions c ON c.id = r.comp_id
+            JOIN teams t ON t.comp_id = r.comp_id AND t.team_id = r.team_id;"""
+        ).fetchall()
+        for event, division, value, year, db_path, school, name in rows:
+            if event not in self.events:
+                continue
+            if db_path == current_db:
+                # Next best from any other competition, still an index scan
+                order = self.events[event].order
+                row = connection.execute(
+                    f"""SELECT t."{event}", c.year, t.School, t.Name FROM teams t
+                    JOIN competitions c ON c.id = t.comp_id
+                    WHERE t.Division = ? AND t."{event}" IS NOT NULL
+                    AND t."{event}" != ? AND c.db_path != ?
+                    ORDER BY t."{event}" {order} LIMIT 1;""",
+                    [division, self.events[event].dq, current_db],
+                ).fetchone()
+                if not row:
+                    continue
+                value, year, school, name = row
+            self.best[(event, division)] = (value, year, school, name)
+        self.logger.info(f"Loaded {len(self.best)} event records")
+
+    def check(self, event, division, value, others=()) -> bool:
+        """True if value beats the archived record and every result in others
+
+        others are the results of the other teams of the division at this
+        meet. Nothing is kept, a mistyped result stops counting as soon as it
+        is corrected, undone or its team is deleted.
+        """
+        if value in [None, ""] or event not in self.events:
+            return False
+        order, dq = self.events[event].order, self.events[event].dq
+        if value == dq or (event, division) not in self.best:
+            return False
+        if not better(order, value, self.best[(event, division)][0]):
+            return False
+        return not any(
+            other not in [None, "", dq] and better(order, other, value) for other in others
+        )
+
+    def table(self):
+        """[(event, division, value, year, school, name)] in event order"""
+        rows = []
+        for event in self.events:
+            for division in ["M", "W", "C", "A"]:
+                if (event, division) in self.best:
+                    rows.append((event, division, *self.best[(event, division)]))
+        return rows
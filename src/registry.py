@@ -0,0 +1,72 @@
+import logging
+import queries
+import utils
+
+
+class EventRegistry:
+    """Events scored at one competition
+
+    The standard events plus any listed under [events] in the competition
+    config. Built once when a competition is opened, column positions are
+    read from the database a single time so views, delegates and scoring look
+    events up by column or name without reading schema metadata again.
+    """
+
+    def __init__(self, events=utils.EVENTS):
+        self.logger = logging.getLogger("Main.Events")
+        self.events = list(events)
+        self.names = [event.name for event in self.events]
+        self.by_name = {event.name: event for event in self.events}
+        self.sorting = {event.name: event.order for event in self.events}
+        self.dq = {event.name: event.dq for event in self.events}
+        # column -> Event for each table, filled by bind
+        self.team_columns = {}
+        self.rank_columns = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        events = list(utils.EVENTS)
+        size = settings.beginReadArray("events")
+        for i in range(size):
+            settings.setArrayIndex(i)
+            name = settings.value("name")
+            kind = settings.value("kind", "time")
+            timed = kind == "time"
+            events.append(
+                utils.Event(
+                    name,
+                    kind,
+                    settings.value("order", "ASC" if timed else "DESC"),
+                    float(
+                        settings.value("dq", utils.DQ_TIME if timed else utils.DQ_MIN_LENGTH)
+                    ),
+                    settings.value("key", name.lower().replace(" ", "")),
+                    settings.value("metric", "" if timed else "cm"),
+                    settings.value("imperial", "" if timed else "in"),
+                    int(settings.value("precision", 2)),
+                )
+            )
+        settings.endArray()
+        return cls(events)
+
+    def bind(self, db):
+        """Add missing event columns and record the column of each event"""
+        for table, columns, column_type in [
+            ("teams", self.team_columns, "float"),
+            ("ranks", self.rank_columns, "int"),
+        ]:
+            record = db.record(table)
+            fields = [record.fieldName(i) for i in range(record.count())]
+            for name in self.names:
+                if name not in fields:
+                    self.logger.info(f"Adding {name} to {table}")
+                    query = queries.Query(db)
+                    query.exec_(f'ALTER TABLE {table} ADD COLUMN "{name}" {column_type};')
+                    query.clear()
+                    fields.append(name)
+            columns.clear()
+            columns.update({fields.index(name): self.by_name[name] for name in self.names})
+
+    @property
+    def last_column(self):
+        return max(self.team_columns)
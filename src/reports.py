@@ -0,0 +1,170 @@
+import html
+import logging
+import pathlib
+import sqlite3
+import time
+from PyQt5 import QtCore, QtGui, QtPrintSupport
+import scoring
+import utils
+
+DIVISIONS = ["M", "W", "C", "A"]
+
+STYLE = """
+h1 { font-size: 16pt; margin-bottom: 0; }
+h2 { font-size: 11pt; color: #555555; margin-top: 0; }
+table { border-collapse: collapse; }
+th { background-color: #dddddd; font-size: 8pt; padding: 3px; }
+td { font-size: 8pt; padding: 3px; border-bottom: 1px solid #cccccc; }
+td.num { text-align: right; }
+"""
+
+
+def unit_settings(settings, events):
+    """Plain copy of the settings a sheet needs, safe to hand to another thread"""
+    metric = settings.value("app/display", "metric") == "metric"
+    if settings.value("app/display") == "rank":
+        metric = settings.value("comp/units", "Metric") == "Metric"
+    prefix = "munits" if metric else "iunits"
+    units = {"metric": metric, "time": settings.value("units/time", "hh:mm:ss.ss")}
+    for event in events:
+        if event.kind == "length":
+            default = event.metric if metric else event.imperial
+            units[event.name] = settings.value(f"{prefix}/{event.key}", default)
+    return units
+
+
+def format_time(value, time_format):
+    if time_format == "ssss.ss":
+        return f"{value:.2f}"
+    hours = int(value // 3600)
+    minutes = int((value - hours * 3600) // 60)
+    seconds = value - hours * 3600 - minutes * 60
+    if hours:
+        return f"{hours}:{minutes:02}:{seconds:05.2f}"
+    return f"{minutes}:{seconds:05.2f}"
+
+
+def format_value(event, value, units):
+    if value in [None, ""]:
+        return ""
+    if value == event.dq:
+        return "DQ"
+    if event.kind == "time":
+        return format_time(value, units["time"])
+    unit = units[event.name]
+    if unit == "dynamic" or unit not in utils.UNIT_FACTORS:
+        unit = utils.get_reasonable_unit(value, units["metric"])
+    return f"{value * utils.UNIT_FACTORS[unit]:.{event.precision}f} {unit}"
+
+
+def division_rows(connection, division, events):
+    """(place, School, Name, rank and result per event, Sum, Ties Won) of a division
+
+    Places come from scoring.place_division, as in the standings on screen.
+    Teams missing a result have no Sum and no place and come last.
+    """
+    columns = ", ".join(f'r."{e.name}", t."{e.name}"' for e in events)
+    rows = connection.execute(
+        f"""SELECT r.id, t.School, t.Name, {columns}, r.Sum, r."Ties Won"
+        FROM ranks r JOIN teams t ON t.id = r.id
+        WHERE t.Division = ?
+        ORDER BY r.Sum IS NULL, r.Sum, r."Ties Won" DESC, t.Name;""",
+        [division],
+    ).fetchall()
+    places = scoring.place_division(
+        {row[0]: {"Sum": row[-2], "Ties Won": row[-1] or 0} for row in rows}
+    )
+    return [(places[row[0]], *row[1:]) for row in rows]
+
+
+def division_html(title, division, rows, events, units):
+    head = "".join(f"<th>{html.escape(e.name)}</th>" for e in events)
+    lines = [
+        f"<h1>{html.escape(title)}</h1>",
+        f"<h2>{utils.DIVISION_LEXICON[division]} Division</h2>",
+        '<table width="100%" cellspacing="0">',
+        f"<tr><th>Place</th><th>School</th><th>Team</th>{head}"
+        f"<th>Sum</th><th>Ties Won</th></tr>",
+    ]
+    for row in rows:
+        place, school, name = row[0], row[1], row[2]
+        cells = []
+        for i, event in enumerate(events):
+            rank, value = row[3 + i * 2], row[4 + i * 2]
+            text = format_value(event, value, units)
+            rank = rank if rank is not None else ""
+            cells.append(f'<td class="num">{rank}<br/>{text}</td>')
+        total, ties_won = row[-2], row[-1]
+        lines.append(
+            f'<tr><td class="num">{place if place is not None else ""}</td>'
+            f'<td>{html.escape(school or "")}</td>'
+            f"<td>{html.escape(name or '')}</td>{''.join(cells)}"
+            f'<td class="num">{total if total is not None else ""}</td>'
+            f'<td class="num">{ties_won or 0}</td></tr>'
+        )
+    lines.append("</table>")
+    return "\n".join(lines)
+
+
+class ReportSignals(QtCore.QObject):
+    finished = QtCore.pyqtSignal(str, int)
+    failed = QtCore.pyqtSignal(str)
+
+
+class ResultSheets(QtCore.QRunnable):
+    """Renders one page of standings per division into a single PDF
+
+    Runs on the global thread pool with its own sqlite3 connection, nothing
+    here touches the GUI or the application's Qt SQL connection.
+    """
+
+    def __init__(self, db_path, pdf_path, title, events, units):
+        super(ResultSheets, self).__init__()
+        self.logger = logging.getLogger("Main.Reports")
+        self.db_path = db_path
+        self.pdf_path = pdf_path
+        self.title = title
+        self.events = events
+        self.units = units
+        self.signals = ReportSignals()
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            pages = self.render()
+        except Exception as e:
+            self.logger.exception("Unable to generate result sheets")
+            self.signals.failed.emit(str(e))
+            return
+        self.logger.info(
+            f"Wrote {pages} division sheets to {self.pdf_path} "
+            f"in {(time.perf_counter() - start) * 1000:.0f} ms"
+        )
+        self.signals.finished.emit(self.pdf_path, pages)
+
+    def render(self) -> int:
+        uri = pathlib.Path(self.db_path).resolve().as_uri()
+        connection = sqlite3.connect(f"{uri}?mode=ro", uri=True)
+        try:
+            sheets = []
+            for division in DIVISIONS:
+                rows = division_rows(connection, division, self.events)
+                if rows:
+                    sheets.append(
+                        division_html(self.title, division, rows, self.events, self.units)
+                    )
+        finally:
+            connection.close()
+
+        page_break = '<p style="page-break-before: always"></p>'
+        document = QtGui.QTextDocument()
+        document.setDefaultStyleSheet(STYLE)
+        document.setHtml(page_break.join(sheets))
+
+        printer = QtPrintSupport.QPrinter(QtPrintSupport.QPrinter.HighResolution)
+        printer.setOutputFormat(QtPrintSupport.QPrinter.PdfFormat)
+        printer.setOutputFileName(self.pdf_path)
+        printer.setPageOrientation(QtGui.QPageLayout.Landscape)
+        printer.setDocName(self.title)
+        document.print_(printer)
+        return len(sheets)
@@ -0,0 +1,119 @@
+import bisect
+import logging
+from PyQt5 import QtCore
+import queries
+
+
+class Roster(QtCore.QObject):
+    """In memory index of the teams table
+
+    Kept in step with the teams model: edits to School/Name/Division are
+    applied in place, a reset or row insert/remove marks the index stale and
+    it is reloaded with a single query the next time it is read.
+    """
+
+    def __init__(self, model, parent=None):
+        super(Roster, self).__init__(parent=parent)
+        self.logger = logging.getLogger("Main.Roster")
+        self.model = model
+        self.names = {}
+        self.schools = {}
+        self.divisions = {}
+        self.by_division = {}
+        # Sorted (word, id) of School and Name words for prefix search
+        self.words = None
+        self.stale = True
+
+        model.modelReset.connect(self.invalidate)
+        model.rowsInserted.connect(self.invalidate)
+        model.rowsRemoved.connect(self.invalidate)
+        model.dataChanged.connect(self.update_rows)
+
+    def invalidate(self):
+        self.stale = True
+
+    def load(self):
+        self.logger.debug("Loading Team Roster")
+        self.names = {}
+        self.schools = {}
+        self.divisions = {}
+        self.by_division = {}
+        self.words = None
+        query = queries.Query()
+        query.exec_("SELECT id, Name, Division, School FROM teams ORDER BY id;")
+        while query.next():
+            t_id = query.value(0)
+            self.names[t_id] = query.value(1)
+            self.divisions[t_id] = query.value(2)
+            self.schools[t_id] = query.value(3)
+            self.by_division.setdefault(query.value(2), []).append(t_id)
+        query.clear()
+        self.stale = False
+
+    def update_rows(self, top_left, bottom_right, roles=None):
+        # Only School (1), Name (2) and Division (3) are indexed
+        if self.stale or bottom_right.column() < 1 or top_left.column() > 3:
+            return
+        self.words = None
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            t_id = self.model.index(row, 0).data(QtCore.Qt.EditRole)
+            if t_id not in self.names:
+                self.stale = True
+                return
+            self.schools[t_id] = self.model.index(row, 1).data(QtCore.Qt.EditRole)
+            self.names[t_id] = self.model.index(row, 2).data(QtCore.Qt.EditRole)
+            division = self.model.index(row, 3).data(QtCore.Qt.EditRole)
+            if division != self.divisions[t_id]:
+                self.by_division[self.divisions[t_id]].remove(t_id)
+                members = self.by_division.setdefault(division, [])
+                members.append(t_id)
+                members.sort()
+                self.divisions[t_id] = division
+
+    def ensure_loaded(self):
+        if self.stale:
+            self.load()
+
+    def name(self, t_id):
+        self.ensure_loaded()
+        return self.names.get(t_id)
+
+    def school(self, t_id):
+        self.ensure_loaded()
+        return self.schools.get(t_id)
+
+    def division(self, t_id):
+        self.ensure_loaded()
+        return self.divisions.get(t_id)
+
+    def teams(self, division=None):
+        """[(id, name)] ordered by id, optionally limited to a division"""
+        self.ensure_loaded()
+        if division is None:
+            ids = self.names
+        else:
+            ids = self.by_division.get(division, [])
+        return [(t_id, self.names[t_id]) for t_id in ids]
+
+    def index_words(self):
+        words = []
+        for t_id, name in self.names.items():
+            text = f"{self.schools.get(t_id) or ''} {name or ''}"
+            words.extend((word, t_id) for word in set(text.lower().split()))
+        words.sort()
+        self.words = words
+
+    def search(self, text):
+        """Ids of teams with a School or Name word starting with each word of text"""
+        self.ensure_loaded()
+        if self.words is None:
+            self.index_words()
+        ids = None
+        for token in text.lower().split():
+            matches = set()
+            i = bisect.bisect_left(self.words, (token,))
+            while i < len(self.words) and self.words[i][0].startswith(token):
+                matches.add(self.words[i][1])
+                i += 1
+            ids = matches if ids is None else ids & matches
+        return set(self.names) if ids is None else ids
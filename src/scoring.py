@@ -0,0 +1,86 @@
+"""Competition scoring without any database access
+
+Kept free of Qt so divisions can be scored anywhere, including worker
+processes and in-memory copies of a competition.
+"""
+import bisect
+
+
+def rank_event(results, order, dq):
+    """{id: place} for [(id, value)] given in id order
+
+    Teams place in result order, every DQ shares the place after the last
+    placed team and missing results have no place.
+    """
+    entered = [(t_id, value) for t_id, value in results if value not in [None, ""]]
+    entered.sort(key=lambda result: result[1], reverse=order == "DESC")
+
+    places = {t_id: None for t_id, _ in results}
+    dq_count = 0
+    for place, (t_id, value) in enumerate(entered, start=1):
+        if value == dq:
+            dq_count += 1
+        else:
+            places[t_id] = place
+
+    dq_place = len(entered) - dq_count + 1
+    for t_id, value in entered:
+        if value == dq:
+            places[t_id] = dq_place
+    return places
+
+
+def score_division(teams, ties, events):
+    """Ranks of one division
+
+    teams is [(id, {event name: value})] in id order, ties is
+    [(team 1 id, team 2 id, event, winner id)] in the order they were entered
+    and events the Event records to score. Returns
+    {id: {event name: place, "Sum": total, "Ties Won": count}}, the Sum is
+    None while any event is missing a result.
+    """
+    ranks = {t_id: {"Ties Won": 0} for t_id, _ in teams}
+    for event in events:
+        places = rank_event(
+            [(t_id, values.get(event.name)) for t_id, values in teams],
+            event.order,
+            event.dq,
+        )
+        for t_id, place in places.items():
+            ranks[t_id][event.name] = place
+
+    # Tie breakers give the winner the better of the two places
+    for t1_id, t2_id, event, w_id in ties:
+        if t1_id not in ranks or t2_id not in ranks or w_id not in (t1_id, t2_id):
+            continue
+        t1_rank, t2_rank = ranks[t1_id].get(event), ranks[t2_id].get(event)
+        if t1_rank is None or t2_rank is None:
+            continue
+        l_id = t2_id if w_id == t1_id else t1_id
+        ranks[w_id][event] = min(t1_rank, t2_rank)
+        ranks[l_id][event] = max(t1_rank, t2_rank)
+        ranks[w_id]["Ties Won"] += 1
+
+    for rank in ranks.values():
+        places = [rank[event.name] for event in events]
+        rank["Sum"] = None if None in places else sum(places)
+    return ranks
+
+
+def place_division(ranks):
+    """{id: place} from score_division ranks
+
+    Lowest Sum places first and more ties won breaks an equal Sum, as on the
+    result sheets. Teams with the same Sum and ties won share a place, teams
+    without a Sum have no place.
+    """
+    keys = {
+        t_id: (rank["Sum"], -rank["Ties Won"])
+        for t_id, rank in ranks.items()
+        if rank["Sum"] is not None
+    }
+    ordered = sorted(keys.values())
+    places = {t_id: None for t_id in ranks}
+    for t_id, key in keys.items():
+        places[t_id] = bisect.bisect_left(ordered, key) + 1
+    return places
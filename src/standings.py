@@ -0,0 +1,187 @@
+import logging
+import instrument
+import queries
+import scoring
+import utils
+
+STATE_SQL = """create table if not exists rank_state (
+    division varchar(1) primary key,
+    dirty int not null default 1
+);"""
+
+MARK_SQL = "INSERT OR REPLACE INTO rank_state (division, dirty) VALUES ({division}, 1);"
+
+TEAM_DIVISION = "(SELECT Division FROM teams WHERE id = {ref}.team_1_id)"
+
+
+class Standings:
+    """Ranks kept as a materialized view of teams and ties
+
+    Triggers on teams and ties mark the division they touch dirty, only dirty
+    divisions are rescored and only when ranks are actually read. The
+    standings view joins ranks back to teams so names and divisions are never
+    copied into ranks.
+    """
+
+    def __init__(self, db, registry):
+        self.logger = logging.getLogger("Main.Standings")
+        self.db = db
+        self.registry = registry
+
+    def execute(self, sql):
+        query = queries.Query(self.db)
+        if not query.exec_(sql):
+            self.logger.error(f"Unable to set up standings: {sql}")
+        query.clear()
+
+    def migrate(self):
+        """Rebuild a ranks table still holding its own School/Name/Division"""
+        if not self.db.record("ranks").contains("School"):
+            return
+        self.logger.info("Rebuilding ranks without team details")
+        self.execute("DROP TABLE ranks;")
+        self.execute(utils.ranks_sql(self.registry.events))
+        # Scores in the old table are gone, score every division again
+        self.execute("DROP TABLE IF EXISTS rank_state;")
+
+    def install(self):
+        """Create the standings view, the dirty flags and their triggers
+
+        Run after the event registry is bound, the view and the teams trigger
+        list every event column.
+        """
+        names = self.registry.names
+        columns = ", ".join(f'r."{name}"' for name in names)
+        self.execute("DROP VIEW IF EXISTS standings;")
+        self.execute(
+            f"CREATE VIEW standings AS SELECT r.id, t.School, t.Name, t.Division, "
+            f'{columns}, r.Sum, r."Ties Won" FROM ranks r JOIN teams t ON t.id = r.id;'
+        )
+
+        new_state = "rank_state" not in self.db.tables()
+        self.execute(STATE_SQL)
+        if new_state:
+            # Nothing is known about existing ranks, score everything once
+            self.execute(
+                "INSERT OR REPLACE INTO rank_state (division, dirty) "
+                "SELECT DISTINCT Division, 1 FROM teams;"
+            )
+
+        watched = ", ".join(["Division", *[f'"{name}"' for name in names]])
+        triggers = {
+            "teams_insert": (
+                "AFTER INSERT ON teams",
+                MARK_SQL.format(division="new.Division"),
+            ),
+            "teams_update": (
+                f"AFTER UPDATE OF {watched} ON teams",
+                MARK_SQL.format(division="old.Division")
+                + MARK_SQL.format(division="new.Division"),
+            ),
+            "teams_delete": (
+                "AFTER DELETE ON teams",
+                MARK_SQL.format(division="old.Division")
+                + "DELETE FROM ranks WHERE id = old.id;",
+            ),
+            "ties_insert": (
+                "AFTER INSERT ON ties",
+                MARK_SQL.format(division=TEAM_DIVISION.format(ref="new")),
+            ),
+            "ties_update": (
+                "AFTER UPDATE ON ties",
+                MARK_SQL.format(division=TEAM_DIVISION.format(ref="old"))
+                + MARK_SQL.format(division=TEAM_DIVISION.format(ref="new")),
+            ),
+            "ties_delete": (
+                "AFTER DELETE ON ties",
+                MARK_SQL.format(division=TEAM_DIVISION.format(ref="old")),
+            ),
+        }
+        for name, (when, body) in triggers.items():
+            self.execute(f"DROP TRIGGER IF EXISTS rank_state_{name};")
+            self.execute(f"CREATE TRIGGER rank_state_{name} {when} BEGIN {body} END;")
+
+    def dirty(self):
+        query = queries.Query(self.db)
+        query.exec_("SELECT division FROM rank_state WHERE dirty = 1;")
+        divisions = []
+        while query.next():
+            divisions.append(query.value(0))
+        query.clear()
+        return divisions
+
+    def load(self, division):
+        """Teams and ties of a division in the form scoring expects"""
+        names = self.registry.names
+        columns = ", ".join(f'"{name}"' for name in names)
+        query = queries.Query(self.db)
+        query.prepare(f"SELECT id, {columns} FROM teams WHERE Division = ? ORDER BY id;")
+        query.addBindValue(division)
+        query.exec_()
+        teams = []
+        while query.next():
+            values = {name: query.value(i + 1) for i, name in enumerate(names)}
+            teams.append((query.value(0), values))
+
+        query.prepare(
+            "SELECT ties.team_1_id, ties.team_2_id, ties.event, ties.winner FROM ties "
+            "JOIN teams ON teams.id = ties.team_1_id WHERE teams.Division = ? "
+            "ORDER BY ties.id;"
+        )
+        query.addBindValue(division)
+        query.exec_()
+        ties = []
+        while query.next():
+            ties.append(tuple(query.value(i) for i in range(4)))
+        query.clear()
+        return teams, ties
+
+    def score(self, divisions):
+        """{division: ranks} of the divisions"""
+        return {
+            division: scoring.score_division(*self.load(division), self.registry.events)
+            for division in divisions
+        }
+
+    def store(self, division, ranks):
+        names = [*self.registry.names, "Sum", "Ties Won"]
+        columns = ", ".join(f'"{name}"' for name in names)
+        marks = ", ".join("?" for _ in names)
+        query = queries.Query(self.db)
+        query.prepare(
+            "DELETE FROM ranks WHERE id IN (SELECT id FROM teams WHERE Division = ?) "
+            "OR id NOT IN (SELECT id FROM teams);"
+        )
+        query.addBindValue(division)
+        if not query.exec_():
+            return False
+        query.prepare(f"INSERT OR REPLACE INTO ranks (id, {columns}) VALUES (?, {marks});")
+        for t_id, rank in ranks.items():
+            query.addBindValue(t_id)
+            for name in names:
+                query.addBindValue(rank[name])
+            if not query.exec_():
+                return False
+        query.prepare("UPDATE rank_state SET dirty = 0 WHERE division = ?;")
+        query.addBindValue(division)
+        result = query.exec_()
+        query.clear()
+        return result
+
+    @instrument.timed("ranks_refresh")
+    def refresh(self):
+        """Rescore the dirty divisions, returns the divisions rescored"""
+        divisions = self.dirty()
+        if not divisions:
+            return []
+
+        self.logger.info(f"Scoring divisions {', '.join(map(str, divisions))}")
+        scored = self.score(divisions)
+        self.db.transaction()
+        for division, ranks in scored.items():
+            if not self.store(division, ranks):
+                self.db.rollback()
+                self.logger.error(f"Unable to store ranks of division {division}")
+                return []
+        self.db.commit()
+        return divisions
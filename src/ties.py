@@ -1,19 +1,89 @@
-from PyQt5 import QtWidgets, QtSql, QtCore, uic
+from PyQt5 import QtWidgets, QtCore
 import logging
-import os
+from collections import namedtuple
+from math import isclose
+import delegates
+import history
+import instrument
+import queries
 import utils
 
 
+TieCandidate = namedtuple(
+    "TieCandidate",
+    ["division", "event", "value", "team_1_id", "team_1", "team_2_id", "team_2"],
+)
+
+
+def find_tie_candidates(event_dq=utils.EVENT_DQ, tolerance=utils.TIE_TOLERANCE):
+    """Pairs of teams in the same division with equal results in an event
+
+    Every event is read in one query sorted by event, division and result,
+    equal results are then adjacent. Pairs that already have a tie record for
+    the event and DQ results are skipped.
+    """
+    resolved = set()
+    query = queries.Query()
+    query.exec_("SELECT team_1_id, team_2_id, event FROM ties;")
+    while query.next():
+        resolved.add((frozenset([query.value(0), query.value(1)]), query.value(2)))
+
+    # Events are selected by position so candidates come in the order events are given
+    events = list(event_dq)
+    candidates = []
+    if events:
+        query.exec_(
+            " UNION ALL ".join(
+                f'SELECT {position}, id, Name, Division, "{event}" FROM teams '
+                f'WHERE "{event}" IS NOT NULL AND "{event}" != {event_dq[event]}'
+                for position, event in enumerate(events)
+            )
+            + " ORDER BY 1, 4, 5;"
+        )
+        group = []
+        while query.next():
+            event = events[query.value(0)]
+            team = (query.value(1), query.value(2), query.value(3), query.value(4))
+            if group and (
+                event != group_event
+                or team[2] != group[-1][2]
+                or not isclose(team[3], group[-1][3], abs_tol=tolerance)
+            ):
+                candidates.extend(_group_pairs(group, group_event, resolved, tolerance))
+                group = []
+            group_event = event
+            group.append(team)
+        if group:
+            candidates.extend(_group_pairs(group, group_event, resolved, tolerance))
+    query.clear()
+
+    return candidates
+
+
+def _group_pairs(group, event, resolved, tolerance):
+    pairs = []
+    for i, (t1_id, t1_name, div, value) in enumerate(group):
+        for t2_id, t2_name, _, t2_value in group[i + 1:]:
+            # Runs can chain (1.00, 1.01, 1.02) but only close pairs are ties
+            if not isclose(value, t2_value, abs_tol=tolerance):
+                continue
+            if (frozenset([t1_id, t2_id]), event) not in resolved:
+                pairs.append(
+                    TieCandidate(div, event, value, t1_id, t1_name, t2_id, t2_name)
+                )
+    return pairs
+
+
 class TieWindow(QtWidgets.QMainWindow):
     def __init__(self, parent, db):
         super(TieWindow, self).__init__(parent=parent)
-        uic.loadUi(f"ui{os.sep}display_ties.ui", self)
+        utils.load_ui("display_ties", self)
         self.setWindowTitle("Ties")
         self.logger = logging.getLogger("Main.TieDisplay")
         self.table = self.findChild(QtWidgets.QTableView)
         self.db = db
         self.model = None
-        self.local_delegates = None
+        self.delegate = None
         self.model_setup()
         self.view_setup()
 
@@ -47,41 +117,36 @@ class TieWindow(QtWidgets.QMainWindow):
         )
         if confirmation == QtWidgets.QMessageBox.Yes:
             self.logger.info("Deleting Tie")
-            self.logger.txn(f"[Deleted] Tie Data - {backup}")
-            self.model.deleteRowFromTable(index.row())
-            self.model.select()
+            row = self.model.rows[index.row()]
+            self.logger.txn(
+                f"[Deleted] Tie Data - {backup}",
+                extra={"teams": {row[5]: backup[1], row[6]: backup[2]}, "event": row[3]},
+            )
+            values = {"team_1_id": row[5], "team_2_id": row[6], "event": row[3], "winner": row[7]}
+            if self.model.delete_tie(index.row()):
+                self.model.history.push(
+                    history.RowChange(
+                        self.model.history, "ties", row[0], values, False,
+                        f"Delete Tie {row[1]} / {row[2]} {row[3]}",
+                    )
+                )
         else:
             self.logger.debug("Canceled team delete request")
 
     def model_setup(self):
         self.logger.info("Initializing Model")
-        tie_model = QtSql.QSqlRelationalTableModel(self)
-        tie_model.setTable("ties")
-        tie_model.setHeaderData(1, QtCore.Qt.Horizontal, "Team 1")
-        tie_model.setHeaderData(2, QtCore.Qt.Horizontal, "Team 2")
-        tie_model.setHeaderData(3, QtCore.Qt.Horizontal, "Event")
-        tie_model.setHeaderData(4, QtCore.Qt.Horizontal, "Winner")
-        tie_model.setRelation(1, QtSql.QSqlRelation("teams", "id", "Name"))
-        tie_model.setRelation(2, QtSql.QSqlRelation("teams", "id", "Name"))
-        tie_model.setRelation(4, QtSql.QSqlRelation("teams", "id", "Name"))
-        tie_model.setEditStrategy(QtSql.QSqlTableModel.OnFieldChange)
+        tie_model = TieModel(self)
+        tie_model.history = self.parent().history
         tie_model.select()
         self.model = tie_model
         self.model.dataChanged.connect(self.update_min_width)
 
     def view_setup(self):
-        self.local_delegates = []
         self.table.setModel(self.model)
         self.table.resizeColumnsToContents()
         self.table.setColumnHidden(0, True)
-        self.local_delegates.append(ReadOnlyDelegate(self.table))
-        self.table.setItemDelegateForColumn(1, self.local_delegates[-1])
-        self.local_delegates.append(ReadOnlyDelegate(self.table))
-        self.table.setItemDelegateForColumn(2, self.local_delegates[-1])
-        self.local_delegates.append(EventDelegate(self.table))
-        self.table.setItemDelegateForColumn(3, self.local_delegates[-1])
-        self.local_delegates.append(WinnerDelegate(self.table))
-        self.table.setItemDelegateForColumn(4, self.local_delegates[-1])
+        self.delegate = TieDelegate(self.table, self.parent().registry.names)
+        self.table.setItemDelegate(self.delegate)
         max_width = self.parent().team_table.columnWidth(2)
         for i in range(1, 5):
             self.table.horizontalHeader().setSectionResizeMode(
@@ -94,7 +159,8 @@ class TieWindow(QtWidgets.QMainWindow):
         )
 
     def show(self):
-        self.model.select()
+        with instrument.span("tie_select"):
+            self.model.select()
         super(TieWindow, self).show()
 
     def update_min_width(self):
@@ -103,66 +169,174 @@ class TieWindow(QtWidgets.QMainWindow):
         )
 
 
-class ReadOnlyDelegate(QtSql.QSqlRelationalDelegate):
-    def __init__(self, parent):
-        super(ReadOnlyDelegate, self).__init__(parent=parent)
+class TieModel(QtCore.QAbstractTableModel):
+    """Ties joined with their team names by a single query
 
-    def editorEvent(self, event, model, option, index):
-        return False
+    Rows are [id, team 1, team 2, event, winner, team 1 id, team 2 id, winner id]
+    Team and winner columns show names but edit by team id (EditRole), so teams
+    that share a name can never be confused.
+    """
 
-    def createEditor(self, parent, option, index):
+    headers = ["id", "Team 1", "Team 2", "Event", "Winner"]
+    id_columns = {1: 5, 2: 6, 4: 7}
+
+    def __init__(self, parent=None):
+        super(TieModel, self).__init__(parent=parent)
+        self.logger = logging.getLogger("Main.TieModel")
+        self.rows = []
+        self.history = None
+
+    def select(self):
+        self.beginResetModel()
+        self.rows = []
+        query = queries.Query()
+        query.exec_(
+            "SELECT ties.id, t1.Name, t2.Name, ties.event, ties.team_1_id, "
+            "ties.team_2_id, ties.winner FROM ties "
+            "LEFT JOIN teams t1 ON t1.id = ties.team_1_id "
+            "LEFT JOIN teams t2 ON t2.id = ties.team_2_id "
+            "ORDER BY ties.id;"
+        )
+        while query.next():
+            t_id, t1_name, t2_name, event, t1_id, t2_id, w_id = [
+                query.value(i) for i in range(7)
+            ]
+            winner = t1_name if w_id == t1_id else t2_name
+            self.rows.append([t_id, t1_name, t2_name, event, winner, t1_id, t2_id, w_id])
+        query.clear()
+        self.endResetModel()
+        return True
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.headers[section]
+        return super(TieModel, self).headerData(section, orientation, role)
+
+    def flags(self, index):
+        flags = QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+        if index.column() in [3, 4]:
+            flags |= QtCore.Qt.ItemIsEditable
+        return flags
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == QtCore.Qt.EditRole and index.column() in self.id_columns:
+            return row[self.id_columns[index.column()]]
+        if role in [QtCore.Qt.DisplayRole, QtCore.Qt.EditRole]:
+            return row[index.column()]
         return None
 
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if role != QtCore.Qt.EditRole or index.column() not in [3, 4]:
+            return False
+        row = self.rows[index.row()]
+        if index.column() == 4 and value not in row[5:7]:
+            self.logger.error(f"Winner {value} is not part of tie {row[0]}")
+            return False
 
-class EventDelegate(QtWidgets.QItemDelegate):
-    def __init__(self, parent=None):
-        super(EventDelegate, self).__init__(parent=parent)
+        field = "event" if index.column() == 3 else "winner"
+        query = queries.Query()
+        query.prepare(f"UPDATE ties SET {field} = ? WHERE id = ?;")
+        query.addBindValue(value)
+        query.addBindValue(row[0])
+        if not query.exec_():
+            return False
 
-    def setEditorData(self, editor, index):
-        value = index.model().data(index, QtCore.Qt.EditRole)
-        if value:
-            editor.setCurrentIndex(editor.findText(value))
+        old = row[3] if index.column() == 3 else row[7]
+        if index.column() == 3:
+            row[3] = value
+        else:
+            row[7] = value
+            row[4] = row[1] if value == row[5] else row[2]
+        self.dataChanged.emit(index, index, [role])
+        if self.history is not None and old != value:
+            if field == "winner":
+                text = f"Tie {row[1]} / {row[2]} winner {row[4]}"
+            else:
+                text = f"Tie {row[1]} / {row[2]} event {old} -> {value}"
+            self.history.push(
+                history.CellEdit(self.history, "ties", row[0], field, old, value, text)
+            )
+        return True
 
-    def createEditor(self, parent, option, index):
-        editor = QtWidgets.QComboBox(parent)
-        editor.addItems(utils.events)
-        return editor
+    def delete_tie(self, row):
+        query = queries.Query()
+        query.prepare("DELETE FROM ties WHERE id = ?;")
+        query.addBindValue(self.rows[row][0])
+        if not query.exec_():
+            return False
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self.rows[row]
+        self.endRemoveRows()
+        return True
 
-    def setModelData(self, editor, model, index) -> None:
-        model.setData(index, editor.currentText(), QtCore.Qt.EditRole)
 
+PAINT_BATCH = instrument.Batch("tie_paint")
 
-class WinnerDelegate(QtSql.QSqlRelationalDelegate):
-    def __init__(self, parent=None):
-        super(WinnerDelegate, self).__init__(parent=parent)
 
-    def paint(self, painter, option, index):
-        painter.save()
+class TieDelegate(QtWidgets.QStyledItemDelegate):
+    """Single delegate for every column of the ties table
+
+    Team names are read only, the event and the winner are picked from combo
+    boxes.
+    """
+
+    READ_ONLY = [1, 2]
+    EVENT = 3
+    WINNER = 4
 
-        # Select highlighting
-        if option.state & QtWidgets.QStyle.State_Selected:
-            painter.fillRect(option.rect, option.palette.highlight())
-            painter.setPen(option.palette.highlightedText().color())
+    def __init__(self, parent=None, events=utils.events[1:]):
+        super(TieDelegate, self).__init__(parent=parent)
+        self.events = events
+        self.cache = delegates.TextCache()
 
-        rect = option.rect
-        rect -= QtCore.QMargins(6, 6, 6, 6)
-        value = index.data(QtCore.Qt.EditRole)
-        painter.drawText(rect, (QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter), str(value))
+    def paint(self, painter, option, index):
+        with PAINT_BATCH:
+            static = self.cache.get(
+                index.column(),
+                index.data(QtCore.Qt.DisplayRole),
+                delegates.plain_text,
+                option.font,
+            )
+            delegates.draw_static(painter, option, static, QtCore.Qt.AlignLeft)
 
-        painter.restore()
+    def editorEvent(self, event, model, option, index):
+        if index.column() in self.READ_ONLY:
+            return False
+        return super(TieDelegate, self).editorEvent(event, model, option, index)
 
     def createEditor(self, parent, option, index):
+        if index.column() in self.READ_ONLY:
+            return None
         editor = QtWidgets.QComboBox(parent)
-        t_1_name = index.siblingAtColumn(1).data(QtCore.Qt.EditRole)
-        t_2_name = index.siblingAtColumn(2).data(QtCore.Qt.EditRole)
-        editor.clear()
-        editor.addItem(t_1_name)
-        editor.addItem(t_2_name)
-        editor.setCurrentIndex(not index.data(QtCore.Qt.EditRole))
+        if index.column() == self.EVENT:
+            editor.addItems(["", *self.events])
+        else:
+            for col in [1, 2]:
+                team = index.siblingAtColumn(col)
+                editor.addItem(
+                    team.data(QtCore.Qt.DisplayRole), team.data(QtCore.Qt.EditRole)
+                )
         return editor
 
+    def setEditorData(self, editor, index):
+        if index.column() == self.EVENT:
+            value = index.data(QtCore.Qt.EditRole)
+            if value:
+                editor.setCurrentIndex(editor.findText(value))
+        else:
+            editor.setCurrentIndex(editor.findData(index.data(QtCore.Qt.EditRole)))
+
     def setModelData(self, editor, model, index) -> None:
-        related_table = model.relationModel(4)
-        t_index = related_table.match(related_table.index(0, 2), QtCore.Qt.DisplayRole, editor.currentText())
-        t_id = t_index[0].siblingAtColumn(0).data(QtCore.Qt.DisplayRole)
-        model.setData(index, t_id, QtCore.Qt.EditRole)
+        if index.column() == self.EVENT:
+            model.setData(index, editor.currentText(), QtCore.Qt.EditRole)
+        else:
+            model.setData(index, editor.currentData(), QtCore.Qt.EditRole)
@@ -1,46 +1,22 @@
 import fractions
+import importlib
 import math
+import os
+import re
 import shutil
 import sqlite3
+from collections import namedtuple
 from PyQt5 import QtWidgets, QtCore
 
 
-TEAMS_SQL = """create table teams (
-    id integer 
-    constraint teams_pk 
-        primary key AUTOINCREMENT, 
-    School varchar(120), 
-    Name varchar(80)  not null, 
-    Division varchar(1) not null, 
-    Mucking float,
-    "Swede Saw" float,
-    "Track Stand" float, 
-    "Gold Pan" float, 
-    "Hand Steel"  float, 
-    Jackleg float, 
-    Survey double
-    );"""
-
-RANKS_SQL = """create table ranks (
-    id INTEGER 
-    constraint ranks_pk 
-        primary key constraint 
-    ranks_teams_id_fk 
-        references teams 
-        on delete cascade,
-    School varchar(120), 
-    Name varchar(80) not null,  
-    Division varchar(1), 
-    Mucking int, 
-    "Swede Saw" int, 
-    "Track Stand" int, 
-    "Gold Pan" int, 
-    "Hand Steel" int, 
-    Jackleg int, 
-    Survey int, 
-    Sum int, 
-    "Ties Won" int
-    );"""
+# kind is "time" (seconds) or "length" (cm), order is the SQL direction that
+# puts the best result first and dq the stored value of a disqualification.
+# Length events read display units from munits/<key> and iunits/<key>,
+# falling back to metric/imperial.
+Event = namedtuple(
+    "Event",
+    ["name", "kind", "order", "dq", "key", "metric", "imperial", "precision"],
+)
 
 TIES_SQL = """create table ties (
     id integer not null
@@ -67,6 +43,54 @@ DQ_MIN_LENGTH = 0
 DQ_MAX_LENGTH = 99999999.0
 TXN_LEVEL_NUM = 25
 
+# Results closer than this are considered equal (cm or seconds)
+TIE_TOLERANCE = 0.01
+
+EVENTS = [
+    Event("Mucking", "time", "ASC", DQ_TIME, "", "", "", 2),
+    Event("Swede Saw", "time", "ASC", DQ_TIME, "", "", "", 2),
+    Event("Track Stand", "time", "ASC", DQ_TIME, "", "", "", 2),
+    Event("Gold Pan", "time", "ASC", DQ_TIME, "", "", "", 2),
+    Event("Hand Steel", "length", "DESC", DQ_MIN_LENGTH, "handsteel", "mm", "in", 2),
+    Event("Jackleg", "length", "DESC", DQ_MIN_LENGTH, "jackleg", "cm", "ft", 2),
+    Event("Survey", "length", "ASC", DQ_MAX_LENGTH, "survey", "dynamic", "dynamic", 3),
+]
+
+EVENT_SORTING = {event.name: event.order for event in EVENTS}
+
+EVENT_DQ = {event.name: event.dq for event in EVENTS}
+
+
+def teams_sql(events=EVENTS):
+    columns = "".join(f',\n    "{event.name}" float' for event in events)
+    return f"""create table teams (
+    id integer
+    constraint teams_pk
+        primary key AUTOINCREMENT,
+    School varchar(120),
+    Name varchar(80)  not null,
+    Division varchar(1) not null{columns}
+    );"""
+
+
+def ranks_sql(events=EVENTS):
+    columns = "".join(f'\n    "{event.name}" int,' for event in events)
+    return f"""create table ranks (
+    id INTEGER
+    constraint ranks_pk
+        primary key constraint
+    ranks_teams_id_fk
+        references teams
+        on delete cascade,{columns}
+    Sum int,
+    "Ties Won" int
+    );"""
+
+
+TEAMS_SQL = teams_sql()
+
+RANKS_SQL = ranks_sql()
+
 UNIT_FACTORS = {
     "mm": 10,
     "cm": 1,
@@ -100,16 +124,7 @@ UNIT_SHORTHAND = {
     "dynamic": "dynamic",
 }
 
-events = [
-    "",
-    "Mucking",
-    "Swede Saw",
-    "Track Stand",
-    "Gold Pan",
-    "Hand Steel",
-    "Jackleg",
-    "Survey",
-]
+events = ["", *EVENT_SORTING]
 
 
 def alert(window_title, text, alert="info"):
@@ -142,6 +157,31 @@ def confirm(title, text):
     return msg.exec_()
 
 
+def form_module(name):
+    """Module name of the compiled form of ui/<name>.ui"""
+    return re.sub(r"\W+", "_", name).lower()
+
+
+def load_ui(name, widget):
+    """Set up widget from ui/<name>.ui
+
+    Uses the form compiled by build.py when it is importable, as in the
+    bundled app, so the .ui XML is not parsed at startup.
+    """
+    try:
+        form = importlib.import_module(f"forms.{form_module(name)}")
+    except ImportError:
+        from PyQt5 import uic
+
+        uic.loadUi(f"ui{os.sep}{name}.ui", widget)
+        return
+    ui = next(value for key, value in vars(form).items() if key.startswith("Ui_"))()
+    ui.setupUi(widget)
+    # uic.loadUi sets the named widgets as attributes of widget itself
+    for key, value in vars(ui).items():
+        setattr(widget, key, value)
+
+
 def db_copy(base, target):
     connection = sqlite3.connect(base)
     cursor = connection.cursor()
@@ -0,0 +1,250 @@
+"""What-if scoring
+
+Answers "what happens to the standings if this protest succeeds or this tie
+goes the other way" without touching the live competition. The competition
+is copied into memory once with the SQLite backup API. Every simulation
+applies its hypothetical results and tie outcomes to a fresh copy, scores
+the divisions they touch and returns what changed.
+
+    python whatif.py data/mucking_2020.config --set 12 Jackleg 152.4 --tie 3 7 Mucking 7
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+from collections import namedtuple
+import instrument
+import scoring
+
+# value is in storage units, seconds or cm, None clears the result
+Edit = namedtuple("Edit", ["team_id", "event", "value"])
+
+# Replaces the outcome of the tie between two teams in an event, or adds it.
+# A winner of None removes the tie.
+Outcome = namedtuple("Outcome", ["team_1_id", "team_2_id", "event", "winner"])
+
+# field is an event name, "Sum", "Ties Won" or "Place"
+Change = namedtuple("Change", ["team_id", "name", "division", "field", "before", "after"])
+
+
+def load(connection, division, names):
+    """Teams and ties of a division in the form scoring expects"""
+    columns = ", ".join(f'"{name}"' for name in names)
+    teams = [
+        (row[0], dict(zip(names, row[1:])))
+        for row in connection.execute(
+            f"SELECT id, {columns} FROM teams WHERE Division = ? ORDER BY id;", [division]
+        )
+    ]
+    ties = connection.execute(
+        "SELECT ties.team_1_id, ties.team_2_id, ties.event, ties.winner FROM ties "
+        "JOIN teams ON teams.id = ties.team_1_id WHERE teams.Division = ? "
+        "ORDER BY ties.id;",
+        [division],
+    ).fetchall()
+    return teams, ties
+
+
+def path_uri(path):
+    return "file:" + os.path.abspath(path).replace("\\", "/").replace("?", "%3f").replace("#", "%23")
+
+
+class Simulator:
+    """Scores hypothetical changes against an in-memory copy of a competition
+
+    path is the competition database and events the Event records scored. The
+    copy is taken when the simulator is made, reload takes it again after
+    the live competition changed.
+    """
+
+    def __init__(self, path, events):
+        self.logger = logging.getLogger("Main.WhatIf")
+        self.path = path
+        self.events = list(events)
+        self.names = [event.name for event in self.events]
+        self.fields = [*self.names, "Sum", "Ties Won", "Place"]
+        self.base = None
+        self.teams = {}
+        self.baseline = {}
+        self.reload()
+
+    def close(self):
+        if self.base:
+            self.base.close()
+            self.base = None
+
+    @instrument.timed("whatif_reload")
+    def reload(self):
+        live = sqlite3.connect(f"{path_uri(self.path)}?mode=ro", uri=True)
+        base = sqlite3.connect(":memory:")
+        try:
+            live.backup(base)
+        finally:
+            live.close()
+        self.close()
+        self.base = base
+        self.teams = {
+            t_id: (name, division)
+            for t_id, name, division in base.execute("SELECT id, Name, Division FROM teams;")
+        }
+        self.baseline = {
+            division: self.score(base, division)
+            for division in sorted({division for _, division in self.teams.values()})
+        }
+
+    def score(self, connection, division):
+        ranks = scoring.score_division(
+            *load(connection, division, self.names), self.events
+        )
+        for t_id, place in scoring.place_division(ranks).items():
+            ranks[t_id]["Place"] = place
+        return ranks
+
+    @instrument.timed("whatif_simulate")
+    def simulate(self, edits=(), outcomes=()):
+        """[Change] to the standings were the edits and tie outcomes made
+
+        Raises ValueError for an unknown team or event, or a winner not in the tie.
+        """
+        copy = sqlite3.connect(":memory:")
+        try:
+            self.base.backup(copy)
+            divisions = self.apply(copy, edits, outcomes)
+            return self.diff(copy, divisions)
+        finally:
+            copy.close()
+
+    def division(self, t_id):
+        if t_id not in self.teams:
+            raise ValueError(f"Unknown team {t_id}")
+        return self.teams[t_id][1]
+
+    def apply(self, connection, edits, outcomes):
+        """Make the hypothetical changes, returns the divisions they touch"""
+        divisions = set()
+        for edit in edits:
+            if edit.event not in self.names:
+                raise ValueError(f"Unknown event {edit.event}")
+            divisions.add(self.division(edit.team_id))
+            connection.execute(
+                f'UPDATE teams SET "{edit.event}" = ? WHERE id = ?;',
+                [edit.value, edit.team_id],
+            )
+
+        for outcome in outcomes:
+            t1_id, t2_id, event, winner = outcome
+            if event not in self.names:
+                raise ValueError(f"Unknown event {event}")
+            if winner not in (t1_id, t2_id, None):
+                raise ValueError(f"Team {winner} is not in the tie")
+            if self.division(t1_id) != self.division(t2_id):
+                raise ValueError(f"Teams {t1_id} and {t2_id} are in different divisions")
+            divisions.add(self.division(t1_id))
+            existing = connection.execute(
+                "SELECT id FROM ties WHERE event = ? AND ("
+                "(team_1_id = ? AND team_2_id = ?) OR (team_1_id = ? AND team_2_id = ?));",
+                [event, t1_id, t2_id, t2_id, t1_id],
+            ).fetchone()
+            if existing and winner is None:
+                connection.execute("DELETE FROM ties WHERE id = ?;", existing)
+            elif existing:
+                connection.execute("UPDATE ties SET winner = ? WHERE id = ?;", [winner, *existing])
+            elif winner is not None:
+                connection.execute(
+                    "INSERT INTO ties (team_1_id, team_2_id, event, winner) VALUES (?, ?, ?, ?);",
+                    [t1_id, t2_id, event, winner],
+                )
+        return sorted(divisions)
+
+    def diff(self, connection, divisions):
+        changes = []
+        for division in divisions:
+            before = self.baseline.get(division, {})
+            after = self.score(connection, division)
+            for t_id in sorted(after):
+                old = before.get(t_id, {})
+                for field in self.fields:
+                    if old.get(field) != after[t_id][field]:
+                        changes.append(
+                            Change(
+                                t_id,
+                                self.teams[t_id][0],
+                                division,
+                                field,
+                                old.get(field),
+                                after[t_id][field],
+                            )
+                        )
+        return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Standings were these results different")
+    parser.add_argument("config", help="competition .config file")
+    parser.add_argument(
+        "--set",
+        nargs=3,
+        action="append",
+        default=[],
+        metavar=("TEAM", "EVENT", "VALUE"),
+        help="result in seconds or cm, DQ or none",
+    )
+    parser.add_argument(
+        "--tie",
+        nargs=4,
+        action="append",
+        default=[],
+        metavar=("TEAM_1", "TEAM_2", "EVENT", "WINNER"),
+        help="winner id, or none to remove the tie",
+    )
+    args = parser.parse_args(argv)
+
+    from PyQt5 import QtCore
+    import registry
+
+    settings = QtCore.QSettings(args.config, QtCore.QSettings.IniFormat)
+    events = registry.EventRegistry.from_settings(settings)
+
+    def team(text):
+        if not text.isdigit():
+            raise ValueError(f"Team {text!r} is not a team id")
+        return int(text)
+
+    def value(event, text):
+        if event not in events.dq:
+            raise ValueError(f"Unknown event {event}")
+        if text.casefold() == "none":
+            return None
+        if text.casefold() == "dq":
+            return events.dq[event]
+        try:
+            return float(text)
+        except ValueError:
+            raise ValueError(f"{event} result {text!r} is not seconds or cm, DQ or none")
+
+    try:
+        edits = [Edit(team(t_id), event, value(event, text)) for t_id, event, text in args.set]
+        outcomes = [
+            Outcome(team(t1), team(t2), event, None if winner.casefold() == "none" else team(winner))
+            for t1, t2, event, winner in args.tie
+        ]
+    except ValueError as e:
+        parser.error(str(e))
+    simulator = Simulator(settings.value("db/path"), events.events)
+    try:
+        changes = simulator.simulate(edits, outcomes)
+    except (ValueError, KeyError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    finally:
+        simulator.close()
+    for change in changes:
+        print(f"{change.division}  {change.name:<30}{change.field:<12}{change.before} -> {change.after}")
+    if not changes:
+        print("No change to the standings")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())